@@ -0,0 +1,117 @@
+"""
+Module: address_dict.py
+
+But: dictionnaire global d'adresses (adresse → id int32) pour stocker et agréger les flux sur des entiers
+- Encodage vectorisé: hachage des valeurs uniques de la colonne (pd.factorize), Python seulement sur les nouvelles adresses
+- Ids stables et croissants: le dictionnaire ne fait que grandir (extension incrémentale, sans ré-encodage des frames)
+- Décodage / short_hex uniquement pour les lignes effectivement retournées
+- Rangs lexicographiques des adresses: départage des ex aequo identique à un tri sur les chaînes
+- Empreintes 64 bits des adresses: hachage indépendant de l'ordre d'internement (HyperLogLog des sketches)
+
+Dépendances: numpy, pandas
+"""
+
+from __future__ import annotations
+import hashlib
+import threading
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+MISSING = -1
+
+
+class AddressDictionary:
+    """Adresse (chaîne, casse conservée) ↔ id int32; id MISSING (-1) pour None/NaN."""
+
+    def __init__(self, addresses: Iterable[str] = ()):
+        self._ids: dict[str, int] = {}
+        self._addresses: list[str] = []
+        self._lock = threading.Lock()
+        self._array: np.ndarray | None = None
+        # ordre lexicographique maintenu incrémentalement (fusion des seules nouvelles adresses)
+        self._rank_lock = threading.Lock()
+        self._sorted_ids = np.empty(0, dtype=np.int64)
+        self._sorted_strs = np.empty(0, dtype=object)
+        self._ranks: np.ndarray | None = None
+        self._fingerprints = np.empty(0, dtype=np.uint64)
+        for a in addresses:
+            self._add(a)
+
+    def _add(self, address: str) -> int:
+        i = self._ids.get(address)
+        if i is None:
+            i = self._ids[address] = len(self._addresses)
+            self._addresses.append(address)
+        return i
+
+    def __len__(self) -> int:
+        return len(self._addresses)
+
+    def __contains__(self, address: str) -> bool:
+        return address in self._ids
+
+    def encode(self, col: pd.Series | np.ndarray, add: bool = True) -> np.ndarray:
+        """Colonne d'adresses → ids int32 (MISSING si absente; inconnue → ajoutée si add, sinon MISSING)."""
+        codes, uniques = pd.factorize(col if isinstance(col, pd.Series) else np.asarray(col, dtype=object))
+        uniques = np.asarray(uniques, dtype=object)
+        lut = np.empty(len(uniques) + 1, dtype=np.int32)
+        lut[-1] = MISSING  # code -1 de factorize → MISSING
+        with self._lock:
+            if add:
+                lut[:-1] = [self._add(a) for a in uniques]
+            else:
+                lut[:-1] = [self._ids.get(a, MISSING) for a in uniques]
+        return lut[codes]
+
+    def lookup(self, address: str) -> int:
+        return self._ids.get(address, MISSING)
+
+    @property
+    def addresses(self) -> np.ndarray:
+        """Adresses indexées par id (ndarray object), instantané reconstruit après extension."""
+        arr = self._array
+        if arr is None or len(arr) != len(self._addresses):
+            with self._lock:
+                arr = self._array = np.array(self._addresses, dtype=object)
+        return arr
+
+    def decode(self, ids: np.ndarray | pd.Series) -> np.ndarray:
+        """Ids → adresses (None pour MISSING)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        arr = self.addresses
+        out = np.full(len(ids), None, dtype=object)
+        ok = ids >= 0
+        out[ok] = arr[ids[ok]]
+        return out
+
+    def ranks(self) -> np.ndarray:
+        """Rang de chaque id dans l'ordre lexicographique des adresses (départage des ex aequo sur entiers)."""
+        arr = self.addresses
+        with self._rank_lock:
+            r = self._ranks
+            if r is not None and len(r) == len(arr):
+                return r
+            n0 = len(self._sorted_ids)
+            new = np.arange(n0, len(arr), dtype=np.int64)
+            new = new[np.argsort(arr[n0:], kind='stable')]
+            ins = np.searchsorted(self._sorted_strs, arr[new])
+            self._sorted_ids = np.insert(self._sorted_ids, ins, new)
+            self._sorted_strs = np.insert(self._sorted_strs, ins, arr[new])
+            r = np.empty(len(arr), dtype=np.int64)
+            r[self._sorted_ids] = np.arange(len(arr))
+            self._ranks = r
+            return r
+
+    def fingerprints(self) -> np.ndarray:
+        """Empreinte uint64 de chaque id, dérivée de la seule chaîne d'adresse (mêmes valeurs quel que soit l'ordre
+        de chargement, contrairement aux ids)."""
+        arr = self.addresses
+        with self._rank_lock:
+            fp = self._fingerprints
+            if len(fp) < len(arr):
+                new = np.fromiter((int.from_bytes(hashlib.blake2b(a.encode(), digest_size=8).digest(), 'little')
+                                   for a in arr[len(fp):]), dtype=np.uint64, count=len(arr) - len(fp))
+                fp = self._fingerprints = np.concatenate([fp, new])
+            return fp
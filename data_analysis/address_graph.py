@@ -0,0 +1,268 @@
+"""
+Module: address_graph.py
+
+But: graphe d'adresses compressé (CSR) pour les requêtes par adresse à latence interactive
+- Une ligne par transfert (ids d'adresses internés, token, bloc, montant brut exact uint256)
+- Lignes triées par (from, bloc) + permutation triée par (to, bloc): voisinages sortants/entrants = tranches contiguës
+- Fenêtre de blocs par recherche dichotomique dans la tranche d'une adresse
+- Contreparties / volumes par token: agrégation de la seule tranche de l'adresse (sommes uint256 exactes)
+- Accessibilité k sauts: BFS vectorisé par niveau (gather de tranches), budget d'arêtes par requête
+- Extension incrémentale: fusion d'un lot trié avec les lignes existantes (blocs croissants)
+
+Dépendances: numpy (+ uint256.py)
+"""
+
+from __future__ import annotations
+from typing import Tuple
+
+import numpy as np
+
+from uint256 import UInt256Array
+
+DIRECTIONS = ('out', 'in')
+
+
+def _indptr(keys: np.ndarray, n_nodes: int) -> np.ndarray:
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_nodes), out=indptr[1:])
+    return indptr
+
+
+def _order_by(key: np.ndarray, block: np.ndarray) -> np.ndarray:
+    """Permutation triant par (key, block); un tri stable sur key suffit si les blocs sont déjà croissants."""
+    if len(block) < 2 or bool((block[1:] >= block[:-1]).all()):
+        return np.argsort(key, kind='stable')
+    return np.lexsort((block, key))
+
+
+def _ragged_rows(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Concaténation des plages [starts[i], ends[i]) → (positions, indice de plage de chaque position)."""
+    lens = ends - starts
+    total = int(lens.sum())
+    owner = np.repeat(np.arange(len(starts)), lens)
+    offsets = np.cumsum(lens) - lens
+    return starts[owner] + (np.arange(total) - offsets[owner]), owner
+
+
+def _rank(ids: np.ndarray, ranks: np.ndarray | None) -> np.ndarray:
+    """Clé de tri des ids (rang lexicographique si fourni); id manquant (-1) en premier."""
+    if ranks is None:
+        return ids
+    return np.where(ids >= 0, ranks[np.maximum(ids, 0)], -1)
+
+
+class AddressGraph:
+    """Arêtes from → to (une par transfert) en CSR sur les ids d'adresses.
+
+    Lignes stockées dans l'ordre (src, block); `in_perm` donne l'ordre (dst, block).
+    Les tableaux ne sont jamais modifiés en place: `extend()` retourne un nouveau graphe.
+    """
+
+    def __init__(self, src: np.ndarray, dst: np.ndarray, token: np.ndarray, block: np.ndarray,
+                 amount: UInt256Array, n_nodes: int, *, sorted_: bool = False, in_perm: np.ndarray | None = None):
+        n_nodes = max(int(n_nodes), int(src.max()) + 1 if len(src) else 0, int(dst.max()) + 1 if len(dst) else 0)
+        if not sorted_:
+            order = _order_by(src, block)
+            if in_perm is None:
+                # ordre (dst, block) calculé sur l'entrée puis exprimé en positions triées
+                new_pos = np.empty(len(order), dtype=np.int64)
+                new_pos[order] = np.arange(len(order))
+                in_perm = new_pos[_order_by(dst, block)]
+            src, dst, token, block, amount = src[order], dst[order], token[order], block[order], amount.take(order)
+        self.src = np.ascontiguousarray(src, dtype=np.int32)
+        self.dst = np.ascontiguousarray(dst, dtype=np.int32)
+        self.token = np.ascontiguousarray(token, dtype=np.int32)
+        self.block = np.ascontiguousarray(block, dtype=np.int64)
+        self.amount = amount
+        self.n_nodes = n_nodes
+        self.out_indptr = _indptr(self.src, n_nodes)
+        self.in_perm = in_perm if in_perm is not None else _order_by(self.dst, self.block)
+        self.in_indptr = _indptr(self.dst, n_nodes)
+
+    @classmethod
+    def from_arrays(cls, src: np.ndarray, dst: np.ndarray, token: np.ndarray, block: np.ndarray,
+                    amount: UInt256Array, n_nodes: int = 0) -> 'AddressGraph':
+        """Lignes à extrémités manquantes (id < 0) ignorées."""
+        ok = (src >= 0) & (dst >= 0)
+        return cls(src[ok], dst[ok], token[ok], block[ok], amount[ok], n_nodes)
+
+    def buffers(self) -> dict[str, np.ndarray]:
+        """Tableaux du graphe (CSR compris), p. ex. pour une publication en mémoire partagée (cf. execution.py)."""
+        return {'src': self.src, 'dst': self.dst, 'token': self.token, 'block': self.block,
+                'amount_limbs': self.amount.limbs, 'amount_valid': self.amount.valid,
+                'out_indptr': self.out_indptr, 'in_perm': self.in_perm, 'in_indptr': self.in_indptr}
+
+    @classmethod
+    def from_buffers(cls, buffers: dict[str, np.ndarray]) -> 'AddressGraph':
+        """Graphe sur les tableaux de buffers() (vues, sans copie ni recalcul des index)."""
+        g = cls.__new__(cls)
+        g.src, g.dst, g.token, g.block = buffers['src'], buffers['dst'], buffers['token'], buffers['block']
+        g.amount = UInt256Array(buffers['amount_limbs'], buffers['amount_valid'])
+        g.out_indptr, g.in_perm, g.in_indptr = buffers['out_indptr'], buffers['in_perm'], buffers['in_indptr']
+        g.n_nodes = len(g.out_indptr) - 1
+        return g
+
+    def __len__(self) -> int:
+        return len(self.src)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.src, self.dst, self.token, self.block, self.out_indptr, self.in_perm, self.in_indptr)
+        return sum(a.nbytes for a in arrays) + self.amount.nbytes
+
+    def extend(self, src: np.ndarray, dst: np.ndarray, token: np.ndarray, block: np.ndarray,
+               amount: UInt256Array, n_nodes: int = 0) -> 'AddressGraph':
+        """Nouveau graphe incluant un lot de lignes.
+
+        Cas courant (lot de blocs ≥ aux blocs déjà chargés): tri du seul lot puis fusion stable par src,
+        sans retrier les lignes existantes; sinon tri complet.
+        """
+        delta = AddressGraph.from_arrays(src, dst, token, block, amount, n_nodes)
+        if not len(delta):
+            if delta.n_nodes <= self.n_nodes:
+                return self
+            return AddressGraph(self.src, self.dst, self.token, self.block, self.amount, delta.n_nodes, sorted_=True)
+        n_nodes = max(self.n_nodes, delta.n_nodes)
+        src = np.concatenate([self.src, delta.src])
+        dst = np.concatenate([self.dst, delta.dst])
+        token = np.concatenate([self.token, delta.token])
+        block = np.concatenate([self.block, delta.block])
+        amount = UInt256Array.concat([self.amount, delta.amount])
+        if len(self) and delta.block.min() < self.block.max():
+            return AddressGraph(src, dst, token, block, amount, n_nodes)
+        # deux séquences triées par src (resp. dst): le tri stable (timsort) se réduit à une fusion
+        n0 = len(self)
+        order = np.argsort(src, kind='stable')
+        new_pos = np.empty(len(order), dtype=np.int64)
+        new_pos[order] = np.arange(len(order))
+        in_rows = np.concatenate([new_pos[self.in_perm], new_pos[n0 + delta.in_perm]])
+        in_keys = np.concatenate([self.dst[self.in_perm], delta.dst[delta.in_perm]])
+        in_perm = in_rows[np.argsort(in_keys, kind='stable')]
+        return AddressGraph(src[order], dst[order], token[order], block[order], amount.take(order), n_nodes,
+                            sorted_=True, in_perm=in_perm)
+
+    # --- Voisinages ---
+
+    def rows(self, node: int, direction: str = 'out', start_block: int | None = None,
+             end_block: int | None = None) -> np.ndarray:
+        """Positions des lignes sortantes/entrantes de `node` dans [start_block, end_block] (ordre de bloc)."""
+        if node < 0 or node >= self.n_nodes:
+            return np.empty(0, dtype=np.int64)
+        if direction == 'out':
+            rows = np.arange(self.out_indptr[node], self.out_indptr[node + 1])
+        else:
+            rows = self.in_perm[self.in_indptr[node]:self.in_indptr[node + 1]]
+        if start_block is not None or end_block is not None:
+            blocks = self.block[rows]
+            lo = np.searchsorted(blocks, start_block, side='left') if start_block is not None else 0
+            hi = np.searchsorted(blocks, end_block, side='right') if end_block is not None else len(rows)
+            rows = rows[lo:hi]
+        return rows
+
+    def counterparties(self, node: int, direction: str = 'out', *, start_block: int | None = None,
+                       end_block: int | None = None, token: int | None = None, by_token: bool = True,
+                       top: int | None = None, ranks: np.ndarray | None = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, UInt256Array]:
+        """(contrepartie, token, nb de transferts, somme exacte des montants) par contrepartie et token.
+
+        by_token=False: agrégation par token seul (volumes par token), contrepartie = -1.
+        Trié par nombre de transferts décroissant, puis montant décroissant, puis rang des adresses
+        (`ranks`, cf. AddressDictionary.ranks; ids à défaut). `top`: seuls les premiers groupes sont retournés.
+        """
+        rows = self.rows(node, direction, start_block, end_block)
+        if token is not None:
+            rows = rows[self.token[rows] == token]
+        other = (self.dst if direction == 'out' else self.src)[rows].astype(np.int64)
+        tok = self.token[rows].astype(np.int64)
+        if not by_token:
+            other = np.full(len(rows), -1, dtype=np.int64)
+        keys = ((other + 1) << 32) | (tok + 1)
+        # un seul tri des lignes: groupes contigus, codes déjà triés pour group_sum
+        by_key = np.argsort(keys, kind='stable')
+        sk = keys[by_key]
+        new_group = np.r_[True, sk[1:] != sk[:-1]] if len(sk) else np.empty(0, dtype=bool)
+        starts = np.flatnonzero(new_group)
+        uniq = sk[starts]
+        counts = np.diff(np.r_[starts, len(sk)])
+        cand = np.arange(len(uniq))
+        if top is not None and 0 < top < len(uniq):
+            # présélection: seuls les groupes d'effectif ≥ au top-ième sont sommés et départagés
+            cand = np.flatnonzero(counts >= np.partition(counts, len(counts) - top)[len(counts) - top])
+        codes = np.cumsum(new_group) - 1
+        in_cand = np.zeros(len(uniq), dtype=bool)
+        in_cand[cand] = True
+        sel = in_cand[codes]
+        remap = np.cumsum(in_cand) - 1
+        sums = self.amount.take(rows[by_key[sel]]).group_sum(remap[codes[sel]], len(cand))
+        uniq, counts = uniq[cand], counts[cand]
+        cp, tk = (uniq >> 32) - 1, (uniq & 0xFFFFFFFF) - 1
+        order = np.lexsort([_rank(tk, ranks), _rank(cp, ranks), *sums.sort_keys_desc(), -counts])
+        if top is not None:
+            order = order[:max(top, 0)]
+        return cp[order], tk[order], counts[order], sums.take(order)
+
+    def reachable(self, node: int, max_hops: int = 2, direction: str = 'out', *, start_block: int | None = None,
+                  end_block: int | None = None, target: int | None = None, max_edges: int = 2_000_000,
+                  ranks: np.ndarray | None = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, bool]:
+        """BFS jusqu'à max_hops sauts dans la fenêtre de blocs → (ids, sauts, prédécesseur, tronqué).
+
+        Chaque niveau est ordonné par `ranks` (ids à défaut); le prédécesseur retenu est le premier noeud
+        du niveau précédent dans cet ordre. S'arrête dès que `target` est atteint; `tronqué` si le budget
+        d'arêtes parcourues est dépassé.
+        """
+        empty = np.empty(0, dtype=np.int64)
+        if node < 0 or node >= self.n_nodes:
+            return empty, empty, empty, False
+        indptr, other = (self.out_indptr, self.dst) if direction == 'out' else (self.in_indptr, self.src)
+        hops = np.full(self.n_nodes, -1, dtype=np.int16)
+        parent = np.full(self.n_nodes, -1, dtype=np.int64)
+        hops[node] = 0
+        reached = [np.array([node], dtype=np.int64)]
+        frontier = reached[0]
+        seen_edges, truncated = 0, False
+        for h in range(1, max_hops + 1):
+            if not len(frontier) or (target is not None and hops[target] >= 0):
+                break
+            starts, ends = indptr[frontier], indptr[frontier + 1]
+            budget = max_edges - seen_edges
+            if int((ends - starts).sum()) > budget:
+                # budget atteint: premières arêtes de la frontière seulement (dernier noeud partiellement)
+                before = np.cumsum(ends - starts) - (ends - starts)
+                ends = np.minimum(ends, starts + np.maximum(budget - before, 0))
+                truncated = True
+            pos, owner = _ragged_rows(starts, ends)
+            rows = pos if direction == 'out' else self.in_perm[pos]
+            seen_edges += len(rows)
+            if start_block is not None or end_block is not None:
+                b = self.block[rows]
+                ok = np.ones(len(rows), dtype=bool)
+                if start_block is not None:
+                    ok &= b >= start_block
+                if end_block is not None:
+                    ok &= b <= end_block
+                rows, owner = rows[ok], owner[ok]
+            nbr = other[rows].astype(np.int64)
+            new = hops[nbr] < 0
+            nbr, owner = nbr[new], owner[new]
+            nxt, first = np.unique(nbr, return_index=True)
+            if ranks is not None:
+                by_rank = np.argsort(ranks[nxt], kind='stable')
+                nxt, first = nxt[by_rank], first[by_rank]
+            hops[nxt] = h
+            parent[nxt] = frontier[owner[first]]
+            reached.append(nxt)
+            frontier = nxt
+            if truncated:
+                break
+        ids = np.concatenate(reached)
+        return ids, hops[ids].astype(np.int64), parent[ids], truncated
+
+    @staticmethod
+    def path_to(target: int, ids: np.ndarray, parents: np.ndarray) -> list[int]:
+        """Chemin source → target reconstruit depuis la sortie de reachable (vide si non atteint)."""
+        parent_of = dict(zip(ids.tolist(), parents.tolist()))
+        if target not in parent_of:
+            return []
+        path = [target]
+        while parent_of[path[-1]] >= 0:
+            path.append(parent_of[path[-1]])
+        return path[::-1]
@@ -0,0 +1,72 @@
+"""
+Benchmark: chargement DB brut (SELECT * via load_frames_from_db) vs typé/élagué/streamé (load_frames_typed).
+
+Cible: une base PostgreSQL créée avec indexer/src/database/schema.sql et remplie par l'indexer
+(variables PG_* comme pour runner.py, lues depuis .env).
+
+Usage:
+    python bench_db_loader.py [--chunksize 100000] [--after-block N] [--upto-block M] [--loaders raw,typed]
+
+Chaque loader tourne dans un sous-processus dédié pour isoler le pic RSS (resource.getrusage).
+Sortie: une ligne JSON par loader {loader, rows, seconds, rows_per_s, peak_rss_mb, frames_mb}.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing as mp
+import resource
+import sys
+import time
+
+
+def _run(loader: str, args: dict, out) -> None:
+    from dotenv import load_dotenv
+    load_dotenv()
+    import hyper_evm_step1_events as H
+
+    engine = H.make_pg_engine_from_env()
+    rss0 = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    if loader == 'raw':
+        frames = H.load_frames_from_db(engine, after_block=args['after_block'], upto_block=args['upto_block'])
+    else:
+        frames = H.load_frames_typed(engine, after_block=args['after_block'], upto_block=args['upto_block'],
+                                     chunksize=args['chunksize'])
+    dt = time.perf_counter() - t0
+    # ru_maxrss: Ko sous Linux, octets sous macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rows = sum(len(f) for f in frames)
+    out.send({
+        'loader': loader,
+        'rows': rows,
+        'seconds': round(dt, 3),
+        'rows_per_s': round(rows / dt, 1) if dt > 0 else None,
+        'peak_rss_mb': round(peak * unit / 2**20, 1),
+        'baseline_rss_mb': round(rss0 * unit / 2**20, 1),
+        'frames_mb': round(sum(f.memory_usage(deep=True).sum() for f in frames) / 2**20, 1),
+    })
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--chunksize', type=int, default=100_000)
+    p.add_argument('--after-block', type=int, default=None)
+    p.add_argument('--upto-block', type=int, default=None)
+    p.add_argument('--loaders', default='raw,typed')
+    a = p.parse_args(argv)
+    args = {'chunksize': a.chunksize, 'after_block': a.after_block, 'upto_block': a.upto_block}
+    ctx = mp.get_context('spawn')
+    for loader in a.loaders.split(','):
+        recv, send = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_run, args=(loader.strip(), args, send))
+        proc.start()
+        proc.join()
+        result = recv.recv() if recv.poll() else {'loader': loader, 'error': f'exit code {proc.exitcode}'}
+        print(json.dumps(result), flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
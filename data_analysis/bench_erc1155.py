@@ -0,0 +1,91 @@
+"""
+Benchmark: décodage ERC-1155 (TransferSingle / TransferBatch) — décodeur vectorisé (evm_abi) vs boucle Python par log.
+
+Payloads synthétiques ABI-encodés; TransferBatch de 1 à --max-batch éléments.
+La boucle Python (int(mot, 16) par mot) ne tourne que sur --scalar-logs logs.
+
+Usage:
+    python bench_erc1155.py [--logs 1000000] [--max-batch 8] [--scalar-logs 100000] [--repeat 3]
+
+Sortie: une ligne JSON par mesure {kind, decoder, logs, rows, seconds, logs_per_s, rows_per_s}.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from evm_abi import decode_transfer_batch, decode_transfer_single
+
+
+def make_single(n: int, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    ids, values = rng.integers(0, 2**63, n), rng.integers(1, 2**63, n)
+    return pd.Series([f'0x{i:064x}{v:064x}' for i, v in zip(ids.tolist(), values.tolist())])
+
+
+def make_batch(n: int, max_batch: int = 8, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(1, max_batch + 1, n)
+    out = []
+    for k in sizes.tolist():
+        ids, values = rng.integers(0, 2**63, k).tolist(), rng.integers(1, 2**63, k).tolist()
+        words = [0x40, 0x40 + 32 * (k + 1), k, *ids, k, *values]
+        out.append('0x' + ''.join(f'{w:064x}' for w in words))
+    return pd.Series(out)
+
+
+def scalar_single(data: pd.Series) -> int:
+    rows = 0
+    for d in data:
+        h = d[2:]
+        int(h[:64], 16), int(h[64:128], 16)
+        rows += 1
+    return rows
+
+
+def scalar_batch(data: pd.Series) -> int:
+    rows = 0
+    for d in data:
+        h = d[2:]
+        w = [int(h[i:i + 64], 16) for i in range(0, len(h), 64)]
+        p_ids, p_vals = w[0] // 32, w[1] // 32
+        n = w[p_ids]
+        rows += len(list(zip(w[p_ids + 1:p_ids + 1 + n], w[p_vals + 1:p_vals + 1 + n])))
+    return rows
+
+
+def _measure(kind: str, decoder: str, fn, data: pd.Series, repeat: int) -> dict:
+    best, rows = float('inf'), 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = fn(data)
+        best = min(best, time.perf_counter() - t0)
+    return {'kind': kind, 'decoder': decoder, 'logs': len(data), 'rows': rows, 'seconds': round(best, 4),
+            'logs_per_s': round(len(data) / best), 'rows_per_s': round(rows / best)}
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--logs', type=int, default=1_000_000)
+    p.add_argument('--max-batch', type=int, default=8)
+    p.add_argument('--scalar-logs', type=int, default=100_000)
+    p.add_argument('--repeat', type=int, default=3)
+    a = p.parse_args(argv)
+    single, batch = make_single(a.logs), make_batch(a.logs, a.max_batch)
+    runs = [
+        ('single', 'vectorized', lambda d: len(decode_transfer_single(d)[0]), single),
+        ('single', 'python', scalar_single, single.iloc[:a.scalar_logs]),
+        ('batch', 'vectorized', lambda d: len(decode_transfer_batch(d)[1]), batch),
+        ('batch', 'python', scalar_batch, batch.iloc[:a.scalar_logs]),
+    ]
+    for kind, decoder, fn, data in runs:
+        print(json.dumps(_measure(kind, decoder, fn, data, a.repeat)), flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
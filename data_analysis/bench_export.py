@@ -0,0 +1,98 @@
+"""
+Benchmark: sérialisation des exports (_respond_df) — matérialisation complète vs streaming par lots.
+
+Jeu synthétique type /flows (from, to, token_address, count, amount_token), 5M lignes par défaut.
+Chaque (format, mode) tourne dans un sous-processus pour isoler le pic RSS.
+- legacy: ancien comportement (StringIO CSV complet, BytesIO Parquet complet, to_dict + json.dumps)
+- stream: _iter_df (lots de STREAM_BATCH_ROWS lignes, un row group Parquet par lot)
+
+Usage:
+    python bench_export.py [--rows 5000000] [--formats csv,json,ndjson,parquet] [--modes legacy,stream]
+
+Sortie: une ligne JSON par mesure {fmt, mode, rows, ttfb_s, total_s, bytes, peak_rss_delta_mb}.
+"""
+
+from __future__ import annotations
+import argparse
+import io
+import json
+import multiprocessing as mp
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    pool = np.array(['0x%040x' % v for v in rng.integers(0, 2**63, 100_000)], dtype=object)
+    tokens = pool[:500]
+    return pd.DataFrame({
+        'from': pool[rng.integers(0, len(pool), rows)],
+        'to': pool[rng.integers(0, len(pool), rows)],
+        'token_address': tokens[rng.integers(0, len(tokens), rows)],
+        'count': rng.integers(1, 1000, rows),
+        'amount_token': rng.random(rows) * 1e6,
+    })
+
+
+def _legacy_chunks(df: pd.DataFrame, fmt: str):
+    if fmt == 'csv':
+        buf = io.StringIO()
+        df.to_csv(buf, index=False)
+        yield buf.getvalue().encode('utf-8')
+    elif fmt == 'parquet':
+        import pyarrow as pa, pyarrow.parquet as pq
+        buf = io.BytesIO()
+        pq.write_table(pa.Table.from_pandas(df), buf)
+        yield buf.getvalue()
+    elif fmt == 'json':
+        yield json.dumps(df.to_dict(orient='records'), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    else:
+        yield b'\n'.join(json.dumps(r, ensure_ascii=False, separators=(',', ':')).encode('utf-8') for r in df.to_dict(orient='records')) + b'\n'
+
+
+def _rss_mb() -> float:
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2**20
+
+
+def _run(fmt: str, mode: str, rows: int, out) -> None:
+    import hyper_evm_step1_events as H
+
+    df = make_frame(rows)
+    base = _rss_mb()
+    t0 = time.perf_counter()
+    chunks = _legacy_chunks(df, fmt) if mode == 'legacy' else H._iter_df(df, fmt)
+    ttfb, total_bytes = None, 0
+    for chunk in chunks:
+        if ttfb is None and len(chunk) > 1:  # ignore le '[' initial du JSON
+            ttfb = time.perf_counter() - t0
+        total_bytes += len(chunk)
+    out.send({'fmt': fmt, 'mode': mode, 'rows': rows, 'ttfb_s': round(ttfb or 0.0, 4),
+              'total_s': round(time.perf_counter() - t0, 3), 'bytes': total_bytes,
+              'peak_rss_delta_mb': round(_rss_mb() - base, 1)})
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--rows', type=int, default=5_000_000)
+    p.add_argument('--formats', default='csv,json,ndjson,parquet')
+    p.add_argument('--modes', default='legacy,stream')
+    a = p.parse_args(argv)
+    ctx = mp.get_context('spawn')
+    for fmt in a.formats.split(','):
+        for mode in a.modes.split(','):
+            recv, send = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_run, args=(fmt, mode, a.rows, send))
+            proc.start()
+            proc.join()
+            result = recv.recv() if recv.poll() else {'fmt': fmt, 'mode': mode, 'error': f'exit code {proc.exitcode}'}
+            print(json.dumps(result), flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
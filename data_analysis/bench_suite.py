@@ -0,0 +1,352 @@
+"""
+Benchmark: suite de performance des fonctions d'analyse (hyper_evm_step1_events) et des endpoints de l'API.
+
+Jeu synthétique au schéma de l'indexer (indexer/src/database/schema.sql: blocks, transactions, event_logs):
+topic0 répartis comme sur une chaîne EVM (Transfer ERC-20/721 majoritaires, Approval, ERC-1155, events inconnus),
+tokens et comptes tirés selon une loi de Zipf (quelques contrats / comptes concentrent l'activité).
+- functions: temps (meilleur de --repeat) et pic mémoire Python (tracemalloc, passe séparée) par fonction
+- api: endpoints de create_api_app via un client HTTP en processus (httpx.ASGITransport):
+  cold_s (premier appel, dérivés compris), seconds (calcul + sérialisation, cache de réponses vidé, meilleur de --repeat),
+  puis --requests requêtes à --concurrency simultanées sur cache chaud: latences p50/p95/max, débit
+Chaque taille tourne dans un sous-processus (pics mémoire isolés).
+
+Usage:
+    python bench_suite.py [--sizes 10000,1000000,10000000] [--suites functions,api] [--repeat 3]
+                          [--logs-per-tx 3] [--txs-per-block 20] [--out results.json]
+                          [--baseline previous.json] [--threshold 0.25] [--min-seconds 0.01]
+
+Sortie: document JSON {meta, results: [{suite, name, rows, seconds, peak_mb, ...}], regressions} (stdout ou --out).
+Avec --baseline: chaque mesure est comparée à la même (suite, name, rows) de la référence; régression si seconds
+ou peak_mb dépasse la référence de plus de --threshold (ratio, temps < --min-seconds ignorés) → code de sortie 1.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import multiprocessing as mp
+import platform
+import time
+import tracemalloc
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+TOPICS = {
+    'transfer': "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef",
+    'approval': "0x8c5be1e5ebec7d5bd14f71427d1e84f3dd0314c0f7b2291e5b200ac8c7c3b925",
+    'approval_for_all': "0x17307eab39ab6107e8899845ad3d59bd9653f200f220920489ca2b5937696c31",
+    'transfer_single': "0xc3d58168c5ae7397731d063d5bbf3d657854427343f4c083240f7aacaa2d0f62",
+    'transfer_batch': "0x4a39dc06d4c0dbc64b70af90fd698a233a518aa5d07e595d983b8c0526c8f7fb",
+}
+# part des logs par type d'event (Transfer: 15 % d'ERC-721, topic3 = tokenId)
+EVENT_MIX = {'transfer': 0.55, 'approval': 0.15, 'approval_for_all': 0.01, 'transfer_single': 0.04,
+             'transfer_batch': 0.01, 'unknown': 0.24}
+ERC721_SHARE = 0.15
+# input_data des transactions: sélecteurs connus, inconnus, transferts natifs ('0x')
+METHOD_MIX = {'0xa9059cbb': 0.30, '0x23b872dd': 0.10, '0x095ea7b3': 0.08, 'unknown': 0.42, '0x': 0.10}
+ZIPF_A = 1.3
+BATCH_MAX = 4
+
+API_ENDPOINTS = [
+    '/info', '/events/types', '/tx/timeseries?freq=h', '/gas/timeseries?freq=h', '/flows/basic?top=30',
+    '/tokens/top?k=10', '/flows/amounts?top=30', '/address/{addr}/counterparties', '/address/{addr}/tokens',
+    '/address/{addr}/paths?max_hops=2', '/export.zip?freq=d',
+]
+
+
+def _hex_pool(rng: np.random.Generator, n: int, digits: int) -> np.ndarray:
+    words = rng.integers(0, 2**63, (n, -(-digits // 16)), dtype=np.int64)
+    return np.array(['0x' + ''.join(f'{w:016x}' for w in row)[:digits] for row in words.tolist()], dtype=object)
+
+
+def _zipf(rng: np.random.Generator, n_items: int, size: int) -> np.ndarray:
+    # rangs de Zipf repliés sur n_items, permutés (l'id 0 n'est pas systématiquement le plus actif)
+    return rng.permutation(n_items)[(rng.zipf(ZIPF_A, size) - 1) % n_items]
+
+
+def make_frames(n_logs: int, *, logs_per_tx: float = 3.0, txs_per_block: float = 20.0, n_accounts: int | None = None,
+                n_tokens: int | None = None, seed: int = 0) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """(events, txs, blocks) synthétiques; chaînes tirées dans des pools (génération de 10M logs en secondes)."""
+    rng = np.random.default_rng(seed)
+    n_txs = max(int(n_logs / logs_per_tx), 1)
+    n_blocks = max(int(n_txs / txs_per_block), 1)
+    n_accounts = n_accounts or max(min(n_logs // 5, 2_000_000), 100)
+    n_tokens = n_tokens or max(min(n_logs // 200, 20_000), 10)
+
+    numbers = np.arange(1_000_000, 1_000_000 + n_blocks, dtype=np.int64)
+    gas_limit = np.full(n_blocks, 30_000_000, dtype=np.int64)
+    blocks = pd.DataFrame({
+        'number': numbers,
+        'hash': _hex_pool(rng, n_blocks, 64),
+        'timestamp': 1_700_000_000 + np.cumsum(rng.integers(1, 4, n_blocks)),
+        'gas_limit': gas_limit,
+        'gas_used': (gas_limit * rng.beta(2, 3, n_blocks)).astype(np.int64),
+        'base_fee_per_gas': rng.integers(10**8, 5 * 10**10, n_blocks),
+        'miner': _hex_pool(rng, 8, 40)[rng.integers(0, 8, n_blocks)],
+    })
+
+    accounts, tokens = _hex_pool(rng, n_accounts, 40), _hex_pool(rng, n_tokens, 40)
+    selectors = np.array(list(METHOD_MIX), dtype=object)
+    sel = selectors[rng.choice(len(selectors), n_txs, p=list(METHOD_MIX.values()))]
+    unknown = sel == 'unknown'
+    sel[unknown] = _hex_pool(rng, 500, 8)[rng.integers(0, 500, int(unknown.sum()))]
+    args = '0' * 128
+    tx_block = np.sort(rng.integers(0, n_blocks, n_txs))
+    txs = pd.DataFrame({
+        'hash': _hex_pool(rng, n_txs, 64),
+        'block_number': numbers[tx_block],
+        'from_address': accounts[_zipf(rng, n_accounts, n_txs)],
+        'to_address': tokens[_zipf(rng, n_tokens, n_txs)],
+        'input_data': np.where(sel == '0x', '0x', sel + args).astype(object),
+    })
+
+    kinds = np.array(list(EVENT_MIX), dtype=object)
+    kind_idx = rng.choice(len(kinds), n_logs, p=list(EVENT_MIX.values()))
+    kind = kinds[kind_idx]
+    tx_of = np.sort(rng.integers(0, n_txs, n_logs))
+    topic0 = np.array([TOPICS.get(k) for k in kinds], dtype=object)[kind_idx]
+    is_unknown = kind == 'unknown'
+    topic0[is_unknown] = _hex_pool(rng, 200, 64)[rng.integers(0, 200, int(is_unknown.sum()))]
+    padded = np.array(['0x' + '0' * 24 + a[2:] for a in accounts.tolist()], dtype=object)
+    party = lambda: padded[_zipf(rng, n_accounts, n_logs)]
+    topic1, topic2 = party(), party()
+    topic3 = np.full(n_logs, None, dtype=object)
+    data = np.full(n_logs, '0x', dtype=object)
+
+    is_transfer = kind == 'transfer'
+    is_721 = is_transfer & (rng.random(n_logs) < ERC721_SHARE)
+    topic3[is_721] = _hex_pool(rng, 10_000, 64)[rng.integers(0, 10_000, int(is_721.sum()))]
+    # montants à queue lourde (jusqu'à 1e30 unités: plusieurs limbs uint64)
+    amounts = np.array([f'0x{int(v):064x}' for v in np.minimum(rng.pareto(1.2, 50_000) * 1e18, 1e30).tolist()], dtype=object)
+    erc20 = is_transfer & ~is_721
+    data[erc20] = amounts[rng.integers(0, len(amounts), int(erc20.sum()))]
+    data[kind == 'approval'] = amounts[rng.integers(0, len(amounts), int((kind == 'approval').sum()))]
+    data[kind == 'approval_for_all'] = '0x' + '0' * 63 + '1'
+    erc1155 = (kind == 'transfer_single') | (kind == 'transfer_batch')
+    # ERC-1155: topic1 = operator, topic2 = from, topic3 = to
+    topic3[erc1155] = party()[erc1155]
+    single = kind == 'transfer_single'
+    single_pool = np.array([f'0x{i:064x}{v:064x}' for i, v in zip(rng.integers(0, 1000, 5000).tolist(),
+                                                                 rng.integers(1, 10**6, 5000).tolist())], dtype=object)
+    data[single] = single_pool[rng.integers(0, len(single_pool), int(single.sum()))]
+    batch_pool = []
+    for k in rng.integers(1, BATCH_MAX + 1, 2000).tolist():
+        words = [0x40, 0x40 + 32 * (k + 1), k, *rng.integers(0, 1000, k).tolist(), k, *rng.integers(1, 10**6, k).tolist()]
+        batch_pool.append('0x' + ''.join(f'{w:064x}' for w in words))
+    batch = kind == 'transfer_batch'
+    data[batch] = np.array(batch_pool, dtype=object)[rng.integers(0, len(batch_pool), int(batch.sum()))]
+
+    log_index = np.arange(n_logs) - np.searchsorted(tx_of, tx_of)
+    events = pd.DataFrame({
+        'transaction_hash': txs['hash'].to_numpy(dtype=object)[tx_of],
+        'block_number': txs['block_number'].to_numpy()[tx_of],
+        'log_index': log_index.astype(np.int32),
+        'address': tokens[_zipf(rng, n_tokens, n_logs)],
+        'topic0': topic0, 'topic1': topic1, 'topic2': topic2, 'topic3': topic3,
+        'data': data,
+        'id': np.arange(1, n_logs + 1, dtype=np.int64),
+    })
+    return events, txs, blocks
+
+
+# --- Mesures ---
+
+def _measure(fn: Callable[[], Any], repeat: int, memory: bool) -> dict:
+    best = float('inf')
+    for _ in range(max(repeat, 1)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    out = {'seconds': round(best, 4)}
+    if memory:
+        # passe séparée: tracemalloc ralentit les allocations d'objets Python
+        tracemalloc.start()
+        try:
+            fn()
+            out['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        finally:
+            tracemalloc.stop()
+    return out
+
+
+def _function_cases(events: pd.DataFrame, txs: pd.DataFrame, blocks: pd.DataFrame) -> list[tuple[str, Callable[[], Any]]]:
+    import hyper_evm_step1_events as H
+    from address_dict import AddressDictionary
+
+    tagged = H.tag_events_simple(events)
+    flows = H.build_token_flows_basic(tagged)
+    return [
+        ('tag_events_simple', lambda: H.tag_events_simple(events)),
+        ('label_events_basic', lambda: H.label_events_basic(events)),
+        ('label_tx_methods_basic', lambda: H.label_tx_methods_basic(txs)),
+        ('build_token_flows_basic', lambda: H.build_token_flows_basic(tagged)),
+        ('build_token_flows_with_amounts', lambda: H.build_token_flows_with_amounts(tagged)),
+        # variante utilisée par l'API (colonnes uint256 + ids internés)
+        ('build_token_flows_with_amounts[compact]',
+         lambda: H.build_token_flows_with_amounts(tagged, compact=True, addresses=AddressDictionary())),
+        ('prepare_tx_timeseries', lambda: H.prepare_tx_timeseries(blocks, txs, 'h')),
+        ('prepare_gas_timeseries', lambda: H.prepare_gas_timeseries(blocks, 'h')),
+        ('build_transfer_counts_timeseries', lambda: H.build_transfer_counts_timeseries(tagged, blocks, 'h')),
+        ('_build_export_zip', lambda: H._build_export_zip(blocks, txs, events, 'h', tagged=tagged, flows_basic=flows)),
+    ]
+
+
+def bench_functions(frames: tuple, rows: int, repeat: int, memory: bool) -> list[dict]:
+    results = []
+    for name, fn in _function_cases(*frames):
+        m = _measure(fn, repeat, memory)
+        results.append({'suite': 'functions', 'name': name, 'rows': rows, **m,
+                        'rows_per_s': round(rows / m['seconds']) if m['seconds'] else None})
+    return results
+
+
+def _quantile_ms(values: list[float], q: float) -> float:
+    return round(float(np.quantile(values, q)) * 1000, 2) if values else None
+
+
+async def _bench_api(frames: tuple, rows: int, repeat: int, requests: int, concurrency: int) -> list[dict]:
+    import httpx
+    import hyper_evm_step1_events as H
+
+    app = H.create_api_app(*frames)
+    store = app.state.store
+    results = []
+    try:
+        # adresse la plus active (émettrice de la première paire du top des flux)
+        addr = store.top_flow_pairs(1)['from'].iloc[0]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+            for template in API_ENDPOINTS:
+                url = template.format(addr=addr)
+                t0 = time.perf_counter()
+                r = await client.get(url)
+                cold = time.perf_counter() - t0
+                best = float('inf')
+                for _ in range(max(repeat, 1)):
+                    store.responses.clear()
+                    t0 = time.perf_counter()
+                    await client.get(url)
+                    best = min(best, time.perf_counter() - t0)
+                latencies, statuses = [], []
+                sem = asyncio.Semaphore(max(concurrency, 1))
+
+                async def one():
+                    async with sem:
+                        t = time.perf_counter()
+                        resp = await client.get(url)
+                        latencies.append(time.perf_counter() - t)
+                        statuses.append(resp.status_code)
+
+                t0 = time.perf_counter()
+                await asyncio.gather(*(one() for _ in range(requests)))
+                wall = time.perf_counter() - t0
+                results.append({
+                    'suite': 'api', 'name': template, 'rows': rows, 'status': r.status_code, 'bytes': len(r.content),
+                    'cold_s': round(cold, 4), 'seconds': round(best, 4),
+                    'requests': requests, 'concurrency': concurrency,
+                    'p50_ms': _quantile_ms(latencies, 0.5), 'p95_ms': _quantile_ms(latencies, 0.95),
+                    'max_ms': round(max(latencies) * 1000, 2) if latencies else None,
+                    'rps': round(requests / wall, 1) if wall > 0 else None,
+                    'errors': sum(s >= 400 for s in statuses),
+                })
+    finally:
+        app.state.executor.shutdown()
+    return results
+
+
+def _run(size: int, opts: dict, out) -> None:
+    try:
+        t0 = time.perf_counter()
+        frames = make_frames(size, logs_per_tx=opts['logs_per_tx'], txs_per_block=opts['txs_per_block'], seed=opts['seed'])
+        results = [{'suite': 'setup', 'name': 'make_frames', 'rows': size, 'seconds': round(time.perf_counter() - t0, 4),
+                    'txs': len(frames[1]), 'blocks': len(frames[2])}]
+        if 'functions' in opts['suites']:
+            results += bench_functions(frames, size, opts['repeat'], opts['memory'])
+        if 'api' in opts['suites']:
+            results += asyncio.run(_bench_api(frames, size, opts['repeat'], opts['requests'], opts['concurrency']))
+        out.send(results)
+    except Exception as e:  # remonté au parent comme une mesure en erreur
+        out.send([{'suite': 'setup', 'name': 'error', 'rows': size, 'error': repr(e)}])
+
+
+# --- Comparaison à une référence ---
+
+COMPARED_METRICS = ('seconds', 'peak_mb', 'p95_ms')
+
+
+def compare(results: list[dict], baseline: dict, threshold: float = 0.25, min_seconds: float = 0.01) -> list[dict]:
+    """Mesures dépassant la référence de plus de `threshold` (ratio); temps sous min_seconds ignorés (bruit)."""
+    ref = {(r['suite'], r['name'], r['rows']): r for r in baseline.get('results', [])}
+    regressions = []
+    for r in results:
+        b = ref.get((r['suite'], r['name'], r['rows']))
+        if b is None:
+            continue
+        for metric in COMPARED_METRICS:
+            cur, old = r.get(metric), b.get(metric)
+            if cur is None or not old:
+                continue
+            floor = min_seconds * 1000 if metric.endswith('_ms') else min_seconds
+            if metric != 'peak_mb' and max(cur, old) < floor:
+                continue
+            if cur > old * (1 + threshold):
+                regressions.append({'suite': r['suite'], 'name': r['name'], 'rows': r['rows'], 'metric': metric,
+                                    'baseline': old, 'current': cur, 'ratio': round(cur / old, 3)})
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument('--sizes', default='10000,1000000')
+    p.add_argument('--suites', default='functions,api')
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--memory', action=argparse.BooleanOptionalAction, default=True)
+    p.add_argument('--requests', type=int, default=200)
+    p.add_argument('--concurrency', type=int, default=16)
+    p.add_argument('--logs-per-tx', type=float, default=3.0)
+    p.add_argument('--txs-per-block', type=float, default=20.0)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--out', default=None)
+    p.add_argument('--baseline', default=None)
+    p.add_argument('--threshold', type=float, default=0.25)
+    p.add_argument('--min-seconds', type=float, default=0.01)
+    a = p.parse_args(argv)
+    opts = {'suites': set(a.suites.split(',')), 'repeat': a.repeat, 'memory': a.memory, 'requests': a.requests,
+            'concurrency': a.concurrency, 'logs_per_tx': a.logs_per_tx, 'txs_per_block': a.txs_per_block, 'seed': a.seed}
+    ctx = mp.get_context('spawn')
+    results = []
+    for size in (int(float(s)) for s in a.sizes.split(',')):
+        recv, send = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_run, args=(size, opts, send))
+        proc.start()
+        # réception avant join: le résultat peut dépasser le buffer du pipe
+        part = recv.recv() if recv.poll(None) else None
+        proc.join()
+        if part is None:
+            part = [{'suite': 'setup', 'name': 'error', 'rows': size, 'error': f'exit code {proc.exitcode}'}]
+        results += part
+    doc = {
+        'meta': {'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'python': platform.python_version(),
+                 'numpy': np.__version__, 'pandas': pd.__version__, 'machine': platform.machine(),
+                 'cpus': mp.cpu_count(), 'options': {k: sorted(v) if isinstance(v, set) else v for k, v in opts.items()}},
+        'results': results,
+        'regressions': [],
+    }
+    if a.baseline:
+        with open(a.baseline, encoding='utf-8') as f:
+            doc['regressions'] = compare(results, json.load(f), a.threshold, a.min_seconds)
+        doc['meta']['baseline'] = a.baseline
+        doc['meta']['threshold'] = a.threshold
+    text = json.dumps(doc, indent=2)
+    if a.out:
+        with open(a.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 1 if doc['regressions'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,136 @@
+"""
+Module: evm_abi.py
+
+But: décodage ABI vectorisé des payloads `data` des logs (mots de 32 octets → limbs uint64)
+- Tous les payloads d'un lot sont concaténés puis convertis d'un bloc (bytes.fromhex, repli LUT si invalide; vue big-endian)
+- TransferSingle(operator, from, to, id, value): data = id, value
+- TransferBatch(operator, from, to, ids[], values[]): data = offset ids, offset values, puis les deux tableaux
+  dynamiques (longueur + éléments); un log valide donne une ligne par (id, value)
+- Offsets / longueurs validés (alignement 32 octets, bornes, |ids| == |values|); payload invalide → ligne invalide
+
+Dépendances: numpy, pandas (+ uint256.py)
+"""
+
+from __future__ import annotations
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from uint256 import HEX_LUT, UInt256Array
+
+WORD_HEX = 64
+# logs par lot de décodage (borne la mémoire du buffer concaténé)
+DECODE_CHUNK = 200_000
+_MAX_SMALL = np.uint64(2 ** 32)
+
+
+class PayloadWords:
+    """Mots 256 bits de n payloads: `limbs` (W, 4) petit-boutistes, mots du payload i = [start[i], start[i] + count[i]).
+
+    Un caractère non hexadécimal invalide tout le payload (count = 0); un reliquat < 64 chiffres est ignoré.
+    """
+
+    __slots__ = ('limbs', 'start', 'count')
+
+    def __init__(self, limbs: np.ndarray, start: np.ndarray, count: np.ndarray):
+        self.limbs = limbs
+        self.start = start
+        self.count = count
+
+    @classmethod
+    def from_hex(cls, data: pd.Series) -> 'PayloadWords':
+        raw = data.to_numpy(dtype=object)
+        n = len(raw)
+        is_hex = np.fromiter((isinstance(x, str) and x[:2] in ('0x', '0X') for x in raw), dtype=bool, count=n)
+        payloads = [x[2:] for x in raw[is_hex]]
+        lens = np.fromiter(map(len, payloads), dtype=np.int64, count=len(payloads))
+        nwords = lens // WORD_HEX
+        partial = np.flatnonzero(lens % WORD_HEX)
+        for j in partial:
+            payloads[j] = payloads[j][:nwords[j] * WORD_HEX]
+        joined = ''.join(payloads)
+        total = int(nwords.sum())
+        try:
+            octets = np.frombuffer(bytes.fromhex(joined), dtype=np.uint8)
+        except ValueError:
+            octets = None
+        if octets is not None and len(octets) == total * 32:
+            bad_word = np.zeros(total, dtype=bool)
+        else:
+            # payload(s) invalide(s) (ou blancs acceptés par fromhex): LUT caractère par caractère,
+            # un code point → un octet (hors latin-1 remplacé par '?', rejeté par la LUT)
+            nib = HEX_LUT[np.frombuffer(joined.encode('latin-1', errors='replace'), dtype=np.uint8)]
+            bad_word = (nib == 255).reshape(total, WORD_HEX).any(axis=1)
+            octets = (nib[0::2] << 4) | nib[1::2]
+        limbs = octets.view('>u8').reshape(total, 4)[:, ::-1].astype(np.uint64)
+        count = np.zeros(n, dtype=np.int64)
+        count[is_hex] = nwords
+        if bad_word.any():
+            owner = np.repeat(np.flatnonzero(is_hex), nwords)
+            count[np.unique(owner[bad_word])] = 0
+        start = np.zeros(n, dtype=np.int64)
+        start[is_hex] = np.cumsum(nwords) - nwords
+        return cls(limbs, start, count)
+
+    def word(self, idx: np.ndarray) -> UInt256Array:
+        return UInt256Array(self.limbs[idx])
+
+    def small(self, rel: np.ndarray, ok: np.ndarray) -> np.ndarray:
+        """Mot `rel` (relatif au début de chaque payload) lu comme entier < 2**32 (offset, longueur); -1 sinon."""
+        ok = ok & (rel >= 0) & (rel < self.count)
+        out = np.full(len(rel), -1, dtype=np.int64)
+        if ok.any():
+            w = self.limbs[self.start[ok] + rel[ok]]
+            fits = (w[:, 1:] == 0).all(axis=1) & (w[:, 0] < _MAX_SMALL)
+            out[np.flatnonzero(ok)[fits]] = w[fits, 0].astype(np.int64)
+        return out
+
+
+def _chunks(n: int, size: int = DECODE_CHUNK):
+    for lo in range(0, n, size):
+        yield lo, min(lo + size, n)
+
+
+def decode_transfer_single(data: pd.Series) -> Tuple[UInt256Array, UInt256Array]:
+    """(id, value) de TransferSingle; payload de moins de deux mots ou invalide → valeurs invalides."""
+    n = len(data)
+    ids, values = UInt256Array.empty(n, width=4), UInt256Array.empty(n, width=4)
+    for lo, hi in _chunks(n):
+        w = PayloadWords.from_hex(data.iloc[lo:hi])
+        ok = np.flatnonzero(w.count >= 2)
+        ids[lo + ok] = w.word(w.start[ok])
+        values[lo + ok] = w.word(w.start[ok] + 1)
+    return ids.compact(), values.compact()
+
+
+def decode_transfer_batch(data: pd.Series) -> Tuple[np.ndarray, np.ndarray, UInt256Array, UInt256Array]:
+    """Décode ids[] / values[] de TransferBatch.
+
+    Retourne (n par log, -1 si payload invalide; position du log de chaque ligne; ids; values),
+    lignes dans l'ordre des logs puis des éléments.
+    """
+    n = len(data)
+    sizes = np.full(n, -1, dtype=np.int64)
+    rows, ids, values = [], [], []
+    for lo, hi in _chunks(n):
+        w = PayloadWords.from_hex(data.iloc[lo:hi])
+        m = hi - lo
+        ok = w.count >= 2
+        off_ids, off_vals = w.small(np.zeros(m, dtype=np.int64), ok), w.small(np.ones(m, dtype=np.int64), ok)
+        ok &= (off_ids >= 0) & (off_vals >= 0) & (off_ids % 32 == 0) & (off_vals % 32 == 0)
+        p_ids, p_vals = off_ids // 32, off_vals // 32
+        n_ids, n_vals = w.small(p_ids, ok), w.small(p_vals, ok)
+        ok &= (n_ids >= 0) & (n_ids == n_vals)
+        ok &= (p_ids + 1 + n_ids <= w.count) & (p_vals + 1 + n_vals <= w.count)
+        k = np.where(ok, n_ids, 0)
+        sizes[lo:hi] = np.where(ok, n_ids, -1)
+        owner = np.repeat(np.arange(m), k)
+        elem = np.arange(len(owner)) - np.repeat(np.cumsum(k) - k, k)
+        base = w.start[owner] + 1 + elem
+        rows.append(lo + owner)
+        ids.append(w.word(base + p_ids[owner]))
+        values.append(w.word(base + p_vals[owner]))
+    if not rows:
+        return sizes, np.empty(0, dtype=np.int64), UInt256Array.empty(0), UInt256Array.empty(0)
+    return (sizes, np.concatenate(rows), UInt256Array.concat(ids).compact(), UInt256Array.concat(values).compact())
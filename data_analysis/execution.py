@@ -0,0 +1,221 @@
+"""
+Module: execution.py
+
+But: couche d'exécution des calculs des endpoints, hors de la boucle d'événements, bornée et dédupliquée
+- Coalescing: requêtes identiques concurrentes (même clé) → un seul calcul, résultat partagé par tous les appelants
+- Limite de calculs en vol: au-delà, ExecutorSaturated (l'API répond 503 + Retry-After)
+- Pool de processus optionnel (spawn) pour les calculs CPU: les tableaux d'un frame sont publiés une fois par
+  version en mémoire partagée (buffers NumPy), les workers s'y attachent sans copie ni pickling de DataFrames
+
+Dépendances: numpy (+ metrics.py)
+"""
+
+from __future__ import annotations
+import asyncio
+import contextvars
+import logging
+import multiprocessing as mp
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Hashable, Mapping
+
+import numpy as np
+
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """Trop de calculs distincts en vol: la requête doit être refusée (503)."""
+
+
+class SharedArrays:
+    """Tableaux NumPy numériques copiés une fois dans des segments SharedMemory, attachables par nom dans un worker.
+
+    `refs` compte les tâches en vol; une publication remplacée (`retire`) est libérée à la fin de la dernière.
+    """
+
+    def __init__(self, arrays: Mapping[str, np.ndarray]):
+        self.token = uuid.uuid4().hex
+        self.spec: dict[str, tuple] = {}
+        self._segments: list[SharedMemory] = []
+        self._lock = threading.Lock()
+        self.refs = 0
+        self.retired = False
+        try:
+            for name, arr in arrays.items():
+                arr = np.ascontiguousarray(arr)
+                shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+                self._segments.append(shm)
+                np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+                self.spec[name] = (shm.name, arr.dtype.str, arr.shape)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def handle(self) -> tuple:
+        return self.token, self.spec
+
+    @property
+    def nbytes(self) -> int:
+        return sum(int(np.prod(shape)) * np.dtype(dt).itemsize for _, dt, shape in self.spec.values())
+
+    def acquire(self) -> None:
+        with self._lock:
+            self.refs += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.refs -= 1
+            done = self.retired and self.refs == 0
+        if done:
+            self.close()
+
+    def retire(self) -> None:
+        with self._lock:
+            self.retired = True
+            done = self.refs == 0
+        if done:
+            self.close()
+
+    def close(self) -> None:
+        for shm in self._segments:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._segments = []
+
+
+# côté worker: publication attachée (une à la fois: un worker exécute une tâche à la fois)
+_ATTACHED: dict[str, Any] = {'token': None, 'segments': [], 'arrays': {}}
+
+
+def attach(handle: tuple) -> dict[str, np.ndarray]:
+    """Vues en lecture seule sur les segments d'une publication; la précédente est détachée."""
+    token, spec = handle
+    if _ATTACHED['token'] != token:
+        old = _ATTACHED['segments']
+        _ATTACHED.update(token=None, segments=[], arrays={})
+        for shm in old:
+            shm.close()
+        segments, arrays = [], {}
+        for name, (shm_name, dtype, shape) in spec.items():
+            shm = SharedMemory(name=shm_name)
+            segments.append(shm)
+            arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+            arr.flags.writeable = False
+            arrays[name] = arr
+        _ATTACHED.update(token=token, segments=segments, arrays=arrays)
+    return _ATTACHED['arrays']
+
+
+def _run_shared(fn: Callable[..., Any], handle: tuple, args: tuple) -> Any:
+    return fn(attach(handle), *args)
+
+
+class _LocalArrays:
+    """Publication sans pool de processus: les tableaux restent ceux du processus courant."""
+
+    def __init__(self, arrays: Mapping[str, np.ndarray]):
+        self.arrays = dict(arrays)
+
+    def acquire(self) -> None:
+        pass
+
+    def release(self) -> None:
+        pass
+
+    def retire(self) -> None:
+        pass
+
+
+class ComputeExecutor:
+    """Exécute les calculs des endpoints: threads (coalescing + limite) et, si `processes` > 0, pool de processus.
+
+    max_inflight: nombre maximal de calculs distincts en cours (et de threads); au-delà ExecutorSaturated.
+    processes: taille du pool de processus pour `cpu()` (0: exécution dans le thread appelant).
+    """
+
+    def __init__(self, *, max_inflight: int = 16, processes: int = 0):
+        self.max_inflight = max(int(max_inflight), 1)
+        self.processes = max(int(processes), 0)
+        self._threads = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix='api-compute')
+        self._pool = ProcessPoolExecutor(self.processes, mp_context=mp.get_context('spawn')) if self.processes else None
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._publish_lock = threading.Lock()
+        self._published: dict[Hashable, tuple[Hashable, Any]] = {}
+        self.coalesced = 0
+        self.rejected = 0
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: Hashable, fn: Callable[..., Any], *args: Any) -> Any:
+        """fn(*args) dans un thread; un seul calcul par clé en vol, les appelants concurrents en partagent le résultat."""
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            return await asyncio.shield(fut)
+        if len(self._inflight) >= self.max_inflight:
+            self.rejected += 1
+            raise ExecutorSaturated(f"{len(self._inflight)} calculs en cours (max {self.max_inflight})")
+        loop = asyncio.get_running_loop()
+        # contexte de l'appelant propagé au thread (étapes Server-Timing de la requête, cf. metrics.py)
+        fut = loop.run_in_executor(self._threads, contextvars.copy_context().run, fn, *args)
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: l'annulation d'un client (déconnexion) n'interrompt pas le calcul partagé
+        return await asyncio.shield(fut)
+
+    def publish(self, name: Hashable, version: Hashable, build: Callable[[], Mapping[str, np.ndarray]]):
+        """Publication des tableaux `name` pour `version` (construite une fois); la version précédente est retirée.
+
+        La publication est retournée avec une référence prise sous le verrou (une publication concurrente ne peut
+        pas la libérer entre-temps): à passer à cpu(), qui la rend.
+        """
+        with self._publish_lock:
+            cur = self._published.get(name)
+            if cur is not None and cur[0] == version:
+                cur[1].acquire()
+                return cur[1]
+            arrays = build()
+            pub = SharedArrays(arrays) if self._pool is not None else _LocalArrays(arrays)
+            pub.acquire()
+            self._published[name] = (version, pub)
+        if cur is not None:
+            cur[1].retire()
+        return pub
+
+    def cpu(self, fn: Callable[..., Any], pub, *args: Any) -> Any:
+        """fn(arrays, *args) sur une publication de publish(): dans un worker du pool (attache sans copie) ou sur place.
+
+        Appel bloquant, à faire depuis un thread de calcul (cf. run); fn et args doivent être picklables.
+        La référence prise par publish() est rendue à la fin de l'appel.
+        """
+        try:
+            with METRICS.stage(fn.__name__.strip('_')):
+                if self._pool is None or not isinstance(pub, SharedArrays):
+                    return fn(pub.arrays, *args)
+                return self._pool.submit(_run_shared, fn, pub.handle, args).result()
+        finally:
+            pub.release()
+
+    def stats(self) -> dict:
+        return {'inflight': self.inflight, 'max_inflight': self.max_inflight, 'processes': self.processes,
+                'coalesced': self.coalesced, 'rejected': self.rejected}
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        with self._publish_lock:
+            for _, pub in self._published.values():
+                pub.retire()
+            self._published = {}
@@ -0,0 +1,135 @@
+"""
+Module: flow_index.py
+
+But: index des lignes d'un frame de flux (ids d'adresses internés) pour les requêtes fenêtrées / filtrées
+- Ordre par bloc (tri stable): une fenêtre [start_block, end_block] = une tranche trouvée par recherche dichotomique
+- CSR par token et par adresse (from, ou to si différent): lignes d'une clé contiguës, triées par bloc
+- Requête token / adresse: tranche de la clé la plus sélective, fenêtre de blocs par dichotomie dans la tranche,
+  autre critère par masque sur la seule tranche → seules les lignes candidates sont touchées
+- Extension incrémentale: lot de blocs ≥ aux blocs indexés fusionné sans retri (cas du suivi de l'indexer)
+
+Dépendances: numpy
+"""
+
+from __future__ import annotations
+from typing import Tuple
+
+import numpy as np
+
+
+def _csr(keys: np.ndarray, rows: np.ndarray, n_keys: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(positions triées par clé, indptr); l'ordre relatif des lignes d'une même clé est conservé. Clé < 0 ignorée."""
+    ok = keys >= 0
+    keys, rows = keys[ok], rows[ok]
+    perm = rows[np.argsort(keys, kind='stable')]
+    indptr = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_keys), out=indptr[1:])
+    return perm, indptr
+
+
+def _pad_indptr(indptr: np.ndarray, n_keys: int) -> np.ndarray:
+    if len(indptr) >= n_keys + 1:
+        return indptr
+    return np.concatenate([indptr, np.full(n_keys + 1 - len(indptr), indptr[-1], dtype=indptr.dtype)])
+
+
+def _merge_csr(perm_a: np.ndarray, indptr_a: np.ndarray, perm_b: np.ndarray, indptr_b: np.ndarray,
+               n_keys: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Deux CSR → un seul, lignes de `a` avant celles de `b` pour chaque clé (placement direct, O(lignes))."""
+    indptr_a, indptr_b = _pad_indptr(indptr_a, n_keys), _pad_indptr(indptr_b, n_keys)
+    count_a, count_b = np.diff(indptr_a), np.diff(indptr_b)
+    indptr = np.zeros(n_keys + 1, dtype=np.int64)
+    np.cumsum(count_a + count_b, out=indptr[1:])
+    perm = np.empty(len(perm_a) + len(perm_b), dtype=np.int64)
+    keys = np.arange(n_keys)
+    ka, kb = np.repeat(keys, count_a), np.repeat(keys, count_b)
+    perm[np.arange(len(perm_a)) - indptr_a[ka] + indptr[ka]] = perm_a
+    perm[np.arange(len(perm_b)) - indptr_b[kb] + indptr[kb] + count_a[kb]] = perm_b
+    return perm, indptr
+
+
+def _window(blocks: np.ndarray, start_block: int | None, end_block: int | None) -> Tuple[int, int]:
+    lo = int(np.searchsorted(blocks, start_block, side='left')) if start_block is not None else 0
+    hi = int(np.searchsorted(blocks, end_block, side='right')) if end_block is not None else len(blocks)
+    return lo, max(lo, hi)
+
+
+class FlowIndex:
+    """Positions des lignes d'un frame de flux par bloc, par token et par adresse.
+
+    block / token / src / dst: colonnes du frame (int64 / ids int32, -1 si manquant), non copiées.
+    Les index ne sont jamais modifiés en place: `extend()` retourne un nouvel index.
+    """
+
+    def __init__(self, block: np.ndarray, token: np.ndarray, src: np.ndarray, dst: np.ndarray, n_keys: int, *,
+                 _parts: tuple | None = None):
+        self.block, self.token, self.src, self.dst = block, token, src, dst
+        self.n_keys = n_keys = max(int(n_keys), *(int(a.max()) + 1 for a in (token, src, dst) if len(a)), 0)
+        if _parts is not None:
+            self.by_block, self.token_perm, self.token_indptr, self.addr_perm, self.addr_indptr = _parts
+        else:
+            self.by_block = np.argsort(block, kind='stable')
+            # CSR construits depuis l'ordre par bloc: le tri stable par clé garde les blocs croissants dans chaque clé
+            self.token_perm, self.token_indptr = _csr(token[self.by_block], self.by_block, n_keys)
+            # adresse: entrée from puis entrée to de chaque ligne (to omis si from == to), en ordre de bloc
+            src_b, dst_b = src[self.by_block], dst[self.by_block]
+            keys = np.stack([src_b, np.where(dst_b != src_b, dst_b, -1)], axis=1).ravel()
+            self.addr_perm, self.addr_indptr = _csr(keys, np.repeat(self.by_block, 2), n_keys)
+        self.sorted_blocks = block[self.by_block]
+
+    def __len__(self) -> int:
+        return len(self.block)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.by_block, self.sorted_blocks, self.token_perm, self.token_indptr, self.addr_perm, self.addr_indptr)
+        return sum(a.nbytes for a in arrays)
+
+    def _slice(self, perm: np.ndarray, indptr: np.ndarray, key: int) -> np.ndarray:
+        if key < 0 or key >= len(indptr) - 1:
+            return perm[:0]
+        return perm[indptr[key]:indptr[key + 1]]
+
+    def rows(self, start_block: int | None = None, end_block: int | None = None, *, token: int | None = None,
+             address: int | None = None) -> np.ndarray:
+        """Positions des lignes du frame dans [start_block, end_block], du token et impliquant l'adresse (from ou to)."""
+        if token is None and address is None:
+            lo, hi = _window(self.sorted_blocks, start_block, end_block)
+            return self.by_block[lo:hi]
+        candidates = []
+        if token is not None:
+            candidates.append(self._slice(self.token_perm, self.token_indptr, token))
+        if address is not None:
+            candidates.append(self._slice(self.addr_perm, self.addr_indptr, address))
+        by_token = len(candidates[0]) <= len(candidates[-1]) if token is not None else False
+        rows = candidates[0] if by_token else candidates[-1]
+        if start_block is not None or end_block is not None:
+            lo, hi = _window(self.block[rows], start_block, end_block)
+            rows = rows[lo:hi]
+        if token is not None and address is not None:
+            # seconde clé: masque sur la tranche retenue
+            if by_token:
+                rows = rows[(self.src[rows] == address) | (self.dst[rows] == address)]
+            else:
+                rows = rows[self.token[rows] == token]
+        return rows
+
+    def extend(self, block: np.ndarray, token: np.ndarray, src: np.ndarray, dst: np.ndarray,
+               n_keys: int = 0) -> 'FlowIndex':
+        """Index du frame prolongé par un lot de lignes (positions à la suite des lignes existantes).
+
+        Lot de blocs ≥ aux blocs indexés: index du lot fusionnés avec les existants sans retri; sinon reconstruction.
+        """
+        n0 = len(self)
+        delta = FlowIndex(block, token, src, dst, max(n_keys, self.n_keys))
+        cols = [np.concatenate([a, b]) for a, b in ((self.block, block), (self.token, token), (self.src, src), (self.dst, dst))]
+        if not len(delta):
+            return FlowIndex(*cols, delta.n_keys, _parts=(self.by_block, self.token_perm, self.token_indptr,
+                                                            self.addr_perm, self.addr_indptr))
+        if n0 and block.min() < self.sorted_blocks[-1]:
+            return FlowIndex(*cols, delta.n_keys)
+        n = delta.n_keys
+        parts = (np.concatenate([self.by_block, n0 + delta.by_block]),
+                 *_merge_csr(self.token_perm, self.token_indptr, n0 + delta.token_perm, delta.token_indptr, n),
+                 *_merge_csr(self.addr_perm, self.addr_indptr, n0 + delta.addr_perm, delta.addr_indptr, n))
+        return FlowIndex(*cols, n, _parts=parts)
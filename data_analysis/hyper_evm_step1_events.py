@@ -2,28 +2,57 @@
 Module: hyper_evm_step1_events.py
 
 But: helpers d'enrichissement + API FastAPI pour Hyper EVM (propre & minimal)
-- Tagging des events
-- Flux (from → to)
-- Séries temporelles (tx, gaz)
-- API avec export JSON/CSV/Parquet
-- Chargement DB (PostgreSQL via SQLAlchemy)
-
-Dépendances: pandas, fastapi, uvicorn, sqlalchemy, psycopg2-binary, python-dotenv
-Optionnel pour Parquet API: pyarrow
+- Tagging des events, libellés des méthodes / events via un registre de signatures extensible (signatures.py)
+- Flux (from → to), requêtes fenêtrées (blocs / temps) et filtrées (token / adresse) via flow_index.py
+- Top tokens / flux approchés en mémoire bornée (mode=approx, sketches.py), maintenus à chaque append
+- Séries temporelles (tx, gaz, transferts): rollup 15min, fréquences plus larges dérivées du rollup
+- API avec export JSON/CSV/Parquet (frames enrichis calculés une fois + cache LRU des réponses)
+- Exécution des endpoints bornée (execution.py): coalescing des requêtes identiques, 503 si saturé, pool de processus optionnel
+- Instrumentation optionnelle (metrics.py): durées par étape, latences par route, /metrics Prometheus, Server-Timing
+- Chargement DB (PostgreSQL via SQLAlchemy, engine poolé), ou agrégation côté base (sql_backend.py)
+
+Dépendances: pandas, numpy, fastapi, uvicorn, sqlalchemy, psycopg2-binary, python-dotenv
+Optionnel pour Parquet API: pyarrow ; pour un JSON plus rapide: orjson
 """
 
 from __future__ import annotations
+import asyncio
+import importlib.util
 import io
+import json
+import logging
 import os
+import threading
 import zipfile
-from typing import Any, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import asynccontextmanager, nullcontext, suppress
+from typing import Any, Callable, Hashable, Iterator, Tuple
 
+import numpy as np
 import pandas as pd
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse, RedirectResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse, RedirectResponse
 from sqlalchemy import create_engine, text
 
+from address_dict import AddressDictionary
+from address_graph import DIRECTIONS, AddressGraph
+from evm_abi import decode_transfer_batch, decode_transfer_single
+from execution import ComputeExecutor, ExecutorSaturated
+from flow_index import FlowIndex
+from metrics import METRICS, PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, frame_size, process_memory_bytes
+from signatures import SignatureRegistry
+from sketches import HLL_PRECISION, HeavyHitters
+from uint256 import UInt256Array
+
+try:  # optionnel: sérialisation JSON ~5-10x plus rapide
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
 # =============================
 # Signatures & Sélecteurs
 # =============================
@@ -31,12 +60,12 @@ SIG = {
     # ERC-20 & ERC-721 (Transfer)
     "TRANSFER": "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef",
     # Approval(address,address,uint256)
-    "APPROVAL": "0x8c5be1e5ebec7d5bd14f71427d1e84f3dd0314c0",
+    "APPROVAL": "0x8c5be1e5ebec7d5bd14f71427d1e84f3dd0314c0f7b2291e5b200ac8c7c3b925",
     # ApprovalForAll(address,address,bool)
     "APPROVAL_FOR_ALL": "0x17307eab39ab6107e8899845ad3d59bd9653f200f220920489ca2b5937696c31",
     # ERC-1155 TransferSingle/Batch
     "ERC1155_TRANSFER_SINGLE": "0xc3d58168c5ae7397731d063d5bbf3d657854427343f4c083240f7aacaa2d0f62",
-    "ERC1155_TRANSFER_BATCH":  "0x4a39dc06d4c0dbc64b70d2998399d2fee9be3b0d6e7dafa9a3dbe3e6b06d3d56",
+    "ERC1155_TRANSFER_BATCH":  "0x4a39dc06d4c0dbc64b70af90fd698a233a518aa5d07e595d983b8c0526c8f7fb",
 }
 
 SELECTOR_MAP = {
@@ -47,6 +76,15 @@ SELECTOR_MAP = {
     "0xdd62ed3e": "allowance(address,address)",
 }
 
+# Registre par défaut (SELECTOR_MAP + SIG), extensible: SIGNATURES.load('signatures.csv' | 'abi.json')
+SIGNATURES = SignatureRegistry(SELECTOR_MAP, {
+    SIG['TRANSFER']:                'Transfer(address,address,uint256)',
+    SIG['APPROVAL']:                'Approval(address,address,uint256)',
+    SIG['APPROVAL_FOR_ALL']:        'ApprovalForAll(address,address,bool)',
+    SIG['ERC1155_TRANSFER_SINGLE']: 'TransferSingle(address,address,address,uint256,uint256)',
+    SIG['ERC1155_TRANSFER_BATCH']:  'TransferBatch(address,address,address,uint256[],uint256[])',
+})
+
 # =============================
 # Utils
 # =============================
@@ -79,6 +117,13 @@ def _to_int_maybe(x: Any) -> int | None:
     return None
 
 
+def _numeric_col(col: pd.Series) -> pd.Series:
+    """Colonne déjà numérique (int64, Int64, float) conservée telle quelle; sinon parsing hex/décimal ligne à ligne."""
+    if pd.api.types.is_numeric_dtype(col.dtype) and not pd.api.types.is_bool_dtype(col.dtype):
+        return col
+    return col.apply(hex_to_int)
+
+
 def to_datetime_utc(col: pd.Series) -> pd.Series:
     """Convertit robustement un champ timestamp (epoch seconds, iso, datetime) → datetime64[ns, UTC]."""
     s1 = pd.to_datetime(col, unit='s', utc=True, errors='coerce')
@@ -103,11 +148,56 @@ def topic_to_address(topic: Any) -> str | None:
     h = topic[2:].rjust(64, '0')
     return '0x' + h[-40:]
 
+# --- Versions colonnaires (mêmes sorties que les helpers ligne à ligne ci-dessus) ---
+
+def _str_ops(col: pd.Series):
+    """Accès `.str` tolérant: None si la colonne ne contient aucune chaîne (ex: tout NaN en float)."""
+    try:
+        return col.str
+    except AttributeError:
+        return None
+
+
+def _col_or_none(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df.columns:
+        return df[name]
+    return pd.Series(None, index=df.index, dtype=object)
+
+
+def _startswith_0x(col: pd.Series) -> np.ndarray:
+    sx = _str_ops(col)
+    if sx is None:
+        return np.zeros(len(col), dtype=bool)
+    return sx.startswith('0x', na=False).to_numpy(dtype=bool)
+
+
+def topic_to_address_col(col: pd.Series) -> np.ndarray:
+    """Équivalent vectorisé de `col.map(topic_to_address)` → ndarray object (None si invalide)."""
+    out = np.full(len(col), None, dtype=object)
+    ok = _startswith_0x(col)
+    if ok.any():
+        out[ok] = ('0x' + col[ok].str[2:].str.rjust(40, '0').str[-40:]).to_numpy(dtype=object)
+    return out
+
+
+def short_hex_col(col: pd.Series, left: int = 6, right: int = 4) -> pd.Series:
+    """Équivalent vectorisé de `col.map(short_hex)`."""
+    sx = _str_ops(col)
+    if sx is None:
+        return col.copy()
+    ok = sx.startswith('0x', na=False) & (sx.len() > 2 + left + right)
+    if not ok.any():
+        return col.copy()
+    return (sx[:2 + left] + '…' + sx[-right:]).where(ok, col)
+
 # =============================
 # Tagging
 # =============================
 
-def label_events_basic(logs: pd.DataFrame, out_col: str = 'tradution_event') -> pd.DataFrame:
+@METRICS.timed('labeling')
+def label_events_basic(logs: pd.DataFrame, out_col: str = 'tradution_event',
+                       registry: SignatureRegistry | None = None) -> pd.DataFrame:
+    """Libellé court des events connus, sinon signature du registre (SIGNATURES par défaut), sinon 'other'."""
     df = logs.copy()
     mapper = {
         SIG['ERC1155_TRANSFER_SINGLE']: 'single_tx',
@@ -117,46 +207,59 @@ def label_events_basic(logs: pd.DataFrame, out_col: str = 'tradution_event') ->
         SIG['TRANSFER']:                'transfer',
     }
     s = df['topic0'].str.lower()
-    df[out_col] = s.map(mapper).fillna('other')
+    labels = s.map(mapper).to_numpy(dtype=object, copy=True)
+    unmapped = pd.isna(labels)
+    if unmapped.any():
+        labels[unmapped] = (SIGNATURES if registry is None else registry).label_topics(s[unmapped])
+    df[out_col] = pd.Series(labels, index=df.index, dtype=object).fillna('other')
     has_t3 = df.get('topic3').astype(str).str.startswith('0x', na=False) if 'topic3' in df.columns else False
     df.loc[df[out_col].eq('transfer') & has_t3, out_col] = 'erc721_transfer'
     df.loc[df[out_col].eq('transfer') & ~has_t3, out_col] = 'erc20_transfer'
     return df
 
 
+_EVENT_TYPE_BY_TOPIC0 = {
+    SIG['APPROVAL']:                'approval',
+    SIG['APPROVAL_FOR_ALL']:        'approval_for_all',
+    SIG['ERC1155_TRANSFER_SINGLE']: 'erc1155_transfer_single',
+    SIG['ERC1155_TRANSFER_BATCH']:  'erc1155_transfer_batch',
+}
+
+
+@METRICS.timed('tagging')
 def tag_events_simple(logs: pd.DataFrame) -> pd.DataFrame:
     df = logs.copy()
-    def _etype(row) -> str:
-        sig = row.get('topic0')
-        sig = sig.lower() if isinstance(sig, str) else None
-        if sig == SIG['TRANSFER']:
-            return 'erc721_transfer' if _is_hex(row.get('topic3')) else 'erc20_transfer'
-        if sig == SIG['APPROVAL']:
-            return 'approval'
-        if sig == SIG['APPROVAL_FOR_ALL']:
-            return 'approval_for_all'
-        if sig == SIG['ERC1155_TRANSFER_SINGLE']:
-            return 'erc1155_transfer_single'
-        if sig == SIG['ERC1155_TRANSFER_BATCH']:
-            return 'erc1155_transfer_batch'
-        return 'other'
-    df['event_type'] = df.apply(_etype, axis=1)
+    t0 = _col_or_none(df, 'topic0')
+    sx = _str_ops(t0)
+    sig = sx.lower() if sx is not None else pd.Series(None, index=df.index, dtype=object)
+    is_transfer = sig.eq(SIG['TRANSFER']).fillna(False).to_numpy(dtype=bool)
+    has_t3 = _startswith_0x(_col_or_none(df, 'topic3'))
+    etype = sig.map(_EVENT_TYPE_BY_TOPIC0).to_numpy(dtype=object)
+    etype = np.select([is_transfer & has_t3, is_transfer], ['erc721_transfer', 'erc20_transfer'],
+                      default=np.where(pd.isna(etype), 'other', etype).astype(object))
+    df['event_type'] = pd.Series(etype, index=df.index, dtype=object).astype(str)
     df['is_token_transfer'] = df['event_type'].str.contains('transfer', na=False)
     return df
 
 
-def label_tx_methods_basic(txs: pd.DataFrame, out_col: str = 'method_name') -> pd.DataFrame:
+@METRICS.timed('labeling')
+def label_tx_methods_basic(txs: pd.DataFrame, out_col: str = 'method_name',
+                           registry: SignatureRegistry | None = None) -> pd.DataFrame:
+    """Sélecteur (10 premiers caractères de input_data) → signature du registre (SIGNATURES par défaut)."""
     df = txs.copy()
-    def _sel(x):
-        if isinstance(x, str) and x.startswith('0x') and len(x) >= 10:
-            return x[:10].lower()
-        return None
     if 'input_data' in df.columns:
-        df['method_selector'] = df['input_data'].apply(_sel)
-        df[out_col] = df['method_selector'].map(SELECTOR_MAP)
-        mask_no_input = df['input_data'].isin(['0x', '0x0', '', None])
-        df.loc[df[out_col].isna() & mask_no_input, out_col] = 'no_input'
-        df[out_col] = df[out_col].fillna('unknown')
+        selector = np.full(len(df), None, dtype=object)
+        sx = _str_ops(df['input_data'])
+        if sx is not None:
+            # seuls les 10 premiers caractères sont lus/copiés, jamais le calldata complet
+            head = sx.slice(0, 10)
+            valid = (sx.startswith('0x', na=False) & head.str.len().eq(10)).to_numpy(dtype=bool)
+            selector[valid] = head[valid].str.lower().to_numpy(dtype=object)
+        df['method_selector'] = selector
+        names = (SIGNATURES if registry is None else registry).label_selectors(selector)
+        mask_no_input = df['input_data'].isin(['0x', '0x0', '', None]).to_numpy(dtype=bool)
+        names[pd.isna(names) & mask_no_input] = 'no_input'
+        df[out_col] = pd.Series(names, index=df.index, dtype=object).fillna('unknown')
     else:
         df['method_selector'] = None
         df[out_col] = 'unknown'
@@ -166,144 +269,474 @@ def label_tx_methods_basic(txs: pd.DataFrame, out_col: str = 'method_name') -> p
 # Flows & Timeseries
 # =============================
 
-def build_token_flows_basic(events: pd.DataFrame) -> pd.DataFrame:
+_TRANSFER_EVENT_TYPES = ['erc20_transfer', 'erc721_transfer', 'erc1155_transfer_single', 'erc1155_transfer_batch']
+
+
+def _transfer_rows_with_parties(events: pd.DataFrame) -> pd.DataFrame:
+    """Sous-ensemble des transferts + colonnes from/to/token_address (topic1/2 pour ERC-20/721, topic2/3 pour ERC-1155)."""
     if 'event_type' not in events.columns:
         events = tag_events_simple(events)
-    df = events[events['event_type'].isin([
-        'erc20_transfer', 'erc721_transfer', 'erc1155_transfer_single', 'erc1155_transfer_batch'
-    ])].copy()
-    def _from(row):
-        et = row['event_type']
-        if et in ('erc20_transfer', 'erc721_transfer'):
-            return topic_to_address(row.get('topic1'))
-        if et.startswith('erc1155_'):
-            return topic_to_address(row.get('topic2'))
-        return None
-    def _to(row):
-        et = row['event_type']
-        if et in ('erc20_transfer', 'erc721_transfer'):
-            return topic_to_address(row.get('topic2'))
-        if et.startswith('erc1155_'):
-            return topic_to_address(row.get('topic3'))
-        return None
-    df['from'] = df.apply(_from, axis=1)
-    df['to'] = df.apply(_to, axis=1)
+    df = events[events['event_type'].isin(_TRANSFER_EVENT_TYPES)].copy()
+    is_1155 = df['event_type'].str.startswith('erc1155_').to_numpy(dtype=bool)
+    t1 = topic_to_address_col(_col_or_none(df, 'topic1'))
+    t2 = topic_to_address_col(_col_or_none(df, 'topic2'))
+    t3 = topic_to_address_col(_col_or_none(df, 'topic3'))
+    df['from'] = pd.Series(np.where(is_1155, t2, t1), index=df.index)
+    df['to'] = pd.Series(np.where(is_1155, t3, t2), index=df.index)
     df['token_address'] = df.get('address')
+    return df
+
+
+_PARTY_COLUMNS = ['token_address', 'from', 'to']
+
+
+def _intern_parties(df: pd.DataFrame, addresses: AddressDictionary) -> pd.DataFrame:
+    """token_address/from/to → ids int32 du dictionnaire (colonnes `<col>_id`, même position)."""
+    df = df.copy()
+    for c in _PARTY_COLUMNS:
+        df[c] = addresses.encode(df[c])
+    return df.rename(columns={c: f'{c}_id' for c in _PARTY_COLUMNS})
+
+
+@METRICS.timed('flows_basic')
+def build_token_flows_basic(events: pd.DataFrame, *, addresses: AddressDictionary | None = None) -> pd.DataFrame:
+    """Flux from → to par transfert. Avec `addresses`: block_number + ids int32 (token_address_id, from_id, to_id), sans colonnes *_short."""
+    df = _transfer_rows_with_parties(events)
+    if addresses is not None:
+        flows = df[['transaction_hash','block_number','token_address','from','to']].dropna(subset=['from','to'])
+        return _intern_parties(flows.reset_index(drop=True), addresses)
     flows = df[['transaction_hash','token_address','from','to']].dropna(subset=['from','to']).reset_index(drop=True)
-    flows['from_short'] = flows['from'].map(short_hex)
-    flows['to_short'] = flows['to'].map(short_hex)
-    flows['token_short'] = flows['token_address'].map(short_hex)
+    flows['from_short'] = short_hex_col(flows['from'])
+    flows['to_short'] = short_hex_col(flows['to'])
+    flows['token_short'] = short_hex_col(flows['token_address'])
     return flows
 
 
-def build_token_flows_with_amounts(events: pd.DataFrame, token_decimals: pd.DataFrame | None = None) -> pd.DataFrame:
-    if 'event_type' not in events.columns:
-        events = tag_events_simple(events)
-    df = events[events['event_type'].isin([
-        'erc20_transfer', 'erc721_transfer', 'erc1155_transfer_single', 'erc1155_transfer_batch'
-    ])].copy()
-    def _from(row):
-        et = row['event_type']
-        if et in ('erc20_transfer', 'erc721_transfer'):
-            return topic_to_address(row.get('topic1'))
-        if et.startswith('erc1155_'):
-            return topic_to_address(row.get('topic2'))
-        return None
-    def _to(row):
-        et = row['event_type']
-        if et in ('erc20_transfer', 'erc721_transfer'):
-            return topic_to_address(row.get('topic2'))
-        if et.startswith('erc1155_'):
-            return topic_to_address(row.get('topic3'))
+def _decimals_by_token(token_decimals: pd.DataFrame | None) -> pd.Series | None:
+    """token_address (minuscules) → decimals; None si token_decimals absent ou sans ces colonnes."""
+    if token_decimals is None or not {'token_address','decimals'}.issubset(token_decimals.columns):
         return None
-    df['from'] = df.apply(_from, axis=1)
-    df['to'] = df.apply(_to, axis=1)
-    df['token_address'] = df.get('address')
-    df['token_id'] = None
-    df['amount_raw'] = None
-    df['amount_token'] = None
-    df['is_batch'] = False
-    for i, row in df.iterrows():
-        et = row['event_type']
-        if et == 'erc20_transfer':
-            df.at[i, 'amount_raw'] = hex_to_int(events.loc[row.name, 'data'])
-        elif et == 'erc721_transfer':
-            df.at[i, 'token_id'] = hex_to_int(events.loc[row.name, 'topic3'])
-            df.at[i, 'amount_raw'] = 1
-            df.at[i, 'amount_token'] = 1.0
-        elif et == 'erc1155_transfer_single':
-            data_hex = events.loc[row.name, 'data']
-            if isinstance(data_hex, str) and data_hex.startswith('0x'):
-                h = data_hex[2:].rjust(64*2, '0')
-                try:
-                    token_id = int(h[:64], 16)
-                    value = int(h[64:128], 16)
-                    df.at[i, 'token_id'] = token_id
-                    df.at[i, 'amount_raw'] = value
-                except Exception:
-                    pass
-        elif et == 'erc1155_transfer_batch':
-            df.at[i, 'is_batch'] = True
-    if token_decimals is not None and {'token_address','decimals'}.issubset(token_decimals.columns):
-        meta = token_decimals[['token_address','decimals']].drop_duplicates().copy()
-        meta['token_address'] = meta['token_address'].str.lower()
-        out = df.merge(meta, left_on=df['token_address'].str.lower(), right_on='token_address', how='left')
-        out['amount_token'] = out.apply(
-            lambda r: (float(r['amount_raw']) / (10 ** int(r['decimals'])))
-            if pd.notna(r.get('decimals')) and pd.notna(r.get('amount_raw')) and r['event_type']=='erc20_transfer'
-            else r.get('amount_token')
-        , axis=1)
-        out.drop(columns=['key_0','token_address_y'], errors='ignore', inplace=True)
-        out.rename(columns={'token_address_x':'token_address'}, inplace=True)
-        df = out
-    return df[['transaction_hash','block_number','token_address','event_type','from','to','token_id','amount_raw','amount_token','is_batch']]
-
-
-def prepare_tx_timeseries(blocks: pd.DataFrame, txs: pd.DataFrame, freq: str = 'h') -> pd.DataFrame:
-    b = blocks[['number','timestamp']].copy()
-    b['number'] = b['number'].apply(_to_int_maybe)
-    b['timestamp_dt'] = to_datetime_utc(b['timestamp'])
-    t = txs[['hash','block_number']].copy()
-    t['block_number'] = t['block_number'].apply(_to_int_maybe)
-    m = t.merge(b[['number','timestamp_dt']], left_on='block_number', right_on='number', how='left')
-    s = (m.set_index('timestamp_dt').sort_index().resample(freq)['hash'].count().rename('tx_count').to_frame())
-    return s
+    meta = token_decimals[['token_address','decimals']].dropna().copy()
+    meta['token_address'] = meta['token_address'].str.lower()
+    return meta.drop_duplicates('token_address').set_index('token_address')['decimals']
+
+
+@METRICS.timed('flows_amounts')
+def build_token_flows_with_amounts(events: pd.DataFrame, token_decimals: pd.DataFrame | None = None, *,
+                                   compact: bool = False, addresses: AddressDictionary | None = None) -> pd.DataFrame:
+    """Flux de tokens avec token_id / montants exacts.
+
+    compact=False: `token_id`/`amount_raw` en entiers Python (dtype object).
+    compact=True: colonnes uint256 `token_id_l*`/`amount_raw_l*` + `_valid` (voir uint256.UInt256Array), plusieurs fois plus légères.
+    addresses: token_address/from/to internés en ids int32 (`<col>_id`).
+    `amount_token` = amount_raw / 10**decimals arrondi correctement (division entière exacte, pas de float intermédiaire).
+    TransferBatch: une ligne par (id, value) du payload (index de l'event répété); batch vide → aucune ligne,
+    payload non décodable → une ligne sans id ni montant.
+    """
+    df = _transfer_rows_with_parties(events)
+    et = df['event_type'].to_numpy(dtype=object)
+    is_batch = et == 'erc1155_transfer_batch'
+    batch_ids = batch_values = None
+    if is_batch.any():
+        sizes, _, batch_ids, batch_values = decode_transfer_batch(_col_or_none(df, 'data')[is_batch])
+        reps = np.ones(len(df), dtype=np.int64)
+        reps[is_batch] = np.where(sizes >= 0, sizes, 1)
+        batch_ok = np.zeros(len(df), dtype=bool)
+        batch_ok[np.flatnonzero(is_batch)[sizes >= 0]] = True
+        expand = np.repeat(np.arange(len(df)), reps)
+        df, et, is_batch, batch_ok = df.iloc[expand], et[expand], is_batch[expand], batch_ok[expand]
+    n = len(df)
+    is_20, is_721 = et == 'erc20_transfer', et == 'erc721_transfer'
+    is_single = et == 'erc1155_transfer_single'
+    token_id, amount_raw = UInt256Array.empty(n), UInt256Array.empty(n)
+    amount_token = np.full(n, None, dtype=object)
+    data = _col_or_none(df, 'data')
+    if is_20.any():
+        amount_raw[is_20] = UInt256Array.from_hex(data[is_20], fallback=hex_to_int)
+    if is_721.any():
+        token_id[is_721] = UInt256Array.from_hex(_col_or_none(df, 'topic3')[is_721], fallback=hex_to_int)
+        amount_raw[is_721] = 1
+        amount_token[is_721] = 1.0
+    if is_single.any():
+        token_id[is_single], amount_raw[is_single] = decode_transfer_single(data[is_single])
+    if batch_ids is not None and len(batch_ids):
+        # lignes dépliées dans l'ordre des logs puis des éléments, comme la sortie du décodeur
+        token_id[batch_ok], amount_raw[batch_ok] = batch_ids, batch_values
+    decimals = _decimals_by_token(token_decimals)
+    if decimals is not None:
+        dec = df['token_address'].str.lower().map(decimals).to_numpy(dtype=float)
+        scale = is_20 & ~np.isnan(dec) & amount_raw.valid
+        if scale.any():
+            pow10 = np.array([10 ** int(d) for d in dec[scale]], dtype=object)
+            amount_token[scale] = amount_raw[scale].to_ints() / pow10
+    if compact:
+        for name, col in (*token_id.to_columns('token_id').items(), *amount_raw.to_columns('amount_raw').items()):
+            df[name] = col
+        df['amount_token'] = amount_token.astype(np.float64)
+        uint_cols = [*token_id.to_columns('token_id'), *amount_raw.to_columns('amount_raw')]
+    else:
+        df['token_id'] = pd.Series(token_id.to_ints(), index=df.index, dtype=object)
+        df['amount_raw'] = pd.Series(amount_raw.to_ints(), index=df.index, dtype=object)
+        df['amount_token'] = pd.Series(amount_token, index=df.index, dtype=object)
+        uint_cols = ['token_id', 'amount_raw']
+    df['is_batch'] = is_batch
+    out = df[['transaction_hash','block_number','token_address','event_type','from','to',*uint_cols,'amount_token','is_batch']]
+    return _intern_parties(out, addresses) if addresses is not None else out
+
+
+@METRICS.timed('aggregate_flows')
+def aggregate_flow_amounts(flows: pd.DataFrame, top: int = 30, *, addresses: AddressDictionary | None = None,
+                           token_decimals: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Top (token, from, to) par nombre d'events puis somme exacte des montants bruts.
+
+    Accepte la sortie de build_token_flows_with_amounts en mode objet ou compact; `amount_raw_sum` en entiers Python.
+    Avec `addresses`: groupement sur les ids, seules les lignes retournées sont décodées (ex aequo départagés comme sur les chaînes).
+    Avec `token_decimals`: `amount_token_sum` = somme / 10**decimals en chaîne décimale exacte (None si décimales inconnues).
+    """
+    key_cols = [f'{c}_id' for c in _PARTY_COLUMNS] if addresses is not None else _PARTY_COLUMNS
+    out, counts, sums = _top_flow_amount_groups(flows, top, key_cols, addresses.ranks() if addresses is not None else None)
+    return _flow_amounts_frame(out, counts, sums, addresses, _decimals_by_token(token_decimals))
+
+
+def _flow_amounts_frame(keys: pd.DataFrame, counts: np.ndarray, sums: UInt256Array,
+                        addresses: AddressDictionary | None = None, decimals: pd.Series | None = None) -> pd.DataFrame:
+    if addresses is not None:
+        out = pd.DataFrame({c: addresses.decode(keys[f'{c}_id']) for c in _PARTY_COLUMNS})
+    else:
+        out = keys
+    out['events'] = counts
+    out['amount_raw_sum'] = pd.Series(sums.to_ints(), dtype=object)
+    if decimals is not None:
+        # mise à l'échelle exacte sur les seules lignes retournées (pas de float: sommes > 2**53 courantes en 18 décimales)
+        dec = out['token_address'].astype(object).str.lower().map(decimals).to_numpy(dtype=float)
+        known = ~np.isnan(dec)
+        scaled = np.full(len(out), None, dtype=object)
+        if known.any():
+            scaled[known] = sums[known].to_decimal_str(dec[known].astype(np.int64))
+        out['amount_token_sum'] = pd.Series(scaled, dtype=object)
+    return out
 
 
-def prepare_gas_timeseries(blocks: pd.DataFrame, freq: str = 'h') -> pd.DataFrame:
+def _top_flow_amount_groups(flows: pd.DataFrame, top: int, key_cols: list[str],
+                            ranks: np.ndarray | None = None) -> Tuple[pd.DataFrame, np.ndarray, UInt256Array]:
+    """(clés, effectifs, sommes) des `top` groupes; avec `ranks`, clés = ids départagés par rang d'adresse."""
+    if ranks is not None:
+        f = flows[(flows[key_cols[1]] >= 0) & (flows[key_cols[2]] >= 0)]
+    else:
+        f = flows.dropna(subset=['from','to'])
+    if UInt256Array.has_columns(f, 'amount_raw'):
+        amounts = UInt256Array.from_columns(f, 'amount_raw')
+    else:
+        amounts = UInt256Array.from_ints(f['amount_raw'])
+    codes = f.groupby(key_cols, sort=True, observed=True).ngroup().to_numpy(dtype=np.int64)
+    keep = codes >= 0
+    if ranks is not None:
+        keep &= f[key_cols[0]].to_numpy() >= 0
+    codes, amounts = codes[keep], amounts[keep]
+    keys = f.loc[keep, key_cols]
+    ngroups = int(codes.max()) + 1 if len(codes) else 0
+    counts = np.bincount(codes, minlength=ngroups)
+    sums = amounts.group_sum(codes, ngroups)
+    _, first = np.unique(codes, return_index=True)
+    ties = []
+    if ranks is not None:
+        group_keys = keys.iloc[first]
+        ties = [ranks[group_keys[c].to_numpy()] for c in reversed(key_cols)]
+    order = np.lexsort([*ties, *sums.sort_keys_desc(), -counts])[:top]
+    return keys.iloc[first[order]].reset_index(drop=True), counts[order], sums.take(order)
+
+
+def _top_count_rows(counts: pd.Series, top: int, addresses: AddressDictionary) -> Tuple[np.ndarray, np.ndarray]:
+    """(positions, effectifs) des `top` plus grands compteurs indexés par ids (ou paires d'ids), ex aequo par adresse."""
+    c = counts.to_numpy()
+    idx = counts.index
+    levels = [idx.get_level_values(i).to_numpy() for i in range(idx.nlevels)]
+    cand = np.arange(len(c))
+    if 0 < top < len(c):
+        # présélection: seuls les compteurs ≥ au top-ième sont départagés
+        thr = np.partition(c, len(c) - top)[len(c) - top]
+        cand = np.flatnonzero(c >= thr)
+    ranks = addresses.ranks()
+    order = cand[np.lexsort([*(ranks[lv[cand]] for lv in reversed(levels)), -c[cand]])][:max(top, 0)]
+    return order, c[order]
+
+
+def _top_flow_pairs(counts: pd.Series, top: int, addresses: AddressDictionary) -> pd.DataFrame:
+    """Top paires (from_id, to_id) → colonnes from/to décodées + count."""
+    order, c = _top_count_rows(counts, top, addresses)
+    idx = counts.index
+    return pd.DataFrame({'from': addresses.decode(idx.get_level_values(0).to_numpy()[order]),
+                         'to': addresses.decode(idx.get_level_values(1).to_numpy()[order]),
+                         'count': c})
+
+
+def _top_tokens_from_counts(counts: pd.Series, top_k: int = 10, addresses: AddressDictionary | None = None) -> pd.DataFrame:
+    if addresses is not None:
+        order, c = _top_count_rows(counts, top_k, addresses)
+        top = pd.DataFrame({'token_address': addresses.decode(counts.index.to_numpy()[order]), 'events': c})
+    else:
+        top = (counts.rename('events').rename_axis('token_address').reset_index()
+                     .sort_values('events', ascending=False, kind='stable').head(top_k).reset_index(drop=True))
+    top['token_short'] = top['token_address'].map(short_hex)
+    return top
+
+
+def top_tokens_by_events(flows: pd.DataFrame, top_k: int = 10) -> pd.DataFrame:
+    """Top tokens par nombre d'events de transfert (sur la sortie de build_token_flows_basic)."""
+    return _top_tokens_from_counts(flows.groupby('token_address', observed=True).size(), top_k)
+
+
+def _graph_arrays(flows: pd.DataFrame) -> tuple:
+    blocks, _ = _int64_col(flows['block_number'])
+    return (flows['from_id'].to_numpy(), flows['to_id'].to_numpy(), flows['token_address_id'].to_numpy(),
+            blocks, UInt256Array.from_columns(flows, 'amount_raw'))
+
+
+@METRICS.timed('graph')
+def build_address_graph(flows: pd.DataFrame, n_nodes: int = 0) -> AddressGraph:
+    """Graphe CSR des transferts depuis build_token_flows_with_amounts(..., compact=True, addresses=...)."""
+    return AddressGraph.from_arrays(*_graph_arrays(flows), n_nodes=n_nodes)
+
+
+def _int64_col(col: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """(valeurs int64, masque valide) d'une colonne d'entiers: numérique, hex '0x..' ou décimale."""
+    if pd.api.types.is_integer_dtype(col.dtype):
+        valid = col.notna().to_numpy(dtype=bool)
+        return col.to_numpy(dtype=np.int64, na_value=0), valid
+    num = pd.to_numeric(_numeric_col(col), errors='coerce')
+    valid = num.notna().to_numpy(dtype=bool)
+    return num.fillna(0).to_numpy().astype(np.int64), valid
+
+
+def _naive_utc(t: pd.Timestamp) -> np.datetime64:
+    t = pd.Timestamp(t)
+    return (t.tz_convert(None) if t.tzinfo is not None else t).to_datetime64()
+
+
+class BlockTimeIndex:
+    """Index numéro de bloc → timestamp, construit une fois et partagé par les fonctions qui datent des lignes.
+
+    Numéros int64 triés (uniques) + datetime64 UTC alignés. Le lookup est un gather vectoriel:
+    offset direct quand les numéros sont denses (cas de l'indexer), searchsorted sinon.
+    """
+
+    def __init__(self, numbers: np.ndarray, times: np.ndarray):
+        self.numbers = numbers
+        self.times = times
+        n = len(numbers)
+        self.dense = n > 0 and int(numbers[-1]) - int(numbers[0]) + 1 == n
+        # timestamps croissants avec le numéro (cas d'une chaîne): fenêtres temporelles par dichotomie
+        self.monotonic = bool((times[1:] >= times[:-1]).all())
+
+    @classmethod
+    def from_arrays(cls, numbers: np.ndarray, times: np.ndarray) -> 'BlockTimeIndex':
+        order = np.argsort(numbers, kind='stable')
+        numbers, times = numbers[order], times[order]
+        # premier bloc retenu en cas de doublon
+        keep = np.ones(len(numbers), dtype=bool)
+        keep[1:] = numbers[1:] != numbers[:-1]
+        return cls(numbers[keep], times[keep])
+
+    @classmethod
+    @METRICS.timed('block_index')
+    def from_blocks(cls, blocks: pd.DataFrame) -> 'BlockTimeIndex':
+        numbers, ok = _int64_col(blocks['number'])
+        times = to_datetime_utc(blocks['timestamp']).dt.tz_localize(None).to_numpy()
+        return cls.from_arrays(numbers[ok], times[ok])
+
+    def extend(self, blocks: pd.DataFrame) -> 'BlockTimeIndex':
+        """Nouvel index incluant `blocks` (l'index courant n'est pas modifié)."""
+        if blocks.empty:
+            return self
+        other = BlockTimeIndex.from_blocks(blocks)
+        if not len(self.numbers):
+            return other
+        if not len(other.numbers):
+            return self
+        times = np.concatenate([self.times, other.times.astype(self.times.dtype)])
+        if other.numbers[0] > self.numbers[-1]:
+            return BlockTimeIndex(np.concatenate([self.numbers, other.numbers]), times)
+        return BlockTimeIndex.from_arrays(np.concatenate([self.numbers, other.numbers]), times)
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    @property
+    def nbytes(self) -> int:
+        return self.numbers.nbytes + self.times.nbytes
+
+    def block_range(self, start: pd.Timestamp | None = None, end: pd.Timestamp | None = None) -> Tuple[int | None, int | None]:
+        """Premier / dernier numéro des blocs datés dans [start, end) (None: côté non borné); aucun bloc → (0, -1).
+
+        Timestamps non monotones: bornes min / max des blocs de la fenêtre (peut inclure des blocs hors fenêtre).
+        """
+        if start is None and end is None:
+            return None, None
+        t0, t1 = (None if t is None else _naive_utc(t) for t in (start, end))
+        if self.monotonic:
+            lo = int(np.searchsorted(self.times, t0, side='left')) if t0 is not None else 0
+            hi = int(np.searchsorted(self.times, t1, side='left')) if t1 is not None else len(self.times)
+            if lo >= hi:
+                return 0, -1
+            first, last = int(self.numbers[lo]), int(self.numbers[hi - 1])
+        else:
+            mask = np.ones(len(self.times), dtype=bool)
+            if t0 is not None:
+                mask &= self.times >= t0
+            if t1 is not None:
+                mask &= self.times < t1
+            if not mask.any():
+                return 0, -1
+            # numéros triés: premier / dernier bloc retenu
+            found = np.flatnonzero(mask)
+            first, last = int(self.numbers[found[0]]), int(self.numbers[found[-1]])
+        return (first if start is not None else None), (last if end is not None else None)
+
+    @METRICS.timed('attach_block_time')
+    def positions(self, block_numbers: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """(positions dans l'index, masque trouvé) pour chaque numéro de bloc."""
+        q, ok = _int64_col(block_numbers)
+        n = len(self.numbers)
+        if n == 0:
+            return np.zeros(len(q), dtype=np.intp), np.zeros(len(q), dtype=bool)
+        if self.dense:
+            pos = q - self.numbers[0]
+            ok = ok & (pos >= 0) & (pos < n)
+        else:
+            pos = np.searchsorted(self.numbers, q)
+            ok = ok & (pos < n) & (self.numbers[np.minimum(pos, n - 1)] == q)
+        return np.where(ok, pos, 0).astype(np.intp), ok
+
+    def block_counts(self, block_numbers: pd.Series, mask: np.ndarray | None = None) -> np.ndarray:
+        """Nombre de lignes par bloc de l'index (lignes hors mask ou de bloc inconnu ignorées)."""
+        pos, ok = self.positions(block_numbers)
+        if mask is not None:
+            ok = ok & mask
+        return np.bincount(pos[ok], minlength=len(self.numbers))
+
+    def count_timeseries(self, block_numbers: pd.Series, freq: str, name: str,
+                         mask: np.ndarray | None = None) -> pd.DataFrame:
+        """Comptage par bucket temporel, agrégé par bloc avant le resample (O(lignes) + O(blocs))."""
+        counts = self.block_counts(block_numbers, mask)
+        nz = counts > 0
+        idx = pd.DatetimeIndex(self.times[nz], name='timestamp_dt').tz_localize('UTC')
+        return pd.Series(counts[nz], index=idx, name=name).sort_index().resample(freq).sum().to_frame()
+
+
+def prepare_tx_timeseries(blocks: pd.DataFrame, txs: pd.DataFrame, freq: str = 'h', *,
+                          block_index: BlockTimeIndex | None = None) -> pd.DataFrame:
+    bi = block_index if block_index is not None else BlockTimeIndex.from_blocks(blocks)
+    return bi.count_timeseries(txs['block_number'], freq, 'tx_count', mask=txs['hash'].notna().to_numpy(dtype=bool))
+
+
+def gas_timeseries_partials(blocks: pd.DataFrame, freq: str = 'h') -> pd.DataFrame:
+    """Agrégats additifs (sommes + effectifs) par bucket: combinables entre lots de blocs, cf. merge_timeseries_partials."""
     b = blocks[['number','timestamp','gas_used','gas_limit','base_fee_per_gas']].copy()
     b['timestamp_dt'] = to_datetime_utc(b['timestamp'])
     for col in ['gas_used','gas_limit','base_fee_per_gas']:
-        b[col] = b[col].apply(hex_to_int)
+        b[col] = _numeric_col(b[col])
+    b['base_fee_per_gas'] = b['base_fee_per_gas'].astype('float64')
     b['gas_used_pct'] = (b['gas_used'] / b['gas_limit']).clip(lower=0, upper=1)
     b['base_fee_gwei'] = b['base_fee_per_gas'] / 1e9
     g = (b.set_index('timestamp_dt').sort_index().resample(freq)
            .agg(block_count=('number','count'),
                 gas_used_sum=('gas_used','sum'),
-                gas_used_pct_avg=('gas_used_pct','mean'),
-                base_fee_gwei_avg=('base_fee_gwei','mean')))
+                gas_used_pct_sum=('gas_used_pct','sum'),
+                gas_used_pct_n=('gas_used_pct','count'),
+                base_fee_gwei_sum=('base_fee_gwei','sum'),
+                base_fee_gwei_n=('base_fee_gwei','count')))
     return g
 
 
-def _attach_block_time(df: pd.DataFrame, blocks: pd.DataFrame) -> pd.DataFrame:
-    b = blocks[['number','timestamp']].copy()
-    b['number'] = b['number'].apply(hex_to_int)
-    b['timestamp_dt'] = to_datetime_utc(b['timestamp'])
-    out = df.copy()
-    if 'block_number' in out.columns:
-        out['block_number'] = out['block_number'].apply(hex_to_int)
-        out = out.merge(b[['number','timestamp_dt']], left_on='block_number', right_on='number', how='left')
-        out.drop(columns=['number'], inplace=True)
-    return out
+def finalize_gas_timeseries(partials: pd.DataFrame) -> pd.DataFrame:
+    g = partials[['block_count','gas_used_sum']].copy()
+    g['gas_used_pct_avg'] = partials['gas_used_pct_sum'] / partials['gas_used_pct_n'].where(partials['gas_used_pct_n'] > 0)
+    g['base_fee_gwei_avg'] = partials['base_fee_gwei_sum'] / partials['base_fee_gwei_n'].where(partials['base_fee_gwei_n'] > 0)
+    return g
 
 
-def build_transfer_counts_timeseries(events: pd.DataFrame, blocks: pd.DataFrame, freq: str = 'h') -> pd.DataFrame:
+def prepare_gas_timeseries(blocks: pd.DataFrame, freq: str = 'h') -> pd.DataFrame:
+    return finalize_gas_timeseries(gas_timeseries_partials(blocks, freq))
+
+
+def merge_timeseries_partials(a: pd.DataFrame, b: pd.DataFrame, freq: str = 'h') -> pd.DataFrame:
+    """Somme bucket à bucket de deux séries additives (counts/sommes), buckets manquants comblés à 0."""
+    if a.empty:
+        return b
+    if b.empty:
+        return a
+    m = pd.concat([a, b]).groupby(level=0).sum()
+    return m.asfreq(freq, fill_value=0)
+
+
+def build_transfer_counts_timeseries(events: pd.DataFrame, blocks: pd.DataFrame, freq: str = 'h', *,
+                                     block_index: BlockTimeIndex | None = None) -> pd.DataFrame:
     if 'event_type' not in events.columns:
         events = tag_events_simple(events)
-    e = events[events['event_type'].str.contains('transfer', na=False)].copy()
-    e = _attach_block_time(e, blocks)
-    ts = (e.set_index('timestamp_dt').sort_index().resample(freq).size().rename('transfer_event_count').to_frame())
-    return ts
+    bi = block_index if block_index is not None else BlockTimeIndex.from_blocks(blocks)
+    mask = events['event_type'].str.contains('transfer', na=False).to_numpy(dtype=bool)
+    return bi.count_timeseries(events['block_number'], freq, 'transfer_event_count', mask=mask)
+
+
+# Rollup multi-résolution: buckets fins calculés une fois depuis les lignes brutes,
+# fréquences plus larges et plages start/end dérivées du rollup seul (O(buckets)).
+ROLLUP_FREQ = '15min'
+GAS_PARTIAL_COLUMNS = ['block_count', 'gas_used_sum', 'gas_used_pct_sum', 'gas_used_pct_n', 'base_fee_gwei_sum', 'base_fee_gwei_n']
+# kind → (colonnes du rollup, colonne d'effectif qui borne la série)
+ROLLUP_SERIES = {
+    'tx': (['tx_count'], 'tx_count'),
+    'gas': (GAS_PARTIAL_COLUMNS, 'block_count'),
+    'transfers': (['transfer_event_count'], 'transfer_event_count'),
+}
+
+
+@METRICS.timed('rollup')
+def build_timeseries_rollup(blocks: pd.DataFrame, txs: pd.DataFrame, events: pd.DataFrame, *,
+                            block_index: BlockTimeIndex | None = None) -> pd.DataFrame:
+    """Tous les agrégats additifs (tx, gaz, transferts) par bucket ROLLUP_FREQ, buckets vides à 0.
+
+    txs/events sont datés via block_index (par défaut construit depuis blocks).
+    """
+    bi = block_index if block_index is not None else BlockTimeIndex.from_blocks(blocks)
+    return assemble_timeseries_rollup([prepare_tx_timeseries(blocks, txs, ROLLUP_FREQ, block_index=bi),
+                                       gas_timeseries_partials(blocks, ROLLUP_FREQ),
+                                       build_transfer_counts_timeseries(events, blocks, ROLLUP_FREQ, block_index=bi)])
+
+
+def assemble_timeseries_rollup(parts: list[pd.DataFrame]) -> pd.DataFrame:
+    """Séries partielles au pas ROLLUP_FREQ (tx, gaz, transferts) → rollup unique, buckets vides à 0."""
+    r = pd.concat(parts, axis=1).sort_index()
+    dtypes = {c: p[c].dtype for p in parts for c in p.columns}
+    if r.empty:
+        return r.astype(dtypes)
+    return r.fillna(0).asfreq(ROLLUP_FREQ, fill_value=0).astype(dtypes)
+
+
+@METRICS.timed('resample')
+def rollup_timeseries(rollup: pd.DataFrame, kind: str, freq: str = ROLLUP_FREQ) -> pd.DataFrame:
+    """Série `kind` à la fréquence `freq`, ré-agrégée depuis le rollup (mêmes valeurs que depuis les lignes brutes)."""
+    if kind not in ROLLUP_SERIES:
+        raise ValueError(f"Série inconnue: {kind}")
+    cols, count_col = ROLLUP_SERIES[kind]
+    r = rollup[cols]
+    # comme un resample brut, la série va du premier au dernier bucket non vide de ce kind
+    nz = np.flatnonzero(r[count_col].to_numpy())
+    r = r.iloc[nz[0]:nz[-1] + 1] if len(nz) else r.iloc[:0]
+    if freq == ROLLUP_FREQ:
+        return r
+    if freq == 'w':
+        # W-SUN est fermé à droite: [t, t+15min) appartient à la semaine de ses instants > t
+        # (décalage d'une unité de résolution de l'index, qui garde son dtype)
+        r = r.set_axis(r.index + pd.Timedelta(1, r.index.unit))
+    return r.resample(freq).sum()
+
+
+def slice_timeseries(ts: pd.DataFrame, start: pd.Timestamp | None = None, end: pd.Timestamp | None = None) -> pd.DataFrame:
+    """Buckets dont le label est dans [start, end) (index trié: recherche dichotomique)."""
+    idx = ts.index
+    lo = idx.searchsorted(start, side='left') if start is not None else 0
+    hi = idx.searchsorted(end, side='left') if end is not None else len(idx)
+    return ts.iloc[lo:hi]
 
 # =============================
 # API Helpers
@@ -327,137 +760,985 @@ def _validate_freq(freq: str) -> str:
     return f
 
 
-def _respond_df(df: pd.DataFrame, fmt: str = 'json', filename: str = 'data'):
+def _parse_time_param(value: str | None, name: str) -> pd.Timestamp | None:
+    """ISO 8601 ou timestamp unix (secondes) → Timestamp UTC."""
+    if value is None or value == '':
+        return None
+    try:
+        if value.lstrip('-').isdigit():
+            return pd.Timestamp(int(value), unit='s', tz='UTC')
+        t = pd.Timestamp(value)
+        return t.tz_localize('UTC') if t.tzinfo is None else t.tz_convert('UTC')
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail=f"{name} invalide: ISO 8601 ou timestamp unix attendu")
+
+
+def _check_top(value: int, name: str = 'top') -> int:
+    # head(-n) retournerait toutes les lignes sauf n: une taille négative est refusée
+    if value < 0:
+        raise HTTPException(status_code=400, detail=f"{name} doit être >= 0")
+    return value
+
+
+RESPONSE_FORMATS = {
+    'json':    ('application/json', None),
+    'ndjson':  ('application/x-ndjson', 'ndjson'),
+    'csv':     ('text/csv', 'csv'),
+    'parquet': ('application/octet-stream', 'parquet'),
+}
+STREAM_BATCH_ROWS = 50_000
+# au-delà, une réponse est streamée et n'est pas gardée dans le cache de réponses
+STREAM_MIN_ROWS = 200_000
+# réponse 503 (API saturée): délai suggéré au client
+RETRY_AFTER_SECONDS = 1
+# mode=approx: clés suivies par résumé (erreur d'effectif ≤ transferts / (SKETCH_CAPACITY + 1))
+SKETCH_CAPACITY = 4096
+
+
+def _check_fmt(fmt: str) -> str:
     fmt = (fmt or 'json').lower()
-    if fmt == 'json':
-        return JSONResponse(df.to_dict(orient='records'))
+    if fmt not in RESPONSE_FORMATS:
+        raise HTTPException(status_code=400, detail='fmt invalide. Utilisez json, ndjson, csv, ou parquet')
+    if fmt == 'parquet' and importlib.util.find_spec('pyarrow') is None:
+        raise HTTPException(status_code=400, detail='Parquet requiert pyarrow (pip install pyarrow)')
+    return fmt
+
+
+def _json_records(df: pd.DataFrame) -> list[dict]:
+    """Enregistrements JSON-compatibles: dates → ISO, NaN/NA → None."""
+    df = _df_time_to_iso(df)
+    return df.astype(object).where(df.notna(), None).to_dict(orient='records')
+
+
+def _json_dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass  # entiers > 64 bits (sommes uint256): repli sur json
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Fichier en écriture seule qui accumule les octets à drainer (position absolue conservée pour le footer Parquet)."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        out, self._chunks = b''.join(self._chunks), []
+        return out
+
+
+def _arrow_schema(df: pd.DataFrame):
+    import pyarrow as pa
+    try:
+        return pa.Schema.from_pandas(df, preserve_index=False), df
+    except (pa.ArrowInvalid, OverflowError):
+        # entiers hors int64 (sommes uint256) → chaînes décimales
+        big = [c for c in df.columns if df[c].dtype == object]
+        df = df.assign(**{c: df[c].map(lambda v: str(v) if isinstance(v, int) else v) for c in big})
+        return pa.Schema.from_pandas(df, preserve_index=False), df
+
+
+def _iter_df(df: pd.DataFrame, fmt: str = 'json', batch_rows: int = STREAM_BATCH_ROWS) -> Iterator[bytes]:
+    """Sérialise df par lots de lignes: CSV/NDJSON/JSON ligne à ligne, Parquet un row group par lot."""
+    fmt = _check_fmt(fmt)
+    n = len(df)
+    starts = range(0, n, batch_rows) if n else [0]
     if fmt == 'csv':
-        buf = io.StringIO()
-        df.to_csv(buf, index=False)
-        buf.seek(0)
-        return StreamingResponse(iter([buf.getvalue()]), media_type='text/csv', headers={
-            'Content-Disposition': f'attachment; filename="{filename}.csv"'
-        })
+        for i in starts:
+            yield df.iloc[i:i + batch_rows].to_csv(index=False, header=(i == 0)).encode('utf-8')
+    elif fmt == 'ndjson':
+        for i in starts:
+            recs = _json_records(df.iloc[i:i + batch_rows])
+            if recs:
+                yield b'\n'.join(_json_dumps(r) for r in recs) + b'\n'
+    elif fmt == 'json':
+        yield b'['
+        for i in starts:
+            body = _json_dumps(_json_records(df.iloc[i:i + batch_rows]))[1:-1]
+            if body:
+                yield (b',' if i else b'') + body
+        yield b']'
+    else:
+        import pyarrow as pa, pyarrow.parquet as pq
+        schema, df = _arrow_schema(df)
+        sink = _ChunkSink()
+        with pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema) as writer:
+            for i in starts:
+                writer.write_table(pa.Table.from_pandas(df.iloc[i:i + batch_rows], schema=schema, preserve_index=False))
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+        yield sink.drain()
+
+
+def _response_headers(fmt: str, filename: str) -> Tuple[str, dict]:
+    media_type, ext = RESPONSE_FORMATS[fmt]
+    headers = {'Content-Disposition': f'attachment; filename="{filename}.{ext}"'} if ext else {}
+    return media_type, headers
+
+
+@METRICS.timed('serialize')
+def _render_df(df: pd.DataFrame, fmt: str = 'json', filename: str = 'data') -> Tuple[bytes, str, dict]:
+    """Sérialise un DataFrame → (corps, media_type, headers), réutilisable par le cache de réponses."""
+    fmt = _check_fmt(fmt)
+    media_type, headers = _response_headers(fmt, filename)
+    return b''.join(_iter_df(df, fmt)), media_type, headers
+
+
+def _respond_df(df: pd.DataFrame, fmt: str = 'json', filename: str = 'data'):
+    """Réponse streamée: le premier lot part sans attendre la sérialisation complète."""
+    fmt = _check_fmt(fmt)
+    media_type, headers = _response_headers(fmt, filename)
+    return StreamingResponse(METRICS.timed_iter('serialize_stream', _iter_df(df, fmt)), media_type=media_type, headers=headers)
+
+
+EXPORT_FORMATS = {'csv', 'parquet'}
+
+
+def _export_member(name: str, fn: Callable[[], pd.DataFrame], keep_index: bool, fmt: str) -> Tuple[str, bytes, int]:
+    """Membre d'export → (nom de fichier, contenu, compression zip).
+
+    Les membres Parquet sont déjà compressés: stockés tels quels (ZIP_STORED); les CSV sont deflatés.
+    """
+    df = fn()
     if fmt == 'parquet':
-        try:
-            import pyarrow as pa, pyarrow.parquet as pq
-        except Exception:
-            raise HTTPException(status_code=400, detail='Parquet requiert pyarrow (pip install pyarrow)')
-        buf = io.BytesIO()
-        table = pa.Table.from_pandas(df)
-        pq.write_table(table, buf)
-        buf.seek(0)
-        return StreamingResponse(buf, media_type='application/octet-stream', headers={
-            'Content-Disposition': f'attachment; filename="{filename}.parquet"'
-        })
-    raise HTTPException(status_code=400, detail='fmt invalide. Utilisez json, csv, ou parquet')
-
-
-def _build_export_zip(blocks: pd.DataFrame, txs: pd.DataFrame, events: pd.DataFrame, freq: str = 'h') -> bytes:
-    ts_tx = prepare_tx_timeseries(blocks, txs, freq)
-    ts_gas = prepare_gas_timeseries(blocks, freq)
-    ts_evt = build_transfer_counts_timeseries(events, blocks, freq)
-    tagged = tag_events_simple(events)
-    flows_basic = build_token_flows_basic(tagged)
-    top_tokens = top_tokens_by_events(flows_basic, top_k=50)
-    mem = io.BytesIO()
-    with zipfile.ZipFile(mem, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr(f'activity_tx_{freq}.csv', ts_tx.to_csv())
-        zf.writestr(f'activity_gas_{freq}.csv', ts_gas.to_csv())
-        zf.writestr(f'activity_transfers_{freq}.csv', ts_evt.to_csv())
-        zf.writestr('top_tokens.csv', top_tokens.to_csv(index=False))
-    mem.seek(0)
-    return mem.read()
+        body = b''.join(_iter_df(df.reset_index() if keep_index else df, 'parquet'))
+        return f'{name}.parquet', body, zipfile.ZIP_STORED
+    return f'{name}.csv', df.to_csv(index=keep_index).encode('utf-8'), zipfile.ZIP_DEFLATED
+
+
+def _export_zip_chunks(members: list[Tuple[str, Callable[[], pd.DataFrame], bool]], fmt: str = 'csv',
+                       max_workers: int = 4) -> Iterator[bytes]:
+    """Calcule les membres (nom, fn → DataFrame, garder l'index) en parallèle et streame le zip au fil des membres terminés."""
+    sink = _ChunkSink()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool, zipfile.ZipFile(sink, mode='w') as zf:
+        futures = [pool.submit(_export_member, *m, fmt) for m in members]
+        for fut in as_completed(futures):
+            name, body, compression = fut.result()
+            zf.writestr(name, body, compress_type=compression)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _build_export_zip(blocks: pd.DataFrame, txs: pd.DataFrame, events: pd.DataFrame, freq: str = 'h', *,
+                      tagged: pd.DataFrame | None = None, flows_basic: pd.DataFrame | None = None,
+                      fmt: str = 'csv') -> bytes:
+    if tagged is None:
+        tagged = tag_events_simple(events)
+    bi = BlockTimeIndex.from_blocks(blocks)
+    members = [
+        (f'activity_tx_{freq}', lambda: prepare_tx_timeseries(blocks, txs, freq, block_index=bi), True),
+        (f'activity_gas_{freq}', lambda: prepare_gas_timeseries(blocks, freq), True),
+        (f'activity_transfers_{freq}', lambda: build_transfer_counts_timeseries(tagged, blocks, freq, block_index=bi), True),
+        ('top_tokens', lambda: top_tokens_by_events(flows_basic if flows_basic is not None else build_token_flows_basic(tagged), top_k=50), False),
+    ]
+    return b''.join(_export_zip_chunks(members, fmt=fmt))
+
+# =============================
+# Frames enrichis & cache de réponses
+# =============================
+
+class LRUCache:
+    """Cache LRU borné en nombre d'entrées, thread-safe (les handlers sync tournent dans un threadpool)."""
+
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = max(0, int(maxsize))
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = fn()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _concat_rows(a: pd.DataFrame | None, b: pd.DataFrame) -> pd.DataFrame:
+    """Concatène deux lots de lignes; les colonnes uint256 (`*_l<k>`) absentes d'un côté sont complétées par 0."""
+    if a is None or a.empty:
+        return b.reset_index(drop=True)
+    if b.empty:
+        return a
+    for c in a.columns.intersection(b.columns):
+        if isinstance(a[c].dtype, pd.CategoricalDtype) and isinstance(b[c].dtype, pd.CategoricalDtype):
+            cats = a[c].cat.categories.union(b[c].cat.categories)
+            a = a.assign(**{c: a[c].cat.set_categories(cats)})
+            b = b.assign(**{c: b[c].cat.set_categories(cats)})
+    for x, y in ((a, b), (b, a)):
+        missing = [c for c in x.columns if c not in y.columns and '_l' in str(c) and x[c].dtype == np.uint64]
+        if missing:
+            y = y.assign(**{c: np.uint64(0) for c in missing})
+            if x is a:
+                b = y
+            else:
+                a = y
+    return pd.concat([a, b], ignore_index=True)
+
+
+class EnrichedFrames:
+    """Frames bruts + dérivés (events taggés, flux, compteurs, séries temporelles) calculés une seule fois.
+
+    Les dérivés sont partagés entre toutes les requêtes et ne doivent pas être modifiés en place.
+    - `append()` ajoute un lot de nouvelles lignes (blocs > high-water) et met à jour dérivés et agrégats
+      à partir du seul delta;
+    - `update()` remplace les frames bruts et invalide tout.
+    Chaque mutation incrémente `version`, qui fait partie des clés du cache de réponses.
+    """
+
+    def __init__(self, events: pd.DataFrame, txs: pd.DataFrame, blocks: pd.DataFrame,
+                 token_decimals: pd.DataFrame | None = None, cache_size: int = 128,
+                 high_water_block: int | None = None, sketch_capacity: int = SKETCH_CAPACITY):
+        self.events = events
+        self.txs = txs
+        self.blocks = blocks
+        self.token_decimals = token_decimals
+        self.high_water_block = high_water_block
+        self.sketch_capacity = sketch_capacity
+        self.version = 0
+        self.responses = LRUCache(cache_size)
+        # ids d'adresses stables pour toute la vie du store (append-only, partagé par les frames successifs)
+        self.addresses = AddressDictionary()
+        self._derived: dict[Hashable, Any] = {}
+        self._lock = threading.RLock()
+        self._key_locks: dict[Hashable, threading.Lock] = {}
+
+    def _get(self, name: Hashable, fn: Callable[[], Any]) -> Any:
+        # un verrou par dérivé: des dérivés indépendants se calculent en parallèle (cf. /export.zip)
+        df = self._derived.get(name)
+        if df is not None:
+            return df
+        with self._lock:
+            key_lock = self._key_locks.setdefault(name, threading.Lock())
+        with key_lock:
+            df = self._derived.get(name)
+            if df is None:
+                version = self.version
+                df = fn()
+                with self._lock:
+                    # calculé sur des frames remplacés entre-temps (append/update): non mémorisé
+                    if self.version == version:
+                        self._derived[name] = df
+        return df
+
+    # --- Frames dérivés ---
+
+    @property
+    def tagged(self) -> pd.DataFrame:
+        return self._get('tagged', lambda: tag_events_simple(self.events))
+
+    @property
+    def flows_basic(self) -> pd.DataFrame:
+        return self._get('flows_basic', lambda: build_token_flows_basic(self.tagged, addresses=self.addresses))
+
+    @property
+    def flows_amounts(self) -> pd.DataFrame:
+        return self._get('flows_amounts', lambda: build_token_flows_with_amounts(self.tagged, self.token_decimals, compact=True,
+                                                                                 addresses=self.addresses))
+
+    @property
+    def graph(self) -> AddressGraph:
+        return self._get('graph', lambda: build_address_graph(self.flows_amounts, len(self.addresses)))
+
+    @property
+    def flows_basic_index(self) -> FlowIndex:
+        return self._get('flows_basic_index', lambda: FlowIndex(*_flow_index_arrays(self.flows_basic), len(self.addresses)))
+
+    @property
+    def flows_amounts_index(self) -> FlowIndex:
+        return self._get('flows_amounts_index', lambda: FlowIndex(*_flow_index_arrays(self.flows_amounts), len(self.addresses)))
+
+    # --- Agrégats (mis à jour incrémentalement par append) ---
+
+    @property
+    def event_type_counts(self) -> pd.Series:
+        # ordre de première occurrence: départage stable des égalités, identique après append
+        return self._get('event_type_counts', lambda: self.tagged['event_type'].value_counts(sort=False))
+
+    @property
+    def flow_pair_counts(self) -> pd.Series:
+        return self._get('flow_pair_counts', lambda: _flow_pair_counts(self.flows_basic))
+
+    @property
+    def token_counts(self) -> pd.Series:
+        return self._get('token_counts', lambda: _token_counts(self.flows_basic))
+
+    @property
+    def pair_sketch(self) -> HeavyHitters:
+        return self._get('pair_sketch', lambda: HeavyHitters(self.sketch_capacity).extend(_pair_keys(self.flows_basic)))
+
+    @property
+    def token_sketch(self) -> HeavyHitters:
+        return self._get('token_sketch', lambda: _extend_token_sketch(HeavyHitters(self.sketch_capacity, HLL_PRECISION),
+                                                                      self.flows_basic, self.addresses))
+
+    @property
+    def block_index(self) -> BlockTimeIndex:
+        return self._get('block_index', lambda: BlockTimeIndex.from_blocks(self.blocks))
+
+    @property
+    def rollup(self) -> pd.DataFrame:
+        return self._get('rollup', lambda: build_timeseries_rollup(self.blocks, self.txs, self.tagged,
+                                                                   block_index=self.block_index))
+
+    def timeseries_partials(self, kind: str, freq: str) -> pd.DataFrame:
+        """Séries additives par bucket: kind ∈ {'tx', 'gas', 'transfers'}, dérivées du rollup."""
+        return self._get(('ts', kind, freq), lambda: rollup_timeseries(self.rollup, kind, freq))
+
+    def flow_rows(self, frame: str, start_block: int | None = None, end_block: int | None = None,
+                  start: pd.Timestamp | None = None, end: pd.Timestamp | None = None, token: str | None = None,
+                  address: str | None = None) -> np.ndarray | None:
+        """Positions des lignes de `frame` ('flows_basic' / 'flows_amounts') retenues par les filtres; None si aucun filtre.
+
+        Blocs dans [start_block, end_block], heure du bloc dans [start, end), token, adresse en from ou en to.
+        Token / adresse inconnus: aucune ligne.
+        """
+        if all(v is None for v in (start_block, end_block, start, end, token, address)):
+            return None
+        index = self.flows_basic_index if frame == 'flows_basic' else self.flows_amounts_index
+        if start is not None or end is not None:
+            first, last = self.block_index.block_range(start, end)
+            if first is not None:
+                start_block = first if start_block is None else max(start_block, first)
+            if last is not None:
+                end_block = last if end_block is None else min(end_block, last)
+        ids = [None if a is None else _lookup_address(self.addresses, a) for a in (token, address)]
+        if any(i is not None and i < 0 for i in ids):
+            return np.zeros(0, dtype=np.int64)
+        return index.rows(start_block, end_block, token=ids[0], address=ids[1])
+
+    def top_tokens(self, k: int, *, approx: bool = False, **filters: Any) -> pd.DataFrame:
+        """approx: top depuis token_sketch (sans filtres), colonnes events_max_error et distinct_counterparties en plus."""
+        if approx:
+            return _approx_top_tokens(self.token_sketch, k, self.addresses)
+        rows = self.flow_rows('flows_basic', **filters)
+        counts = self.token_counts if rows is None else _token_counts(self.flows_basic[['token_address_id']].take(rows))
+        return _top_tokens_from_counts(counts, top_k=k, addresses=self.addresses)
+
+    def top_flow_pairs(self, top: int, *, approx: bool = False, **filters: Any) -> pd.DataFrame:
+        """approx: top depuis pair_sketch (sans filtres), colonne count_max_error en plus."""
+        if approx:
+            return _approx_top_flow_pairs(self.pair_sketch, top, self.addresses)
+        rows = self.flow_rows('flows_basic', **filters)
+        counts = self.flow_pair_counts if rows is None else _flow_pair_counts(self.flows_basic[['from_id','to_id']].take(rows))
+        return _top_flow_pairs(counts, top, self.addresses)
+
+    def info(self) -> dict:
+        return {
+            'events_rows': int(len(self.events)),
+            'tx_rows': int(len(self.txs)),
+            'blocks_rows': int(len(self.blocks)),
+            'high_water_block': self.high_water_block,
+            'cols': {
+                'events': list(self.events.columns),
+                'txs': list(self.txs.columns),
+                'blocks': list(self.blocks.columns),
+            }
+        }
+
+    def frame_sizes(self) -> dict[str, Tuple[int, int]]:
+        """(lignes, octets non profonds) des frames bruts et des dérivés matérialisés."""
+        frames = {'events': self.events, 'txs': self.txs, 'blocks': self.blocks,
+                  **{':'.join(map(str, k)) if isinstance(k, tuple) else str(k): v for k, v in self._derived.items()}}
+        sizes = {name: frame_size(obj) for name, obj in frames.items()}
+        return {name: s for name, s in sizes.items() if s is not None}
+
+    def precompute(self, exact_counts: bool = True) -> None:
+        """exact_counts=False: résumés de mode=approx au lieu des comptages exacts par paire / token (calculés
+        alors à la première requête exacte)."""
+        self.tagged, self.flows_basic, self.flows_amounts, self.rollup, self.graph
+        self.event_type_counts, self.flows_basic_index, self.flows_amounts_index
+        if exact_counts:
+            self.flow_pair_counts, self.token_counts
+        else:
+            self.pair_sketch, self.token_sketch
+
+    # --- Mutations ---
+
+    def append(self, events: pd.DataFrame | None = None, txs: pd.DataFrame | None = None,
+               blocks: pd.DataFrame | None = None, high_water_block: int | None = None) -> None:
+        """Ajoute un lot de nouvelles lignes (blocs postérieurs à ceux déjà chargés).
+
+        Seuls les dérivés déjà matérialisés sont étendus, chacun à partir du delta uniquement.
+        Les lignes de txs/events doivent référencer des blocs du même lot (ou déjà chargés) pour être datées.
+        Les moyennes de gaz restent dérivées de sommes / effectifs, mais les sommes float d'un bucket partagé par
+        deux lots sont additionnées dans un autre ordre qu'au chargement complet: écart possible au dernier ulp
+        (comptes, sommes de gaz entières et montants restent identiques).
+        """
+        events = events if events is not None else self.events.iloc[:0]
+        txs = txs if txs is not None else self.txs.iloc[:0]
+        blocks = blocks if blocks is not None else self.blocks.iloc[:0]
+        with self._lock:
+            derived = dict(self._derived)
+            if {'block_index', 'rollup'} & derived.keys():
+                # delta daté via l'index étendu: les lignes peuvent référencer des blocs déjà chargés
+                derived['block_index'] = self.block_index.extend(blocks)
+            tagged_delta = tag_events_simple(events)
+            flows_delta = None
+            if {'flows_basic', 'flow_pair_counts', 'token_counts', 'flows_basic_index', 'pair_sketch', 'token_sketch'} & derived.keys():
+                flows_delta = build_token_flows_basic(tagged_delta, addresses=self.addresses)
+            amounts_delta = None
+            if {'flows_amounts', 'graph', 'flows_amounts_index'} & derived.keys():
+                amounts_delta = build_token_flows_with_amounts(tagged_delta, self.token_decimals, compact=True, addresses=self.addresses)
+            for name, cur in derived.items():
+                if name == 'tagged':
+                    derived[name] = _concat_rows(cur, tagged_delta)
+                elif name == 'flows_basic':
+                    derived[name] = _concat_rows(cur, flows_delta)
+                elif name == 'flows_amounts':
+                    derived[name] = _concat_rows(cur, amounts_delta)
+                elif name == 'graph':
+                    derived[name] = cur.extend(*_graph_arrays(amounts_delta), n_nodes=len(self.addresses))
+                elif name == 'pair_sketch':
+                    derived[name] = cur.extend(_pair_keys(flows_delta))
+                elif name == 'token_sketch':
+                    derived[name] = _extend_token_sketch(cur, flows_delta, self.addresses)
+                elif name == 'flows_basic_index':
+                    derived[name] = cur.extend(*_flow_index_arrays(flows_delta), len(self.addresses))
+                elif name == 'flows_amounts_index':
+                    derived[name] = cur.extend(*_flow_index_arrays(amounts_delta), len(self.addresses))
+                elif name == 'event_type_counts':
+                    derived[name] = _add_counts_first_seen(cur, tagged_delta['event_type'].value_counts(sort=False))
+                elif name == 'flow_pair_counts':
+                    derived[name] = _add_counts(cur, _flow_pair_counts(flows_delta))
+                elif name == 'token_counts':
+                    derived[name] = _add_counts(cur, _token_counts(flows_delta))
+                elif name == 'rollup':
+                    derived[name] = merge_timeseries_partials(
+                        cur, build_timeseries_rollup(blocks, txs, tagged_delta, block_index=derived['block_index']), ROLLUP_FREQ)
+            # séries par fréquence: re-dérivées à la demande du rollup étendu (O(buckets))
+            derived = {k: v for k, v in derived.items() if not (isinstance(k, tuple) and k[0] == 'ts')}
+            self.events = _concat_rows(self.events, events)
+            self.txs = _concat_rows(self.txs, txs)
+            self.blocks = _concat_rows(self.blocks, blocks)
+            if high_water_block is not None:
+                self.high_water_block = high_water_block
+            self._derived = derived
+            self.version += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._derived = {}
+            self.version += 1
+            self.responses.clear()
+
+    def update(self, events: pd.DataFrame | None = None, txs: pd.DataFrame | None = None,
+               blocks: pd.DataFrame | None = None, token_decimals: pd.DataFrame | None = None) -> None:
+        with self._lock:
+            if events is not None:
+                self.events = events
+            if txs is not None:
+                self.txs = txs
+            if blocks is not None:
+                self.blocks = blocks
+            if token_decimals is not None:
+                self.token_decimals = token_decimals
+            self.invalidate()
+
+
+def _flow_pair_counts(flows: pd.DataFrame) -> pd.Series:
+    return flows.groupby(['from_id','to_id']).size()
+
+
+def _token_counts(flows: pd.DataFrame) -> pd.Series:
+    return flows[flows['token_address_id'] >= 0].groupby('token_address_id').size()
+
+
+def _flow_index_arrays(flows: pd.DataFrame) -> tuple:
+    blocks, ok = _int64_col(flows['block_number'])
+    # bloc non numérique: -1, hors de toute fenêtre de blocs
+    return (np.where(ok, blocks, -1), flows['token_address_id'].to_numpy(), flows['from_id'].to_numpy(),
+            flows['to_id'].to_numpy())
+
+
+def _pair_keys(flows: pd.DataFrame) -> np.ndarray:
+    # (from_id, to_id) → clé int64 (ids int32 ≥ 0)
+    return (flows['from_id'].to_numpy().astype(np.int64) << 32) | flows['to_id'].to_numpy().astype(np.int64)
+
+
+_U64_MISSING = np.uint64(0)
+
+
+def _extend_token_sketch(sketch: HeavyHitters, flows: pd.DataFrame, addresses: AddressDictionary) -> HeavyHitters:
+    # effectif par token + contreparties distinctes (from et to) par HyperLogLog, sur l'empreinte de l'adresse et
+    # non sur l'id interné (qui dépend de l'ordre de chargement: chargement complet ≠ append successifs)
+    tok = flows['token_address_id'].to_numpy()
+    ok = tok >= 0
+    fp = np.append(addresses.fingerprints(), _U64_MISSING)  # id MISSING (-1) → dernière case
+    return sketch.extend(tok[ok], (fp[flows['from_id'].to_numpy()[ok]], fp[flows['to_id'].to_numpy()[ok]]))
+
+
+def _approx_top_tokens(sketch: HeavyHitters, k: int, addresses: AddressDictionary) -> pd.DataFrame:
+    """Même frame que _top_tokens_from_counts (effectifs sous-estimés d'au plus events_max_error) + contreparties estimées."""
+    order, c = _top_count_rows(pd.Series(sketch.counts, index=sketch.keys), k, addresses)
+    ids = sketch.keys[order]
+    top = pd.DataFrame({'token_address': addresses.decode(ids), 'events': c})
+    top['token_short'] = top['token_address'].map(short_hex)
+    top['events_max_error'] = np.int64(sketch.error)
+    top['distinct_counterparties'] = np.rint(sketch.distinct(ids)).astype(np.int64)
+    return top
+
+
+def _approx_top_flow_pairs(sketch: HeavyHitters, top: int, addresses: AddressDictionary) -> pd.DataFrame:
+    """Même frame que _top_flow_pairs (effectifs sous-estimés d'au plus count_max_error)."""
+    idx = pd.MultiIndex.from_arrays([sketch.keys >> 32, sketch.keys & 0xFFFFFFFF])
+    out = _top_flow_pairs(pd.Series(sketch.counts, index=idx), top, addresses)
+    out['count_max_error'] = np.int64(sketch.error)
+    return out
+
+
+def _lookup_address(addresses: AddressDictionary, addr: str) -> int:
+    """Id de l'adresse telle quelle, sinon en minuscules; -1 si inconnue."""
+    i = addresses.lookup(addr)
+    return i if i >= 0 else addresses.lookup(addr.lower())
+
+
+def _add_counts(a: pd.Series, b: pd.Series) -> pd.Series:
+    """Somme de deux compteurs (Series indexées par clé), clés absentes comptées 0."""
+    if b.empty:
+        return a
+    return a.add(b, fill_value=0).astype(np.int64)
+
+
+def _add_counts_first_seen(a: pd.Series, b: pd.Series) -> pd.Series:
+    """_add_counts en gardant l'ordre des clés: celles de a, puis les nouvelles dans l'ordre de b."""
+    if b.empty:
+        return a
+    order = a.index.append(b.index[~b.index.isin(a.index)])
+    return a.add(b, fill_value=0).astype(np.int64).reindex(order)
+
+
+# --- Tâches CPU exécutables dans un worker (tableaux publiés en mémoire partagée, cf. execution.py) ---
+
+_FLOW_KEY_COLUMNS = [f'{c}_id' for c in _PARTY_COLUMNS]
+
+
+def _flow_amount_arrays(frames: EnrichedFrames) -> dict[str, np.ndarray]:
+    f = frames.flows_amounts
+    cols = [*_FLOW_KEY_COLUMNS, *(c for c in f.columns if str(c).startswith('amount_raw_'))]
+    return {**{c: f[c].to_numpy() for c in cols}, 'ranks': frames.addresses.ranks()}
+
+
+def _flow_amounts_task(arrays: dict[str, np.ndarray], top: int,
+                       rows: np.ndarray | None = None) -> Tuple[pd.DataFrame, np.ndarray, UInt256Array]:
+    # rows (cf. EnrichedFrames.flow_rows): seules ces lignes sont copiées hors des tableaux partagés
+    flows = pd.DataFrame({c: a if rows is None else a[rows] for c, a in arrays.items() if c != 'ranks'}, copy=False)
+    return _top_flow_amount_groups(flows, top, _FLOW_KEY_COLUMNS, arrays['ranks'])
+
+
+def _graph_buffers(frames: EnrichedFrames) -> dict[str, np.ndarray]:
+    return {**frames.graph.buffers(), 'ranks': frames.addresses.ranks()}
+
+
+def _counterparties_task(arrays: dict[str, np.ndarray], node: int, directions: list[str], by_token: bool, top: int,
+                         start_block: int | None, end_block: int | None, token: int | None) -> list[tuple]:
+    graph = AddressGraph.from_buffers(arrays)
+    return [graph.counterparties(node, d, start_block=start_block, end_block=end_block, token=token,
+                                 by_token=by_token, top=top, ranks=arrays['ranks']) for d in directions]
+
+
+def _reachable_task(arrays: dict[str, np.ndarray], node: int, max_hops: int, direction: str,
+                    start_block: int | None, end_block: int | None, target: int | None) -> tuple:
+    return AddressGraph.from_buffers(arrays).reachable(node, max_hops, direction, start_block=start_block,
+                                                       end_block=end_block, target=target, ranks=arrays['ranks'])
+
 
 # =============================
 # API Factory (DataFrames en mémoire)
 # =============================
 
-def create_api_app(events: pd.DataFrame, txs: pd.DataFrame, blocks: pd.DataFrame, token_decimals: pd.DataFrame | None = None) -> FastAPI:
-    app = FastAPI(title='Hyper EVM API', version='0.2.0')
+def _metrics_hold(metrics: bool):
+    # registre actif le temps du bloc (chargement, précalcul, durée de vie de l'app), puis état précédent
+    return METRICS.hold() if metrics else nullcontext()
+
+
+def create_api_app(events: pd.DataFrame, txs: pd.DataFrame, blocks: pd.DataFrame, token_decimals: pd.DataFrame | None = None,
+                   *, precompute: bool = False, exact_counts: bool = True, cache_size: int = 128,
+                   high_water_block: int | None = None, lifespan: Callable | None = None, executor: ComputeExecutor | None = None,
+                   metrics: bool = False, server_timing: bool = False) -> FastAPI:
+    store = EnrichedFrames(events, txs, blocks, token_decimals, cache_size=cache_size, high_water_block=high_water_block)
+    if precompute:
+        with _metrics_hold(metrics):
+            store.precompute(exact_counts=exact_counts)
+    return create_api_app_for_store(store, lifespan=lifespan, executor=executor, metrics=metrics, server_timing=server_timing)
+
+
+def create_api_app_for_store(store, *, lifespan: Callable | None = None, executor: ComputeExecutor | None = None,
+                             metrics: bool = False, server_timing: bool = False) -> FastAPI:
+    """Endpoints sur un store: EnrichedFrames (frames en mémoire) ou sql_backend.SQLFrames (agrégats en base).
+
+    Le store expose version, responses, high_water_block, info(), event_type_counts, timeseries_partials(),
+    top_tokens(), top_flow_pairs() (filtrables par blocs, temps, token, adresse); flux avec montants, graphe
+    d'adresses et mode=approx (résumés bornés, cf. sketches.py) exigent les frames en mémoire.
+    Les calculs (pandas ou requêtes SQL) et la sérialisation tournent hors de la boucle d'événements, via
+    `executor` (execution.ComputeExecutor): requêtes identiques coalescées, 503 au-delà de max_inflight calculs,
+    agrégations de flux / graphe dans le pool de processus s'il est configuré (défaut: threads seuls).
+    L'executor est arrêté avec l'app.
+
+    metrics: active le registre metrics.METRICS (étapes du pipeline, latences par route, cache) du démarrage à
+    l'arrêt de l'app (lifespan) et expose /metrics au format Prometheus; server_timing: en-tête Server-Timing
+    (étapes exécutées pour la requête) sur chaque réponse.
+    """
+    executor = executor if executor is not None else ComputeExecutor()
+
+    @asynccontextmanager
+    async def _lifespan(app: FastAPI):
+        try:
+            with _metrics_hold(metrics):
+                if lifespan is None:
+                    yield
+                else:
+                    async with lifespan(app):
+                        yield
+        finally:
+            executor.shutdown()
+
+    app = FastAPI(title='Hyper EVM API', version='0.2.0', lifespan=_lifespan)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=['*'], allow_credentials=True,
         allow_methods=['*'], allow_headers=['*']
     )
+    if metrics:
+        app.add_middleware(MetricsMiddleware, registry=METRICS, server_timing=server_timing)
+    app.state.store = store
+    app.state.executor = executor
+
+    async def _run(key: Hashable, fn: Callable[..., Any], *args: Any) -> Any:
+        try:
+            return await executor.run(key, fn, *args)
+        except ExecutorSaturated as e:
+            raise HTTPException(status_code=503, detail=f"API saturée: {e}",
+                                headers={'Retry-After': str(RETRY_AFTER_SECONDS)}) from None
+
+    def _render(key: Tuple, fmt: str, filename: str, build: Callable[[], pd.DataFrame]):
+        df = build()
+        if len(df) > STREAM_MIN_ROWS:
+            return df
+        hit = _render_df(df, fmt=fmt, filename=filename)
+        store.responses.put(key, hit)
+        return hit
+
+    async def _cached(key: Tuple, fmt: str, filename: str, build: Callable[[], pd.DataFrame]):
+        fmt = _check_fmt(fmt)
+        key = (store.version, *key)
+        hit = store.responses.get(key)
+        METRICS.inc('response_cache_total', (('endpoint', key[1]), ('result', 'miss' if hit is None else 'hit')))
+        if hit is None:
+            hit = await _run(key, _render, key, fmt, filename, build)
+            if isinstance(hit, pd.DataFrame):
+                # grand résultat non mis en cache: un flux par requête (y compris coalescée)
+                return _respond_df(hit, fmt=fmt, filename=filename)
+        body, media_type, headers = hit
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    def _require_frames(what: str) -> EnrichedFrames:
+        if not isinstance(store, EnrichedFrames):
+            raise HTTPException(status_code=501, detail=f"{what} indisponible avec le backend SQL (frames non chargés en mémoire)")
+        return store
+
+    def _publication(name: str, arrays: Callable[[EnrichedFrames], dict[str, np.ndarray]]):
+        # tableaux publiés une fois par version du store (mémoire partagée si pool de processus)
+        return executor.publish(name, store.version, lambda: arrays(store))
 
     @app.get('/')
-    def root():
+    async def root():
         return RedirectResponse(url='/docs')
 
     @app.get('/favicon.ico')
-    def favicon():
+    async def favicon():
         return JSONResponse(status_code=204, content={})
 
     @app.get('/health')
-    def health():
+    async def health():
         return {'ok': True}
 
+    if metrics:
+        @app.get('/metrics')
+        async def metrics_endpoint():
+            body = await asyncio.to_thread(lambda: METRICS.render(_gauges()))
+            return Response(content=body, media_type=PROMETHEUS_CONTENT_TYPE)
+
+    def _gauges() -> list:
+        gauges = [
+            ('store_version', "Version du store (incrémentée à chaque mutation)", [((), store.version)]),
+            ('response_cache_entries', "Entrées du cache de réponses", [((), len(store.responses))]),
+            ('response_cache_lookups', "Consultations cumulées du cache de réponses",
+             [((('result', 'hit'),), store.responses.hits), ((('result', 'miss'),), store.responses.misses)]),
+            ('executor', "Executor de calcul: calculs en vol, limite, coalescés, refusés (503)",
+             [((('stat', k),), v) for k, v in executor.stats().items()]),
+        ]
+        if store.high_water_block is not None:
+            gauges.append(('high_water_block', "Dernier bloc chargé", [((), store.high_water_block)]))
+        sizes = store.frame_sizes() if isinstance(store, EnrichedFrames) else {}
+        if sizes:
+            gauges.append(('frame_rows', "Lignes des frames bruts et dérivés", [((('frame', k),), r) for k, (r, _) in sizes.items()]))
+            gauges.append(('frame_bytes', "Octets des frames (memory_usage non profond)", [((('frame', k),), b) for k, (_, b) in sizes.items()]))
+            gauges.append(('addresses', "Adresses internées", [((), len(store.addresses))]))
+        rss = process_memory_bytes()
+        if rss is not None:
+            gauges.append(('process_resident_memory_bytes', "Mémoire résidente du processus", [((), rss)]))
+        return gauges
+
     @app.get('/info')
-    def info():
-        return {
-            'events_rows': int(len(events)),
-            'tx_rows': int(len(txs)),
-            'blocks_rows': int(len(blocks)),
-            'cols': {
-                'events': list(events.columns),
-                'txs': list(txs.columns),
-                'blocks': list(blocks.columns),
-            }
-        }
+    async def info():
+        return await _run(('info', store.version), store.info)
 
     @app.get('/events/types')
-    def events_types(fmt: str = 'json'):
-        tagged = tag_events_simple(events)
-        vc = tagged['event_type'].value_counts().rename_axis('event_type').reset_index(name='count')
-        return _respond_df(vc, fmt=fmt, filename='events_types')
+    async def events_types(fmt: str = 'json'):
+        fmt = (fmt or 'json').lower()
+        def build():
+            vc = store.event_type_counts.sort_values(ascending=False, kind='stable')
+            return vc.rename_axis('event_type').reset_index(name='count')
+        return await _cached(('events_types', None, None, fmt), fmt, 'events_types', build)
+
+    async def _timeseries(kind: str, name: str, freq: str, start: str | None, end: str | None, fmt: str,
+                    finalize: Callable[[pd.DataFrame], pd.DataFrame] | None = None):
+        f = _validate_freq(freq)
+        fmt = (fmt or 'json').lower()
+        t0, t1 = _parse_time_param(start, 'start'), _parse_time_param(end, 'end')
+        def build():
+            ts = slice_timeseries(store.timeseries_partials(kind, f), t0, t1)
+            if finalize is not None:
+                ts = finalize(ts)
+            return _df_time_to_iso(ts) if fmt in ('json', 'ndjson') else ts.reset_index()
+        return await _cached((name, f, (t0, t1), fmt), fmt, f'{name}_{f}', build)
 
     @app.get('/tx/timeseries')
-    def tx_timeseries(freq: str = 'h', fmt: str = 'json'):
-        f = _validate_freq(freq)
-        ts = prepare_tx_timeseries(blocks, txs, f)
-        df = _df_time_to_iso(ts) if (fmt or 'json').lower() == 'json' else ts.reset_index()
-        return _respond_df(df, fmt=fmt, filename=f'tx_timeseries_{f}')
+    async def tx_timeseries(freq: str = 'h', fmt: str = 'json', start: str | None = None, end: str | None = None):
+        return await _timeseries('tx', 'tx_timeseries', freq, start, end, fmt)
 
     @app.get('/gas/timeseries')
-    def gas_timeseries(freq: str = 'h', fmt: str = 'json'):
-        f = _validate_freq(freq)
-        ts = prepare_gas_timeseries(blocks, f)
-        df = _df_time_to_iso(ts) if (fmt or 'json').lower() == 'json' else ts.reset_index()
-        return _respond_df(df, fmt=fmt, filename=f'gas_timeseries_{f}')
+    async def gas_timeseries(freq: str = 'h', fmt: str = 'json', start: str | None = None, end: str | None = None):
+        return await _timeseries('gas', 'gas_timeseries', freq, start, end, fmt, finalize=finalize_gas_timeseries)
+
+    def _approx_mode(mode: str, filters: dict) -> bool:
+        m = (mode or 'exact').lower()
+        if m not in ('exact', 'approx'):
+            raise HTTPException(status_code=400, detail="mode invalide. Utilisez exact ou approx")
+        if m == 'exact':
+            return False
+        _require_frames('mode=approx')
+        if any(v is not None for v in filters.values()):
+            raise HTTPException(status_code=400, detail="mode=approx ne supporte pas les filtres (résumés globaux)")
+        return True
+
+    def _flow_filters(start_block: int | None, end_block: int | None, start: str | None, end: str | None,
+                      token: str | None, address: str | None) -> dict:
+        # fenêtre de blocs et/ou temporelle [start, end) (heure du bloc), token, adresse en from ou en to
+        return {'start_block': start_block, 'end_block': end_block,
+                'start': _parse_time_param(start, 'start'), 'end': _parse_time_param(end, 'end'),
+                'token': token or None, 'address': address or None}
 
     @app.get('/flows/basic')
-    def flows_basic(top: int = 30, fmt: str = 'json'):
-        tagged = tag_events_simple(events)
-        flows = build_token_flows_basic(tagged)
-        agg = (flows.groupby(['from','to']).size().reset_index(name='count')
-                    .sort_values('count', ascending=False).head(top))
-        return _respond_df(agg, fmt=fmt, filename='flows_basic')
+    async def flows_basic(top: int = 30, fmt: str = 'json', start_block: int | None = None, end_block: int | None = None,
+                          start: str | None = None, end: str | None = None, token: str | None = None,
+                          address: str | None = None, mode: str = 'exact'):
+        fmt = (fmt or 'json').lower()
+        top = _check_top(top)
+        filters = _flow_filters(start_block, end_block, start, end, token, address)
+        approx = _approx_mode(mode, filters)
+        def build():
+            return store.top_flow_pairs(top, approx=True) if approx else store.top_flow_pairs(top, **filters)
+        return await _cached(('flows_basic', (approx, *filters.values()), top, fmt), fmt, 'flows_basic', build)
 
     @app.get('/tokens/top')
-    def tokens_top(k: int = 10, fmt: str = 'json'):
-        tagged = tag_events_simple(events)
-        flows = build_token_flows_basic(tagged)
-        top = top_tokens_by_events(flows, top_k=k)
-        return _respond_df(top, fmt=fmt, filename='tokens_top')
+    async def tokens_top(k: int = 10, fmt: str = 'json', start_block: int | None = None, end_block: int | None = None,
+                         start: str | None = None, end: str | None = None, token: str | None = None,
+                         address: str | None = None, mode: str = 'exact'):
+        fmt = (fmt or 'json').lower()
+        k = _check_top(k, 'k')
+        filters = _flow_filters(start_block, end_block, start, end, token, address)
+        approx = _approx_mode(mode, filters)
+        def build():
+            return store.top_tokens(k, approx=True) if approx else store.top_tokens(k, **filters)
+        return await _cached(('tokens_top', (approx, *filters.values()), k, fmt), fmt, 'tokens_top', build)
 
     @app.get('/flows/amounts')
-    def flows_amounts(top: int = 30, fmt: str = 'json'):
-        tagged = tag_events_simple(events)
-        flows = build_token_flows_with_amounts(tagged, token_decimals)
-        agg = (flows.dropna(subset=['from','to'])
-                   .groupby(['token_address','from','to'])
-                   .agg(events=('transaction_hash','count'), amount_raw_sum=('amount_raw','sum'))
-                   .reset_index()
-                   .sort_values(['events','amount_raw_sum'], ascending=[False, False])
-                   .head(top))
-        return _respond_df(agg, fmt=fmt, filename='flows_amounts')
+    async def flows_amounts(top: int = 30, fmt: str = 'json', start_block: int | None = None, end_block: int | None = None,
+                            start: str | None = None, end: str | None = None, token: str | None = None,
+                            address: str | None = None):
+        fmt = (fmt or 'json').lower()
+        top = _check_top(top)
+        frames = _require_frames('/flows/amounts')
+        filters = _flow_filters(start_block, end_block, start, end, token, address)
+        def build():
+            rows = frames.flow_rows('flows_amounts', **filters)
+            pub = _publication('flows_amounts', _flow_amount_arrays)
+            return _flow_amounts_frame(*executor.cpu(_flow_amounts_task, pub, top, rows), frames.addresses,
+                                       _decimals_by_token(frames.token_decimals))
+        return await _cached(('flows_amounts', tuple(filters.values()), top, fmt), fmt, 'flows_amounts', build)
+
+    # --- Graphe d'adresses: contreparties, volumes par token, chemins (CSR, cf. address_graph.py) ---
+
+    def _address_id(addr: str, what: str = 'Adresse') -> int:
+        frames = _require_frames('Le graphe d\'adresses')
+        frames.graph  # les adresses sont internées à la construction des flux
+        i = _lookup_address(frames.addresses, addr)
+        if i < 0:
+            raise HTTPException(status_code=404, detail=f"{what} inconnue: {addr}")
+        return i
+
+    def _directions(direction: str) -> list[str]:
+        d = (direction or 'out').lower()
+        if d == 'both':
+            return list(DIRECTIONS)
+        if d not in DIRECTIONS:
+            raise HTTPException(status_code=400, detail="direction invalide. Utilisez out, in ou both")
+        return [d]
+
+    def _counterparties_frame(node: int, directions: list[str], by_token: bool, top: int,
+                              start_block: int | None, end_block: int | None, token: int | None) -> pd.DataFrame:
+        parts = []
+        results = executor.cpu(_counterparties_task, _publication('graph', _graph_buffers), node, directions, by_token, top,
+                               start_block, end_block, token)
+        for d, (cp, tk, counts, sums) in zip(directions, results):
+            part = pd.DataFrame({'direction': d, 'counterparty': store.addresses.decode(cp),
+                                 'token_address': store.addresses.decode(tk), 'events': counts,
+                                 'amount_raw_sum': sums.to_ints()})
+            parts.append(part)
+        out = pd.concat(parts, ignore_index=True).sort_values('events', ascending=False, kind='stable').head(top)
+        if not by_token:
+            out = out.drop(columns=['counterparty'])
+        else:
+            out.insert(2, 'counterparty_short', short_hex_col(out['counterparty']))
+        out.insert(len(out.columns) - 2, 'token_short', short_hex_col(out['token_address']))
+        return out.reset_index(drop=True)
+
+    @app.get('/address/{addr}/counterparties')
+    async def address_counterparties(addr: str, direction: str = 'both', top: int = 20, token: str | None = None,
+                                     start_block: int | None = None, end_block: int | None = None, fmt: str = 'json'):
+        fmt = (fmt or 'json').lower()
+        top = _check_top(top)
+        # premier appel: construction du graphe (hors boucle d'événements)
+        node = await _run(('address_id', store.version, addr), _address_id, addr)
+        dirs = _directions(direction)
+        tok = _address_id(token, 'Token') if token else None
+        def build():
+            return _counterparties_frame(node, dirs, True, top, start_block, end_block, tok)
+        return await _cached(('counterparties', node, (tuple(dirs), top, tok, start_block, end_block), fmt), fmt,
+                       'counterparties', build)
+
+    @app.get('/address/{addr}/tokens')
+    async def address_tokens(addr: str, direction: str = 'both', top: int = 50,
+                             start_block: int | None = None, end_block: int | None = None, fmt: str = 'json'):
+        fmt = (fmt or 'json').lower()
+        top = _check_top(top)
+        node = await _run(('address_id', store.version, addr), _address_id, addr)
+        dirs = _directions(direction)
+        def build():
+            return _counterparties_frame(node, dirs, False, top, start_block, end_block, None)
+        return await _cached(('address_tokens', node, (tuple(dirs), top, start_block, end_block), fmt), fmt,
+                       'address_tokens', build)
+
+    @app.get('/address/{addr}/paths')
+    async def address_paths(addr: str, max_hops: int = 2, direction: str = 'out', to: str | None = None,
+                            start_block: int | None = None, end_block: int | None = None, limit: int = 1000,
+                            fmt: str = 'json'):
+        fmt = (fmt or 'json').lower()
+        node = await _run(('address_id', store.version, addr), _address_id, addr)
+        dirs = _directions(direction)
+        if len(dirs) != 1:
+            raise HTTPException(status_code=400, detail="direction invalide pour paths. Utilisez out ou in")
+        if not 1 <= max_hops <= 6:
+            raise HTTPException(status_code=400, detail="max_hops doit être entre 1 et 6")
+        target = _address_id(to) if to else None
+        def build():
+            ids, hops, parents, truncated = executor.cpu(_reachable_task, _publication('graph', _graph_buffers), node,
+                                                         max_hops, dirs[0], start_block, end_block, target)
+            if target is not None:
+                path = np.array(AddressGraph.path_to(target, ids, parents), dtype=np.int64)
+                return pd.DataFrame({'hop': np.arange(len(path)), 'address': store.addresses.decode(path)})
+            keep = slice(0, max(limit, 0))
+            return pd.DataFrame({'address': store.addresses.decode(ids[keep]), 'hops': hops[keep],
+                                 'via': store.addresses.decode(parents[keep]), 'truncated': truncated})
+        return await _cached(('paths', node, (dirs[0], max_hops, target, start_block, end_block, limit), fmt), fmt,
+                       'paths', build)
 
     @app.get('/export.zip')
-    def export_zip(freq: str = 'h'):
+    async def export_zip(freq: str = 'h', fmt: str = 'csv'):
         f = _validate_freq(freq)
-        data = _build_export_zip(blocks, txs, events, f)
-        return StreamingResponse(io.BytesIO(data), media_type='application/zip', headers={'Content-Disposition': 'attachment; filename="hyper_evm_export.zip"'})
+        fmt = (fmt or 'csv').lower()
+        if fmt not in EXPORT_FORMATS:
+            raise HTTPException(status_code=400, detail=f"fmt invalide pour l'export. Choisir parmi {sorted(EXPORT_FORMATS)}")
+        headers = {'Content-Disposition': 'attachment; filename="hyper_evm_export.zip"'}
+        key = (store.version, 'export_zip', f, store.high_water_block, fmt)
+        data = store.responses.get(key)
+        if data is not None:
+            return Response(content=data, media_type='application/zip', headers=headers)
+        members = [
+            (f'activity_tx_{f}', lambda: store.timeseries_partials('tx', f), True),
+            (f'activity_gas_{f}', lambda: finalize_gas_timeseries(store.timeseries_partials('gas', f)), True),
+            (f'activity_transfers_{f}', lambda: store.timeseries_partials('transfers', f), True),
+            ('top_tokens', lambda: store.top_tokens(50), False),
+        ]
+
+        # membres calculés par l'exécuteur (coalescing, 503 si saturé), comme les autres endpoints
+        jobs = [asyncio.ensure_future(_run((store.version, 'export_zip', f, fmt, m[0]), _export_member, *m, fmt))
+                for m in members]
+        await asyncio.sleep(0)  # un tour de boucle: les refus (503) sont connus avant d'envoyer les en-têtes
+        refused = next((j for j in jobs if j.done() and j.exception() is not None), None)
+        if refused is not None:
+            for j in jobs:
+                if not j.cancel():
+                    j.exception()  # refus déjà levés: lus (pas d'avertissement asyncio)
+            raise refused.exception()
+
+        async def stream():
+            sink, parts = _ChunkSink(), []
+            with zipfile.ZipFile(sink, mode='w') as zf:
+                for job in asyncio.as_completed(jobs):
+                    name, body, compression = await job
+                    await asyncio.to_thread(zf.writestr, name, body, compress_type=compression)
+                    parts.append(sink.drain())
+                    yield parts[-1]
+            parts.append(sink.drain())
+            yield parts[-1]
+            store.responses.put(key, b''.join(parts))
+        return StreamingResponse(stream(), media_type='application/zip', headers=headers)
 
     return app
 
@@ -466,6 +1747,10 @@ def create_api_app(events: pd.DataFrame, txs: pd.DataFrame, blocks: pd.DataFrame
 # =============================
 
 def make_pg_engine_from_env(prefix: str = "PG"):
+    """Engine PostgreSQL poolé: {prefix}_POOL_SIZE (5), _MAX_OVERFLOW (10), _POOL_TIMEOUT (30 s), _POOL_RECYCLE (1800 s).
+
+    Les connexions sont vérifiées avant usage (pool_pre_ping) et recyclées: l'API les garde ouvertes longtemps.
+    """
     user = os.getenv(f"{prefix}_USER")
     pwd  = os.getenv(f"{prefix}_PASSWORD")
     host = os.getenv(f"{prefix}_HOST", "localhost")
@@ -474,28 +1759,230 @@ def make_pg_engine_from_env(prefix: str = "PG"):
     if not all([user, pwd, db]):
         raise RuntimeError("Variables d'env manquantes: PG_USER, PG_PASSWORD, PG_DB (PG_HOST/PG_PORT facultatives)")
     url = f"postgresql+psycopg2://{user}:{pwd}@{host}:{port}/{db}"
-    return create_engine(url)
+    return create_engine(url,
+                         pool_size=int(os.getenv(f"{prefix}_POOL_SIZE", "5")),
+                         max_overflow=int(os.getenv(f"{prefix}_MAX_OVERFLOW", "10")),
+                         pool_timeout=float(os.getenv(f"{prefix}_POOL_TIMEOUT", "30")),
+                         pool_recycle=int(os.getenv(f"{prefix}_POOL_RECYCLE", "1800")),
+                         pool_pre_ping=True)
+
+
+def _block_range_query(query: str, block_col: str, after_block: int | None, upto_block: int | None) -> Tuple[str, dict]:
+    """Enveloppe une requête utilisateur pour ne garder que block_col ∈ ]after_block, upto_block]."""
+    conds, params = [], {}
+    if after_block is not None:
+        conds.append(f"q.{block_col} > :after_block")
+        params['after_block'] = int(after_block)
+    if upto_block is not None:
+        conds.append(f"q.{block_col} <= :upto_block")
+        params['upto_block'] = int(upto_block)
+    if not conds:
+        return query, params
+    return f"SELECT * FROM ({query}) AS q WHERE {' AND '.join(conds)}", params
 
 
 def load_frames_from_db(engine, *,
                         tx_query: str = "SELECT * FROM transactions",
                         blocks_query: str = "SELECT * FROM blocks",
-                        events_query: str = "SELECT * FROM event_logs") -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    df_tx = pd.read_sql(text(tx_query), engine)
-    data_blocks = pd.read_sql(text(blocks_query), engine)
-    data_event = pd.read_sql(text(events_query), engine)
+                        events_query: str = "SELECT * FROM event_logs",
+                        after_block: int | None = None,
+                        upto_block: int | None = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    frames = []
+    for query, block_col in ((tx_query, 'block_number'), (blocks_query, 'number'), (events_query, 'block_number')):
+        q, params = _block_range_query(query, block_col, after_block, upto_block)
+        frames.append(pd.read_sql(text(q), engine, params=params or None))
+    df_tx, data_blocks, data_event = frames
+    return df_tx, data_blocks, data_event
+
+
+# Colonnes réellement utilisées par l'analyse → dtype cible (None: chaîne laissée telle quelle)
+TX_COLUMNS = {'hash': None, 'block_number': 'int64', 'input_data': None, 'status': 'UInt8'}
+BLOCK_COLUMNS = {'number': 'int64', 'timestamp': 'int64', 'gas_used': 'int64', 'gas_limit': 'int64',
+                 'base_fee_per_gas': 'Int64'}
+EVENT_COLUMNS = {'transaction_hash': None, 'block_number': 'int64', 'log_index': 'int32', 'address': 'category',
+                 'topic0': 'category', 'topic1': None, 'topic2': None, 'topic3': None, 'data': None}
+# table → (colonne de bloc, colonnes, ORDER BY couvert par un index de schema.sql)
+TYPED_TABLES = {
+    'transactions': ('block_number', TX_COLUMNS, 'block_number, transaction_index'),
+    'blocks':       ('number', BLOCK_COLUMNS, 'number'),
+    'event_logs':   ('block_number', EVENT_COLUMNS, 'block_number, log_index'),
+}
+# seul le sélecteur (0x + 4 octets) de input_data est lu: évite de transférer les calldata complets
+_COLUMN_SQL = {('transactions', 'input_data'): 'SUBSTR(input_data, 1, 10) AS input_data'}
+
+
+def _read_table_typed(engine, table: str, *, after_block: int | None = None, upto_block: int | None = None,
+                      chunksize: int = 100_000) -> pd.DataFrame:
+    block_col, columns, order_by = TYPED_TABLES[table]
+    select = ', '.join(_COLUMN_SQL.get((table, c), c) for c in columns)
+    conds, params = [], {}
+    if after_block is not None:
+        conds.append(f"{block_col} > :after_block")
+        params['after_block'] = int(after_block)
+    if upto_block is not None:
+        conds.append(f"{block_col} <= :upto_block")
+        params['upto_block'] = int(upto_block)
+    where = f" WHERE {' AND '.join(conds)}" if conds else ''
+    q = f"SELECT {select} FROM {table}{where} ORDER BY {order_by}"
+    cat_cols = [c for c, dt in columns.items() if dt == 'category']
+    cats = {c: pd.Index([]) for c in cat_cols}
+    chunks = []
+    with engine.connect() as conn:
+        # curseur côté serveur: les lignes arrivent par lots de `chunksize`, castées au fil de l'eau
+        conn = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+        for chunk in pd.read_sql(text(q), conn, params=params or None, chunksize=chunksize):
+            for c, dt in columns.items():
+                if dt is not None:
+                    chunk[c] = chunk[c].astype(dt)
+            for c in cat_cols:
+                cats[c] = cats[c].union(chunk[c].cat.categories)
+            chunks.append(chunk)
+    if not chunks:
+        return pd.DataFrame({c: pd.Series(dtype=dt or object) for c, dt in columns.items()})
+    for chunk in chunks:
+        for c in cat_cols:
+            chunk[c] = chunk[c].cat.set_categories(cats[c])
+    return pd.concat(chunks, ignore_index=True)
+
+
+def load_frames_typed(engine, *, after_block: int | None = None, upto_block: int | None = None,
+                      chunksize: int = 100_000) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Chargement élagué (colonnes utiles), typé (int64/uint8/catégoriels) et streamé par lots depuis les tables de l'indexer."""
+    kw = dict(after_block=after_block, upto_block=upto_block, chunksize=chunksize)
+    df_tx = _read_table_typed(engine, 'transactions', **kw)
+    data_blocks = _read_table_typed(engine, 'blocks', **kw)
+    data_event = _read_table_typed(engine, 'event_logs', **kw)
     return df_tx, data_blocks, data_event
 
 
+def fetch_last_indexed_block(engine) -> int | None:
+    """High-water de l'indexer (indexer_state.last_indexed_block), None si indisponible."""
+    try:
+        with engine.connect() as conn:
+            v = conn.execute(text("SELECT last_indexed_block FROM indexer_state WHERE id = 1")).scalar()
+    except Exception:
+        logger.warning("indexer_state illisible, high-water inconnu", exc_info=True)
+        return None
+    return int(v) if v is not None else None
+
+
+class DBTailFollower:
+    """Suit indexer_state.last_indexed_block et ajoute au store les lignes des blocs ]high-water, last_indexed].
+
+    `loader(after_block, upto_block)` → (txs, blocks, events); par défaut load_frames_from_db avec les requêtes standard.
+    """
+
+    def __init__(self, engine, store: EnrichedFrames, *, interval: float = 10.0,
+                 loader: Callable[[int | None, int | None], Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]] | None = None):
+        self.engine = engine
+        self.store = store
+        self.interval = float(interval)
+        self.loader = loader or (lambda after, upto: load_frames_from_db(engine, after_block=after, upto_block=upto))
+
+    def poll_once(self) -> int:
+        """Un cycle de rafraîchissement; retourne le nombre de nouveaux blocs intégrés."""
+        last_indexed = fetch_last_indexed_block(self.engine)
+        seen = self.store.high_water_block
+        if last_indexed is None or (seen is not None and last_indexed <= seen):
+            return 0
+        df_tx, data_blocks, data_event = self.loader(seen, last_indexed)
+        self.store.append(data_event, df_tx, data_blocks, high_water_block=last_indexed)
+        return last_indexed - (seen if seen is not None else -1)
+
+    async def run(self) -> None:
+        while True:
+            try:
+                n = await asyncio.to_thread(self.poll_once)
+                if n:
+                    logger.info("refresh: +%d blocs (high-water=%s)", n, self.store.high_water_block)
+            except Exception:
+                logger.exception("refresh DB en échec, nouvel essai dans %.1fs", self.interval)
+            await asyncio.sleep(self.interval)
+
+
+def _follower_lifespan(make_follower: Callable[[FastAPI], Any]):
+    """Lifespan FastAPI: `make_follower(app).run()` en tâche de fond (app.state.follower), annulée à l'arrêt."""
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        follower = make_follower(app)
+        app.state.follower = follower
+        task = asyncio.create_task(follower.run())
+        try:
+            yield
+        finally:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    return lifespan
+
+
 def create_api_app_from_db(engine=None, *,
                            tx_query: str = "SELECT * FROM transactions",
                            blocks_query: str = "SELECT * FROM blocks",
                            events_query: str = "SELECT * FROM event_logs",
-                           token_decimals: pd.DataFrame | None = None, env_prefix: str = "PG") -> FastAPI:
+                           token_decimals: pd.DataFrame | None = None, env_prefix: str = "PG",
+                           precompute: bool = False, exact_counts: bool = True, cache_size: int = 128,
+                           refresh_interval: float | None = None,
+                           typed: bool = False, chunksize: int = 100_000,
+                           snapshot_dir: str | None = None, backend: str = 'memory',
+                           executor: ComputeExecutor | None = None, metrics: bool = False,
+                           server_timing: bool = False) -> FastAPI:
+    """App FastAPI sur un snapshot DB.
+
+    backend='sql': aucune table chargée en mémoire, séries temporelles / types d'events / top tokens / top flux
+    agrégés en base (sql_backend.SQLFrames); /flows/amounts et /address/* répondent 501.
+
+    typed: chargement élagué/typé/streamé (load_frames_typed) au lieu des requêtes *_query.
+    snapshot_dir: snapshot Parquet local (snapshot.SnapshotStore, implique typed); seul le delta depuis son
+    max_block est lu en base, puis persisté dans le snapshot, de même que les deltas du DBTailFollower.
+    exact_counts=False (backend memory): le précalcul construit les résumés de mode=approx au lieu des
+    comptages exacts par paire / token.
+    Le chargement est toujours borné au high-water de l'indexer lu au départ (high_water_block annoncé).
+    refresh_interval (secondes): si défini, le snapshot est ensuite complété en tâche de fond par les seuls
+    nouveaux blocs (DBTailFollower).
+    """
     if engine is None:
         engine = make_pg_engine_from_env(prefix=env_prefix)
-    df_tx, data_blocks, data_event = load_frames_from_db(engine, tx_query=tx_query, blocks_query=blocks_query, events_query=events_query)
-    return create_api_app(data_event, df_tx, data_blocks, token_decimals)
+    with _metrics_hold(metrics):  # étapes de chargement / précalcul chronométrées
+        if backend == 'sql':
+            from sql_backend import SQLFrames, SQLTailFollower
+            store = SQLFrames(engine, cache_size=cache_size)
+            if precompute:
+                store.precompute()
+            lifespan = (_follower_lifespan(lambda app: SQLTailFollower(store, interval=refresh_interval))
+                        if refresh_interval else None)
+            return create_api_app_for_store(store, lifespan=lifespan, executor=executor, metrics=metrics,
+                                            server_timing=server_timing)
+        if backend != 'memory':
+            raise ValueError(f"backend inconnu: {backend} (memory ou sql)")
+        if typed or snapshot_dir:
+            def loader(after_block, upto_block):
+                return load_frames_typed(engine, after_block=after_block, upto_block=upto_block, chunksize=chunksize)
+        else:
+            def loader(after_block, upto_block):
+                return load_frames_from_db(engine, tx_query=tx_query, blocks_query=blocks_query, events_query=events_query,
+                                           after_block=after_block, upto_block=upto_block)
+        high_water = fetch_last_indexed_block(engine)
+        if snapshot_dir:
+            from snapshot import SnapshotStore
+            snap = SnapshotStore(snapshot_dir)
+            snap.sync_from_db(engine, upto_block=high_water, chunksize=chunksize)
+            df_tx, data_blocks, data_event = snap.read()
+
+            def tail_loader(after_block, upto_block):
+                frames = loader(after_block, upto_block)
+                if snap.max_block == after_block:  # snapshot non avancé ailleurs (`snapshot.py refresh`)
+                    snap.write(*frames, max_block=upto_block)
+                return frames
+        else:
+            df_tx, data_blocks, data_event = loader(None, high_water)
+            tail_loader = loader
+        lifespan = (_follower_lifespan(lambda app: DBTailFollower(engine, app.state.store, interval=refresh_interval,
+                                                                 loader=tail_loader))
+                    if refresh_interval else None)
+        return create_api_app(data_event, df_tx, data_blocks, token_decimals, precompute=precompute,
+                              exact_counts=exact_counts, cache_size=cache_size, high_water_block=high_water,
+                              lifespan=lifespan, executor=executor, metrics=metrics, server_timing=server_timing)
 
 # =============================
 # Runner (optionnel) — permet `python hyper_evm_step1_events.py`
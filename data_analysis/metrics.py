@@ -0,0 +1,314 @@
+"""
+Module: metrics.py
+
+But: instrumentation des étapes du pipeline et des requêtes de l'API, exposée au format texte Prometheus
+- Étapes (tagging, flux, datation par bloc, resample, sérialisation...): histogramme de durée, lignes / octets produits,
+  croissance de la mémoire résidente du processus pendant l'étape
+- Requêtes HTTP: histogramme de latence par route (gabarit de chemin), compteur par statut
+- Compteurs libres (ex. hits / misses du cache de réponses par endpoint), jauges calculées au scrape (tailles des frames)
+- Server-Timing optionnel: étapes exécutées pendant la requête, collectées via contextvars (propagés aux threads de calcul)
+- Désactivé (défaut): `stage()` / `timed` / middleware se réduisent à un test de booléen (ni horloge, ni verrou);
+  activation ponctuelle par hold() (actif tant qu'au moins un détenteur, ex. une app avec metrics=True, tourne)
+
+Dépendances: pandas
+"""
+
+from __future__ import annotations
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+import pandas as pd
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# nom → (type, aide); préfixés par le namespace du registre
+METRIC_DEFINITIONS = {
+    'stage_seconds': ('histogram', "Durée des étapes du pipeline (secondes)"),
+    'stage_output_rows_total': ('counter', "Lignes produites par étape (résultats DataFrame / Series / index)"),
+    'stage_output_bytes_total': ('counter', "Octets produits par étape (memory_usage non profond)"),
+    'stage_rss_growth_bytes_total': ('counter', "Croissance de la mémoire résidente du processus pendant l'étape "
+                                                "(octets; inclut les allocations des étapes concurrentes)"),
+    'http_request_duration_seconds': ('histogram', "Latence des requêtes HTTP par route (corps streamé compris)"),
+    'http_requests_total': ('counter', "Requêtes HTTP par route, méthode et statut"),
+    'response_cache_total': ('counter', "Consultations du cache de réponses par endpoint (hit / miss)"),
+}
+
+# étapes de la requête en cours (None: Server-Timing non demandé)
+_REQUEST_STAGES: ContextVar[list | None] = ContextVar('request_stages', default=None)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = (*labels, *extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def _fmt_value(v: float) -> str:
+    if v == float('inf'):
+        return '+Inf'
+    return repr(float(v)) if isinstance(v, float) and not float(v).is_integer() else str(int(v))
+
+
+def frame_size(obj: Any) -> Tuple[int, int] | None:
+    """(lignes, octets) d'un DataFrame / Series (memory_usage non profond) ou d'un objet exposant __len__ et nbytes."""
+    if isinstance(obj, pd.DataFrame):
+        return len(obj), int(obj.memory_usage(index=True, deep=False).sum())
+    if isinstance(obj, pd.Series):
+        return len(obj), int(obj.memory_usage(index=True, deep=False))
+    if hasattr(obj, 'nbytes') and hasattr(obj, '__len__'):
+        return len(obj), int(obj.nbytes)
+    return None
+
+
+class _Stage:
+    __slots__ = ('registry', 'name', 't0', 'rss0')
+
+    def __init__(self, registry: 'MetricsRegistry', name: str):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self) -> '_Stage':
+        self.rss0 = process_memory_bytes()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        seconds = time.perf_counter() - self.t0
+        self.registry.record_stage(self.name, seconds, rss_delta=_rss_delta(self.rss0))
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullStage':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class MetricsRegistry:
+    """Compteurs et histogrammes en mémoire (thread-safe), rendus au format texte Prometheus par render()."""
+
+    def __init__(self, namespace: str = 'hyper_evm', *, enabled: bool = False, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.enabled = enabled
+        self._always = enabled
+        self._holders = 0
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[Labels, float]] = {}
+        # histogramme: labels → [effectifs par bucket (non cumulés, +Inf en dernier), somme, total]
+        self._histograms: dict[str, dict[Labels, list]] = {}
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1.0) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + value
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        if not self.enabled:
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            h = self._histograms.setdefault(name, {}).get(labels)
+            if h is None:
+                h = self._histograms[name][labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+    @contextmanager
+    def hold(self) -> Iterator['MetricsRegistry']:
+        """Active le registre pour la durée du bloc; il reste actif tant qu'un autre détenteur le tient."""
+        with self._lock:
+            self._holders += 1
+            self.enabled = True
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._holders -= 1
+                self.enabled = self._always or self._holders > 0
+
+    # --- Étapes ---
+
+    def record_stage(self, name: str, seconds: float, result: Any = None, rss_delta: int | None = None) -> None:
+        labels = (('stage', name),)
+        self.observe('stage_seconds', labels, seconds)
+        size = frame_size(result)
+        if size is not None:
+            self.inc('stage_output_rows_total', labels, size[0])
+            self.inc('stage_output_bytes_total', labels, size[1])
+        if rss_delta is not None:
+            self.inc('stage_rss_growth_bytes_total', labels, max(rss_delta, 0))
+        spans = _REQUEST_STAGES.get()
+        if spans is not None:
+            spans.append((name, seconds))
+
+    def stage(self, name: str):
+        """Context manager chronométrant une étape (no-op si désactivé)."""
+        return _Stage(self, name) if self.enabled else _NULL_STAGE
+
+    def timed(self, name: str) -> Callable[[Callable], Callable]:
+        """Décorateur: durée, taille du résultat (DataFrame / Series) et croissance de la RSS de chaque appel,
+        enregistrées sous `name`."""
+        def deco(fn: Callable) -> Callable:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                rss0 = process_memory_bytes()
+                t0 = time.perf_counter()
+                out = fn(*args, **kwargs)
+                seconds = time.perf_counter() - t0
+                self.record_stage(name, seconds, out, rss_delta=_rss_delta(rss0))
+                return out
+            return wrapper
+        return deco
+
+    def timed_iter(self, name: str, chunks: Iterable[bytes]) -> Iterable[bytes]:
+        """Itérateur dont le temps passé à produire les éléments (hors consommation) compte pour l'étape `name`."""
+        if not self.enabled:
+            return chunks
+        return self._timed_iter(name, iter(chunks))
+
+    def _timed_iter(self, name: str, it: Iterator[bytes]) -> Iterator[bytes]:
+        total = 0.0
+        try:
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    chunk = next(it)
+                except StopIteration:
+                    break
+                finally:
+                    total += time.perf_counter() - t0
+                yield chunk
+        finally:
+            self.record_stage(name, total)
+
+    # --- Exposition ---
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def render(self, gauges: Iterable[Tuple[str, str, list[Tuple[Labels, float]]]] = ()) -> str:
+        """Texte Prometheus: compteurs et histogrammes enregistrés + jauges (nom, aide, [(labels, valeur)])."""
+        with self._lock:
+            counters = {k: dict(v) for k, v in self._counters.items()}
+            histograms = {k: {lb: [list(h[0]), h[1], h[2]] for lb, h in v.items()} for k, v in self._histograms.items()}
+        lines = []
+        for name, (kind, doc) in METRIC_DEFINITIONS.items():
+            full = f'{self.namespace}_{name}'
+            if kind == 'counter' and name in counters:
+                lines += [f'# HELP {full} {doc}', f'# TYPE {full} counter']
+                lines += [f'{full}{_fmt_labels(lb)} {_fmt_value(v)}' for lb, v in sorted(counters[name].items())]
+            elif kind == 'histogram' and name in histograms:
+                lines += [f'# HELP {full} {doc}', f'# TYPE {full} histogram']
+                for lb, (counts, total, n) in sorted(histograms[name].items()):
+                    cum = 0
+                    for b, c in zip((*self.buckets, float('inf')), counts):
+                        cum += c
+                        lines.append(f'{full}_bucket{_fmt_labels(lb, (("le", _fmt_value(b)),))} {cum}')
+                    lines.append(f'{full}_sum{_fmt_labels(lb)} {_fmt_value(total)}')
+                    lines.append(f'{full}_count{_fmt_labels(lb)} {n}')
+        for name, doc, samples in gauges:
+            full = f'{self.namespace}_{name}'
+            lines += [f'# HELP {full} {doc}', f'# TYPE {full} gauge']
+            lines += [f'{full}{_fmt_labels(lb)} {_fmt_value(v)}' for lb, v in samples]
+        return '\n'.join(lines) + '\n'
+
+
+# registre du processus (les fonctions du pipeline y enregistrent leurs étapes)
+METRICS = MetricsRegistry()
+
+
+def server_timing_header(spans: list[Tuple[str, float]], total: float) -> str:
+    """Étapes (durées cumulées par nom, ordre de première occurrence) + total, en millisecondes."""
+    agg: dict[str, float] = {}
+    for name, seconds in spans:
+        agg[name] = agg.get(name, 0.0) + seconds
+    parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in agg.items()]
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latence / statut par route; en-tête Server-Timing si `server_timing`.
+
+    La durée couvre l'envoi complet du corps (réponses streamées); le Server-Timing, émis avec les en-têtes,
+    ne couvre que les étapes terminées à ce moment.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = METRICS, server_timing: bool = False):
+        self.app = app
+        self.registry = registry
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.registry.enabled:
+            return await self.app(scope, receive, send)
+        spans = [] if self.server_timing else None
+        token = _REQUEST_STAGES.set(spans)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if spans is not None:
+                    value = server_timing_header(spans, time.perf_counter() - t0)
+                    message = {**message, 'headers': [*message.get('headers', []), (b'server-timing', value.encode('latin-1'))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _REQUEST_STAGES.reset(token)
+            route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+            labels = (('route', route), ('method', scope.get('method', '')))
+            self.registry.observe('http_request_duration_seconds', labels, time.perf_counter() - t0)
+            self.registry.inc('http_requests_total', (*labels, ('status', str(status))))
+
+
+def process_memory_bytes() -> int | None:
+    """RSS courante du processus (Linux: /proc/self/statm), sinon pic RSS (getrusage)."""
+    try:
+        import os
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    except Exception:  # pragma: no cover
+        return None
+
+
+def _rss_delta(before: int | None) -> int | None:
+    after = process_memory_bytes() if before is not None else None
+    return None if after is None else after - before
@@ -0,0 +1,287 @@
+"""
+Module: out_of_core.py
+
+But: traitement par partitions de blocs des historiques plus grands que la RAM
+- Partition = (txs, blocks, events) d'une même plage de blocs: snapshot Parquet (SnapshotStore.iter_partitions),
+  lectures DB par plage (db_partitions) ou frames déjà chargés (frame_partitions)
+- Chaque partition passe par le tagging, les flux et le rollup, puis est réduite à des agrégats additifs
+  (comptes, sommes uint256 exactes, buckets ROLLUP_FREQ) fusionnés au fil de l'eau: PartitionAggregates
+- Mêmes noms que hyper_evm_step1_events.py, mêmes résultats que le chemin en mémoire sur la concaténation:
+  tag_events_simple / build_token_flows_basic / build_token_flows_with_amounts (itérateurs de frames),
+  top_tokens_by_events, aggregate_flow_amounts, build_timeseries_rollup
+- Pic mémoire: partitions en vol (1, ou processes + 1 avec un pool) + agrégats (∝ clés distinctes, pas lignes)
+
+Dépendances: pandas, numpy (+ hyper_evm_step1_events.py)
+"""
+
+from __future__ import annotations
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import hyper_evm_step1_events as H
+from uint256 import UInt256Array
+
+Partition = Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]  # (txs, blocks, events)
+
+PARTITION_BLOCKS = 100_000
+
+
+# =============================
+# Sources de partitions
+# =============================
+
+def frame_partitions(txs: pd.DataFrame, blocks: pd.DataFrame, events: pd.DataFrame,
+                     partition_blocks: int = PARTITION_BLOCKS) -> Iterator[Partition]:
+    """Frames en mémoire découpés par plages de `partition_blocks` blocs (numéros int, hex '0x..' ou décimaux;
+    lignes sans numéro de bloc valide ignorées)."""
+    keys = [pd.to_numeric(H._numeric_col(df[c]), errors='coerce').to_numpy(dtype=np.float64) // partition_blocks
+            for df, c in ((txs, 'block_number'), (blocks, 'number'), (events, 'block_number'))]
+    present = np.concatenate([k[~np.isnan(k)] for k in keys])
+    for key in np.unique(present):
+        yield tuple(df[k == key].reset_index(drop=True) for df, k in zip((txs, blocks, events), keys))
+
+
+def db_partitions(engine, *, partition_blocks: int = PARTITION_BLOCKS, after_block: int | None = None,
+                  upto_block: int | None = None, chunksize: int = 100_000) -> Iterator[Partition]:
+    """Lectures typées (load_frames_typed) par plages ]after, after + partition_blocks], jusqu'au high-water de l'indexer."""
+    upto = upto_block if upto_block is not None else H.fetch_last_indexed_block(engine)
+    if upto is None:
+        return
+    after = after_block
+    if after is None:
+        with engine.connect() as conn:
+            first = conn.execute(text("SELECT MIN(number) FROM blocks")).scalar()
+        if first is None:
+            return
+        after = int(first) - 1
+    while after < upto:
+        hi = min(after + partition_blocks, upto)
+        yield H.load_frames_typed(engine, after_block=after, upto_block=hi, chunksize=chunksize)
+        after = hi
+
+
+def _empty_partition() -> Partition:
+    return tuple(pd.DataFrame(columns=list(cols)) for cols in (H.TX_COLUMNS, H.BLOCK_COLUMNS, H.EVENT_COLUMNS))
+
+
+def map_partitions(fn: Callable[..., Any], partitions: Iterable[Partition], *args: Any,
+                   processes: int = 0) -> Iterator[Any]:
+    """fn(txs, blocks, events, *args) par partition, résultats dans l'ordre des partitions.
+
+    processes > 0: pool de processus (spawn), au plus processes + 1 partitions soumises à la fois.
+    fn doit être une fonction de module (picklable).
+    """
+    if processes <= 0:
+        for txs, blocks, events in partitions:
+            yield fn(txs, blocks, events, *args)
+        return
+    with ProcessPoolExecutor(processes, mp_context=mp.get_context('spawn')) as pool:
+        pending = deque()
+        for txs, blocks, events in partitions:
+            pending.append(pool.submit(fn, txs, blocks, events, *args))
+            if len(pending) > processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# =============================
+# Agrégats partiels
+# =============================
+
+def _add_counts(a: pd.Series | None, b: pd.Series) -> pd.Series:
+    # clés de `a` d'abord, nouvelles clés de `b` ensuite (ordre de première occurrence conservé)
+    if a is None:
+        return b
+    if b.empty:
+        return a
+    index = a.index.append(b.index.difference(a.index, sort=False))
+    return a.reindex(index, fill_value=0).add(b.reindex(index, fill_value=0)).astype(np.int64)
+
+
+def _combine_flow_groups(parts: list[Tuple[pd.DataFrame, np.ndarray, UInt256Array]]) -> Tuple[pd.DataFrame, np.ndarray, UInt256Array]:
+    """Groupes (token, from, to) → effectifs, sommes exactes, regroupés sur l'union des partiels (ordre des clés trié)."""
+    keys = pd.concat([p[0] for p in parts], ignore_index=True)
+    counts = np.concatenate([p[1] for p in parts])
+    sums = UInt256Array.concat([p[2] for p in parts])
+    codes = keys.groupby(H._PARTY_COLUMNS, sort=True, observed=True).ngroup().to_numpy(dtype=np.int64)
+    ngroups = int(codes.max()) + 1 if len(codes) else 0
+    total = np.zeros(ngroups, dtype=np.int64)
+    np.add.at(total, codes, counts)
+    _, first = np.unique(codes, return_index=True)
+    return keys.iloc[first].reset_index(drop=True), total, sums.group_sum(codes, ngroups)
+
+
+def _token_counts(flows: pd.DataFrame) -> pd.Series:
+    return _str_index(flows.groupby('token_address', observed=True).size())
+
+
+def _flow_groups(tagged: pd.DataFrame, token_decimals: pd.DataFrame | None) -> Tuple[pd.DataFrame, np.ndarray, UInt256Array]:
+    # tous les groupes (token, from, to) de la partition: effectifs et sommes exactes
+    flows = H.build_token_flows_with_amounts(tagged, token_decimals, compact=True)
+    return H._top_flow_amount_groups(flows, len(flows), H._PARTY_COLUMNS)
+
+
+def _str_index(counts: pd.Series) -> pd.Series:
+    # clés catégorielles (frames typés) → chaînes: index comparables d'une partition à l'autre
+    if isinstance(counts.index, pd.MultiIndex):
+        counts.index = pd.MultiIndex.from_arrays([lv.astype(object) for lv in
+                                                  (counts.index.get_level_values(i) for i in range(counts.index.nlevels))])
+    else:
+        counts.index = counts.index.astype(object)
+    return counts
+
+
+class PartitionAggregates:
+    """Agrégats additifs d'une ou plusieurs partitions, fusionnables (merge) dans l'ordre des blocs.
+
+    event_type_counts (ordre de première occurrence), token_counts, flow_pair_counts, flow_groups
+    (clés token/from/to, effectifs, sommes uint256; None si amounts=False) et rollup ROLLUP_FREQ.
+    Taille proportionnelle aux clés distinctes (types, tokens, paires, triplets, buckets), pas aux lignes.
+    """
+
+    def __init__(self, event_type_counts: pd.Series | None = None, token_counts: pd.Series | None = None,
+                 flow_pair_counts: pd.Series | None = None, flow_groups: tuple | None = None,
+                 rollup: pd.DataFrame | None = None):
+        self.event_type_counts = event_type_counts
+        self.token_counts = token_counts
+        self.flow_pair_counts = flow_pair_counts
+        self.flow_groups = flow_groups
+        self.rollup = rollup
+
+    @classmethod
+    def from_partition(cls, txs: pd.DataFrame, blocks: pd.DataFrame, events: pd.DataFrame,
+                       token_decimals: pd.DataFrame | None = None, amounts: bool = True) -> 'PartitionAggregates':
+        tagged = H.tag_events_simple(events)
+        flows = H.build_token_flows_basic(tagged)
+        groups = None
+        if amounts:
+            groups = _flow_groups(tagged, token_decimals)
+        return cls(event_type_counts=_str_index(tagged['event_type'].value_counts(sort=False)),
+                   token_counts=_token_counts(flows),
+                   flow_pair_counts=_str_index(flows.groupby(['from', 'to'], observed=True).size()),
+                   flow_groups=groups,
+                   rollup=H.build_timeseries_rollup(blocks, txs, tagged))
+
+    def merge(self, other: 'PartitionAggregates') -> 'PartitionAggregates':
+        groups = None
+        if self.flow_groups is not None and other.flow_groups is not None:
+            groups = _combine_flow_groups([self.flow_groups, other.flow_groups])
+        rollup = other.rollup if self.rollup is None else H.merge_timeseries_partials(self.rollup, other.rollup, H.ROLLUP_FREQ)
+        return PartitionAggregates(
+            event_type_counts=_add_counts(self.event_type_counts, other.event_type_counts),
+            token_counts=_add_counts(self.token_counts, other.token_counts),
+            flow_pair_counts=_add_counts(self.flow_pair_counts, other.flow_pair_counts),
+            flow_groups=groups if self.flow_groups is not None else other.flow_groups,
+            rollup=rollup)
+
+    # --- Résultats (mêmes frames que le chemin en mémoire) ---
+
+    def event_types(self) -> pd.Series:
+        return self.event_type_counts.sort_values(ascending=False, kind='stable')
+
+    def top_tokens(self, top_k: int = 10) -> pd.DataFrame:
+        return H._top_tokens_from_counts(self.token_counts.sort_index(), top_k)
+
+    def top_flow_pairs(self, top: int = 30) -> pd.DataFrame:
+        """Paires from → to par nombre de transferts, ex aequo par from puis to."""
+        c = self.flow_pair_counts
+        out = pd.DataFrame({'from': c.index.get_level_values(0).to_numpy(dtype=object),
+                            'to': c.index.get_level_values(1).to_numpy(dtype=object), 'count': c.to_numpy()})
+        out = out.sort_values(['count', 'from', 'to'], ascending=[False, True, True], kind='stable')
+        return out.head(max(top, 0)).reset_index(drop=True)
+
+    def flow_amounts(self, top: int = 30, token_decimals: pd.DataFrame | None = None) -> pd.DataFrame:
+        if self.flow_groups is None:
+            raise ValueError("agrégats construits sans montants (amounts=False)")
+        keys, counts, sums = self.flow_groups
+        order = np.lexsort([*sums.sort_keys_desc(), -counts])[:top]
+        return H._flow_amounts_frame(keys.iloc[order].reset_index(drop=True), counts[order], sums.take(order),
+                                     decimals=H._decimals_by_token(token_decimals))
+
+
+def _partition_token_counts(txs: pd.DataFrame, blocks: pd.DataFrame, events: pd.DataFrame) -> pd.Series:
+    return _token_counts(H.build_token_flows_basic(H.tag_events_simple(events)))
+
+
+def _partition_flow_groups(txs: pd.DataFrame, blocks: pd.DataFrame, events: pd.DataFrame,
+                           token_decimals: pd.DataFrame | None) -> Tuple[pd.DataFrame, np.ndarray, UInt256Array]:
+    return _flow_groups(H.tag_events_simple(events), token_decimals)
+
+
+def _partition_rollup(txs: pd.DataFrame, blocks: pd.DataFrame, events: pd.DataFrame) -> pd.DataFrame:
+    return H.build_timeseries_rollup(blocks, txs, H.tag_events_simple(events))
+
+
+def _partition_aggregates(txs: pd.DataFrame, blocks: pd.DataFrame, events: pd.DataFrame,
+                          token_decimals: pd.DataFrame | None, amounts: bool) -> PartitionAggregates:
+    return PartitionAggregates.from_partition(txs, blocks, events, token_decimals, amounts)
+
+
+def aggregate(partitions: Iterable[Partition], *, token_decimals: pd.DataFrame | None = None, amounts: bool = True,
+              processes: int = 0) -> PartitionAggregates:
+    """Tous les agrégats en une passe sur les partitions (fusionnés au fil de l'eau)."""
+    acc = PartitionAggregates()
+    for part in map_partitions(_partition_aggregates, partitions, token_decimals, amounts, processes=processes):
+        acc = acc.merge(part)
+    return acc
+
+
+# =============================
+# Mêmes noms que le chemin en mémoire
+# =============================
+
+def tag_events_simple(partitions: Iterable[Partition]) -> Iterator[pd.DataFrame]:
+    """Events taggés, partition par partition."""
+    for _, _, events in partitions:
+        yield H.tag_events_simple(events)
+
+
+def build_token_flows_basic(partitions: Iterable[Partition]) -> Iterator[pd.DataFrame]:
+    """Flux from → to, partition par partition."""
+    for _, _, events in partitions:
+        yield H.build_token_flows_basic(H.tag_events_simple(events))
+
+
+def build_token_flows_with_amounts(partitions: Iterable[Partition], token_decimals: pd.DataFrame | None = None, *,
+                                   compact: bool = False) -> Iterator[pd.DataFrame]:
+    """Flux avec montants exacts, partition par partition."""
+    for _, _, events in partitions:
+        yield H.build_token_flows_with_amounts(H.tag_events_simple(events), token_decimals, compact=compact)
+
+
+def top_tokens_by_events(partitions: Iterable[Partition], top_k: int = 10, *, processes: int = 0) -> pd.DataFrame:
+    """= H.top_tokens_by_events(H.build_token_flows_basic(events), top_k) sur la concaténation des partitions."""
+    counts = None
+    for part in map_partitions(_partition_token_counts, partitions, processes=processes):
+        counts = _add_counts(counts, part)
+    return PartitionAggregates(token_counts=counts if counts is not None else pd.Series(dtype=np.int64)).top_tokens(top_k)
+
+
+def aggregate_flow_amounts(partitions: Iterable[Partition], top: int = 30, *, token_decimals: pd.DataFrame | None = None,
+                           processes: int = 0) -> pd.DataFrame:
+    """= H.aggregate_flow_amounts(H.build_token_flows_with_amounts(events, token_decimals, compact=True), top,
+    token_decimals=token_decimals)."""
+    groups = None
+    for part in map_partitions(_partition_flow_groups, partitions, token_decimals, processes=processes):
+        groups = part if groups is None else _combine_flow_groups([groups, part])
+    if groups is None:
+        groups = _flow_groups(H.tag_events_simple(_empty_partition()[2]), token_decimals)
+    return PartitionAggregates(flow_groups=groups).flow_amounts(top, token_decimals)
+
+
+def build_timeseries_rollup(partitions: Iterable[Partition], *, processes: int = 0) -> pd.DataFrame:
+    """= H.build_timeseries_rollup(blocks, txs, events) sur la concaténation des partitions."""
+    rollup = None
+    for part in map_partitions(_partition_rollup, partitions, processes=processes):
+        rollup = part if rollup is None else H.merge_timeseries_partials(rollup, part, H.ROLLUP_FREQ)
+    if rollup is None:
+        # aucune partition: même frame vide que le chemin en mémoire
+        rollup = _partition_rollup(*_empty_partition())
+    return rollup
@@ -2,20 +2,65 @@ from dotenv import load_dotenv
 load_dotenv()  # charge les variables PG_* depuis .env
 
 import os
-from hyper_evm_step1_events import create_api_app_from_db
+from execution import ComputeExecutor
+from hyper_evm_step1_events import SIGNATURES, create_api_app_from_db
 
 # Requêtes par défaut (tu peux aussi les définir via variables d'env si tu veux affiner)
 TX_QUERY     = os.getenv("TX_QUERY",     "SELECT * FROM transactions")
 BLOCKS_QUERY = os.getenv("BLOCKS_QUERY", "SELECT * FROM blocks")
 EVENTS_QUERY = os.getenv("EVENTS_QUERY", "SELECT * FROM event_logs")
 
-# Fabrique l'app FastAPI en chargeant un snapshot depuis la DB au démarrage
-app = create_api_app_from_db(
-    tx_query=TX_QUERY,
-    blocks_query=BLOCKS_QUERY,
-    events_query=EVENTS_QUERY,
-)
+
+# Lancement: `python runner.py`, `uvicorn runner:create_app --factory` ou, comme avant, `uvicorn runner:app`
+def create_app():
+    """Fabrique l'app FastAPI en chargeant un snapshot depuis la DB au démarrage.
+
+    Appelée par uvicorn (factory=True) dans le processus serveur uniquement: les workers `spawn` du pool de calcul
+    (API_CPU_WORKERS) ré-importent ce module sans reconstruire l'app ni recharger l'historique.
+    """
+    # registres de signatures supplémentaires (JSON / CSV / ABI), séparés par os.pathsep: méthodes et events labellisés
+    for path in filter(None, os.getenv("SIGNATURE_FILES", "").split(os.pathsep)):
+        SIGNATURES.load(path)
+    # options désactivées par défaut (comportement d'origine): API_PRECOMPUTE=1, TYPED_LOADER=1, API_METRICS=1 pour les activer
+    return create_api_app_from_db(
+        tx_query=TX_QUERY,
+        blocks_query=BLOCKS_QUERY,
+        events_query=EVENTS_QUERY,
+        # API_PRECOMPUTE=1: dérivés et agrégats calculés au démarrage plutôt qu'à la première requête
+        precompute=os.getenv("API_PRECOMPUTE", "0") == "1",
+        # API_EXACT_COUNTS=0: seul mode=approx attendu, précalcul des résumés bornés au lieu des comptages exacts
+        exact_counts=os.getenv("API_EXACT_COUNTS", "1") == "1",
+        cache_size=int(os.getenv("API_CACHE_SIZE", "128")),
+        refresh_interval=float(os.getenv("REFRESH_INTERVAL", "0")) or None,
+        # snapshot Parquet local (`python snapshot.py build`), complété au démarrage et à chaque refresh
+        snapshot_dir=os.getenv("SNAPSHOT_DIR") or None,
+        # TYPED_LOADER=1: loader typé/élagué/streamé (les requêtes *_QUERY ci-dessus sont alors ignorées)
+        typed=os.getenv("TYPED_LOADER", "0") == "1",
+        # "sql": agrégats calculés dans PostgreSQL, tables non chargées en RAM
+        backend=os.getenv("API_BACKEND", "memory"),
+        # calculs en vol max (503 au-delà) ; API_CPU_WORKERS > 0: agrégations flux/graphe dans un pool de processus
+        executor=ComputeExecutor(max_inflight=int(os.getenv("API_MAX_INFLIGHT", "16")),
+                                 processes=int(os.getenv("API_CPU_WORKERS", "0"))),
+        # API_METRICS=1: /metrics (Prometheus) ; API_SERVER_TIMING=1: durées des étapes dans l'en-tête Server-Timing
+        metrics=os.getenv("API_METRICS", "0") == "1",
+        server_timing=os.getenv("API_SERVER_TIMING", "0") == "1",
+    )
+
+
+_app = None
+
+
+def __getattr__(name):
+    # compatibilité `uvicorn runner:app`: l'app est construite au premier accès à runner.app, pas à l'import
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("runner:app", host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")), reload=True)
+    uvicorn.run("runner:create_app", factory=True, host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")),
+                reload=True)
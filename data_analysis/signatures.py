@@ -0,0 +1,212 @@
+"""
+Module: signatures.py
+
+But: registre extensible de signatures (sélecteurs 4 octets des fonctions, topic0 32 octets des events)
+- Chargement depuis des fichiers locaux: JSON ({hash: signature}, liste d'entrées, ABI / artefact {"abi": [...]})
+  ou CSV (colonnes hash/selector/topic/hex_signature + signature/text_signature, type optionnel)
+- Stockage compact: clés entières triées (uint32 pour les sélecteurs, 4 × uint64 big-endian pour les topics)
+  + tableau des signatures, recherche par searchsorted
+- Étiquetage vectorisé d'une colonne: factorisation, décodage hex des seules valeurs distinctes, une recherche
+- Signatures texte sans hash: keccak256 via pycryptodome (optionnel)
+
+Dépendances: numpy, pandas (+ uint256.py) ; optionnel: pycryptodome
+"""
+
+from __future__ import annotations
+import csv
+import json
+import os
+import threading
+from typing import Any, Iterable, Iterator, Mapping, Tuple
+
+import numpy as np
+import pandas as pd
+
+from uint256 import HEX_LUT
+
+try:  # optionnel: hash des signatures texte (keccak256)
+    from Crypto.Hash import keccak as _keccak
+except Exception:  # pragma: no cover
+    _keccak = None
+
+SELECTOR_DTYPE = np.dtype('>u4')
+TOPIC_DTYPE = np.dtype([('w0', '>u8'), ('w1', '>u8'), ('w2', '>u8'), ('w3', '>u8')])
+_KINDS = {'selector': SELECTOR_DTYPE, 'topic': TOPIC_DTYPE}
+_KIND_BY_HEX_LEN = {2 + 2 * dt.itemsize: kind for kind, dt in _KINDS.items()}
+
+_HASH_COLUMNS = ('selector', 'topic', 'topic0', 'hex_signature', 'hash')
+_TEXT_COLUMNS = ('signature', 'text_signature', 'name')
+_TYPE_COLUMNS = ('type', 'kind')
+
+
+def keccak_hex(text: str) -> str:
+    if _keccak is None:
+        raise RuntimeError("pycryptodome requis pour hacher des signatures texte (pip install pycryptodome)")
+    h = _keccak.new(digest_bits=256)
+    h.update(text.encode('utf-8'))
+    return '0x' + h.hexdigest()
+
+
+def hex_keys(values: Iterable[Any], dtype: np.dtype) -> Tuple[np.ndarray, np.ndarray]:
+    """Chaînes '0x' + 2 × itemsize chiffres hex → (clés `dtype`, masque valide); autre valeur → invalide."""
+    values = np.asarray(values, dtype=object)
+    width = 2 * dtype.itemsize
+    ok = np.fromiter((isinstance(v, str) and len(v) == width + 2 and v[:2] in ('0x', '0X') for v in values),
+                     dtype=bool, count=len(values))
+    keys = np.zeros(len(values), dtype=dtype)
+    if ok.any():
+        raw = ''.join(v[2:] for v in values[ok]).encode('latin-1', errors='replace')
+        nib = HEX_LUT[np.frombuffer(raw, dtype=np.uint8)].reshape(-1, width)
+        octets = np.ascontiguousarray((nib[:, 0::2] << 4) | nib[:, 1::2])
+        keys[ok] = octets.view(dtype).ravel()
+        ok[ok] = (nib != 255).all(axis=1)
+    return keys, ok
+
+
+def abi_signature(entry: Mapping[str, Any]) -> str:
+    """Entrée d'ABI JSON → signature canonique 'name(type1,type2)' (tuples développés)."""
+    def _type(p: Mapping[str, Any]) -> str:
+        t = p['type']
+        if t.startswith('tuple'):
+            return '(' + ','.join(_type(c) for c in p.get('components', [])) + ')' + t[len('tuple'):]
+        return t
+    return f"{entry['name']}({','.join(_type(p) for p in entry.get('inputs', []))})"
+
+
+class _Table:
+    """Clés triées uniques + signatures alignées (instantané immuable, remplacé à chaque ajout)."""
+
+    __slots__ = ('keys', 'names')
+
+    def __init__(self, keys: np.ndarray, names: np.ndarray):
+        self.keys = keys
+        self.names = names
+
+    def merged(self, keys: np.ndarray, names: np.ndarray) -> '_Table':
+        # dernier ajout prioritaire: tri stable puis dernier élément de chaque groupe de clés égales
+        k, v = np.concatenate([self.keys, keys]), np.concatenate([self.names, names])
+        order = np.argsort(k, kind='stable')
+        k, v = k[order], v[order]
+        last = np.ones(len(k), dtype=bool)
+        last[:-1] = k[1:] != k[:-1]
+        return _Table(k[last], v[last])
+
+    def lookup(self, keys: np.ndarray, ok: np.ndarray) -> np.ndarray:
+        out = np.full(len(keys), None, dtype=object)
+        if not len(self.keys):
+            return out
+        i = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        hit = ok & (self.keys[i] == keys)
+        out[hit] = self.names[i[hit]]
+        return out
+
+
+class SignatureRegistry:
+    """Sélecteurs de fonctions et topic0 d'events → signature texte ('transfer(address,uint256)').
+
+    Le type d'une entrée se déduit de la longueur de son hash (10 caractères: sélecteur, 66: topic);
+    en cas de doublon, la dernière entrée ajoutée l'emporte.
+    """
+
+    def __init__(self, selectors: Mapping[str, str] | None = None, topics: Mapping[str, str] | None = None):
+        self._lock = threading.Lock()
+        self._tables = {kind: _Table(np.empty(0, dtype=dt), np.empty(0, dtype=object)) for kind, dt in _KINDS.items()}
+        self.add((selectors or {}).items())
+        self.add((topics or {}).items())
+
+    @property
+    def n_selectors(self) -> int:
+        return len(self._tables['selector'].keys)
+
+    @property
+    def n_topics(self) -> int:
+        return len(self._tables['topic'].keys)
+
+    def __len__(self) -> int:
+        return self.n_selectors + self.n_topics
+
+    @property
+    def nbytes(self) -> int:
+        return sum(t.keys.nbytes + t.names.nbytes for t in self._tables.values())
+
+    def add(self, entries: Iterable[Tuple[str, str]]) -> int:
+        """Ajoute des paires (hash hex, signature); retourne le nombre d'entrées retenues (hash invalide ignoré)."""
+        by_kind: dict[str, Tuple[list, list]] = {kind: ([], []) for kind in _KINDS}
+        for h, name in entries:
+            kind = _KIND_BY_HEX_LEN.get(len(h)) if isinstance(h, str) else None
+            if kind is not None:
+                by_kind[kind][0].append(h)
+                by_kind[kind][1].append(name)
+        added = 0
+        with self._lock:
+            for kind, (hashes, names) in by_kind.items():
+                if not hashes:
+                    continue
+                keys, ok = hex_keys(hashes, _KINDS[kind])
+                self._tables[kind] = self._tables[kind].merged(keys[ok], np.asarray(names, dtype=object)[ok])
+                added += int(ok.sum())
+        return added
+
+    def load(self, path: str) -> int:
+        """Charge un fichier JSON ou CSV de signatures; retourne le nombre d'entrées ajoutées."""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.json':
+            with open(path, encoding='utf-8') as f:
+                rows = _json_rows(json.load(f))
+        elif ext in ('.csv', '.tsv'):
+            with open(path, encoding='utf-8', newline='') as f:
+                rows = [_row_entry(r) for r in csv.DictReader(f, delimiter='\t' if ext == '.tsv' else ',')]
+        else:
+            raise ValueError(f"format de registre non supporté: {path} (attendu .json, .csv ou .tsv)")
+        return self.add(_resolve(rows))
+
+    def _label(self, kind: str, col: pd.Series | np.ndarray) -> np.ndarray:
+        # une seule passe de hachage sur la colonne, décodage hex / recherche sur les valeurs distinctes
+        codes, uniques = pd.factorize(col if isinstance(col, pd.Series) else np.asarray(col, dtype=object))
+        keys, ok = hex_keys(np.asarray(uniques, dtype=object), _KINDS[kind])
+        labels = np.append(self._tables[kind].lookup(keys, ok), None)
+        return labels[codes]
+
+    def label_selectors(self, col: pd.Series | np.ndarray) -> np.ndarray:
+        """Colonne de sélecteurs ('0x' + 8 hex) → signatures (ndarray object, None si inconnu / invalide)."""
+        return self._label('selector', col)
+
+    def label_topics(self, col: pd.Series | np.ndarray) -> np.ndarray:
+        """Colonne de topic0 ('0x' + 64 hex) → signatures (ndarray object, None si inconnu / invalide)."""
+        return self._label('topic', col)
+
+
+def _row_entry(row: Mapping[str, Any]) -> Tuple[str | None, str | None, str | None]:
+    row = {str(k).lower(): v for k, v in row.items()}
+    h = next((row[c] for c in _HASH_COLUMNS if row.get(c)), None)
+    text = next((row[c] for c in _TEXT_COLUMNS if row.get(c)), None)
+    kind = next((row[c] for c in _TYPE_COLUMNS if row.get(c)), None)
+    return h, text, kind
+
+
+def _json_rows(obj: Any) -> list:
+    if isinstance(obj, dict) and isinstance(obj.get('abi'), list):
+        obj = obj['abi']
+    if isinstance(obj, dict):
+        return [(h, text, None) for h, text in obj.items()]
+    rows = []
+    for item in obj:
+        if isinstance(item, str):
+            rows.append((None, item, None))
+        elif isinstance(item, dict) and item.get('type') in ('function', 'event') and 'name' in item:
+            rows.append((None, abi_signature(item), item['type']))
+        elif isinstance(item, dict):
+            rows.append(_row_entry(item))
+    return rows
+
+
+def _resolve(rows: Iterable[Tuple[str | None, str | None, str | None]]) -> Iterator[Tuple[str, str]]:
+    """(hash éventuel, signature, type éventuel) → (hash, signature); hash calculé si absent."""
+    for h, text, kind in rows:
+        if not text:
+            continue
+        if h:
+            yield h.strip().lower(), text
+        else:
+            kind = (kind or 'function').lower()
+            yield keccak_hex(text)[:66 if kind == 'event' else 10], text
@@ -0,0 +1,144 @@
+"""
+Module: sketches.py
+
+But: résumés de flux en mémoire bornée pour les top-K approchés (mode=approx de l'API)
+- HeavyHitters: compteurs lourds de Misra-Gries (équivalent Space-Saving), au plus `capacity` clés suivies,
+  bornes d'erreur déterministes, étendus lot par lot (append successifs de l'indexer)
+- HyperLogLog optionnel par clé suivie: éléments distincts associés (ex. contreparties distinctes par token)
+- Mise à jour par lots de CHUNK_ROWS lignes: la table de hachage transitoire est bornée par la taille du lot,
+  jamais par le nombre de clés distinctes du flux
+
+Dépendances: numpy
+"""
+
+from __future__ import annotations
+from typing import Sequence, Tuple
+
+import numpy as np
+
+CHUNK_ROWS = 1 << 16
+HLL_PRECISION = 10  # 1024 registres: erreur relative type ≈ 3.3 %
+
+_U64 = np.uint64
+
+
+def hash64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 vectoriel (entiers → uint64 bien mélangés)."""
+    z = x.astype(np.uint64) + _U64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> _U64(30))) * _U64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> _U64(27))) * _U64(0x94D049BB133111EB)
+    return z ^ (z >> _U64(31))
+
+
+def _hll_cells(items: np.ndarray, precision: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(registre, rang du premier bit à 1) de chaque élément; rang calculé sur les 32 bits suivant l'index."""
+    h = hash64(items)
+    idx = (h >> _U64(64 - precision)).astype(np.intp)
+    rest = ((h >> _U64(32 - precision)) & _U64(0xFFFFFFFF)).astype(np.float64)
+    rho = np.where(rest > 0, 32 - np.floor(np.log2(np.maximum(rest, 1))), 33).astype(np.uint8)
+    return idx, rho
+
+
+def hll_estimate(registers: np.ndarray) -> np.ndarray:
+    """Estimation HyperLogLog par ligne de registres (correction petits effectifs par comptage linéaire)."""
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.exp2(-registers.astype(np.float64)).sum(axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+def _merge_counts(keys_a: np.ndarray, counts_a: np.ndarray, keys_b: np.ndarray, counts_b: np.ndarray,
+                  capacity: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """Somme de deux résumés (clés uniques), réduite à `capacity` clés: le (capacity+1)-ième effectif est retiré
+    à tous et les effectifs ≤ 0 éliminés (fusion de Misra-Gries). Retourne (clés triées, effectifs, retrait)."""
+    keys, inv = np.unique(np.concatenate([keys_a, keys_b]), return_inverse=True)
+    counts = np.zeros(len(keys), dtype=np.int64)
+    counts[inv[:len(keys_a)]] += counts_a
+    counts[inv[len(keys_a):]] += counts_b
+    if len(keys) <= capacity:
+        return keys, counts, 0
+    cut = len(counts) - capacity - 1
+    thr = int(np.partition(counts, cut)[cut])
+    counts -= thr
+    keep = counts > 0
+    return keys[keep], counts[keep], thr
+
+
+class HeavyHitters:
+    """Clés les plus fréquentes d'un flux d'entiers int64, en mémoire bornée par `capacity`.
+
+    Garanties (N = total des clés vues): effectif(clé) ≤ vrai effectif ≤ effectif(clé) + error, avec
+    error ≤ N / (capacity + 1); toute clé de vrai effectif > error est suivie. Clé non suivie: effectif 0.
+    precision: un HyperLogLog par clé suivie (2**precision registres uint8) pour les éléments distincts associés;
+    une clé évincée puis réadmise repart de registres vides (sous-estimation).
+    Instances non modifiées en place: extend() retourne un nouveau résumé.
+    """
+
+    def __init__(self, capacity: int = 4096, precision: int | None = None):
+        if capacity < 1:
+            raise ValueError("capacity doit être >= 1")
+        self.capacity = int(capacity)
+        self.precision = precision
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.registers = np.zeros((0, 1 << precision), dtype=np.uint8) if precision is not None else None
+        self.total = 0
+        self.error = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.counts.nbytes + (self.registers.nbytes if self.registers is not None else 0)
+
+    def _replace(self, keys: np.ndarray, counts: np.ndarray, registers: np.ndarray | None, total: int,
+                 error: int) -> 'HeavyHitters':
+        out = HeavyHitters(self.capacity, self.precision)
+        out.keys, out.counts, out.registers, out.total, out.error = keys, counts, registers, total, error
+        return out
+
+    def _carry(self, keys: np.ndarray, registers: np.ndarray, src_keys: np.ndarray, src: np.ndarray) -> None:
+        # registres des clés encore suivies (max: union des éléments vus)
+        if not len(src_keys) or not len(keys):
+            return
+        pos = np.minimum(np.searchsorted(keys, src_keys), len(keys) - 1)
+        found = keys[pos] == src_keys
+        registers[pos[found]] = np.maximum(registers[pos[found]], src[found])
+
+    def extend(self, keys: np.ndarray, items: Sequence[np.ndarray] = (), chunk_rows: int = CHUNK_ROWS) -> 'HeavyHitters':
+        """Résumé incluant `keys` (traitées par lots de chunk_rows); items: éléments alignés sur keys (HyperLogLog)."""
+        keys = np.asarray(keys, dtype=np.int64)
+        out = self
+        for lo in range(0, len(keys), chunk_rows):
+            sl = slice(lo, lo + chunk_rows)
+            out = out._extend_chunk(keys[sl], [np.asarray(it)[sl] for it in items])
+        return out
+
+    def _extend_chunk(self, keys: np.ndarray, items: list[np.ndarray]) -> 'HeavyHitters':
+        u, c = np.unique(keys, return_counts=True)
+        merged, counts, thr = _merge_counts(self.keys, self.counts, u, c.astype(np.int64), self.capacity)
+        registers = None
+        if self.registers is not None:
+            registers = np.zeros((len(merged), self.registers.shape[1]), dtype=np.uint8)
+            self._carry(merged, registers, self.keys, self.registers)
+            if len(merged) and items:
+                pos = np.minimum(np.searchsorted(merged, keys), len(merged) - 1)
+                tracked = merged[pos] == keys
+                for it in items:
+                    idx, rho = _hll_cells(it[tracked], self.precision)
+                    np.maximum.at(registers, (pos[tracked], idx), rho)
+        return self._replace(merged, counts, registers, self.total + len(keys), self.error + thr)
+
+    def distinct(self, keys: np.ndarray) -> np.ndarray:
+        """Éléments distincts estimés (HyperLogLog) pour chaque clé; 0 pour une clé non suivie."""
+        keys = np.asarray(keys, dtype=np.int64)
+        out = np.zeros(len(keys), dtype=np.float64)
+        if self.registers is None or not len(self.keys) or not len(keys):
+            return out
+        pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[pos] == keys
+        out[found] = hll_estimate(self.registers[pos[found]])
+        return out
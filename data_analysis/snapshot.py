@@ -0,0 +1,249 @@
+"""
+Module: snapshot.py
+
+But: snapshot local Parquet des frames typés (txs / blocks / events) pour un démarrage à froid rapide
+- Partitionné par plage de blocs: <dir>/<table>/blocks_<lo>_<hi>.parquet (lo inclus, hi exclu)
+- manifest.json: max_block couvert, taille de partition, lignes par table (comptées sur les partitions)
+- Écritures idempotentes (la plage de blocs réécrite remplace l'existant) et sérialisées par un verrou fichier
+- Lecture memory-mappée, projection de colonnes, élagage des partitions hors plage de blocs
+- Synchronisation: seul le delta ]max_block, last_indexed_block] est lu depuis PostgreSQL (load_frames_typed)
+- API avec REFRESH_INTERVAL: les deltas suivis en tâche de fond sont aussi écrits (write), le snapshot reste à jour
+- Lecture partition par partition (iter_partitions) pour le traitement hors mémoire (out_of_core.py)
+
+CLI (variables PG_* lues depuis .env, comme runner.py):
+    python snapshot.py build   --dir snapshot/ [--partition-blocks 100000] [--upto-block N]
+    python snapshot.py refresh --dir snapshot/
+    python snapshot.py info    --dir snapshot/
+
+Dépendances: pandas, pyarrow
+"""
+
+from __future__ import annotations
+import argparse
+from contextlib import contextmanager
+import json
+import os
+import re
+import shutil
+import time
+from typing import Iterable, Iterator, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+import hyper_evm_step1_events as H
+
+try:
+    import fcntl
+except ImportError:  # Windows: pas de verrou entre processus, écritures toujours idempotentes
+    fcntl = None
+
+MANIFEST = 'manifest.json'
+LOCK_FILE = '.lock'
+_PART_RE = re.compile(r'blocks_(\d+)_(\d+)\.parquet$')
+
+
+class SnapshotStore:
+    """Snapshot Parquet partitionné par plage de blocs (tables de TYPED_TABLES)."""
+
+    def __init__(self, root: str, partition_blocks: int = 100_000):
+        self.root = root
+        m = self.manifest
+        self.partition_blocks = int(m['partition_blocks']) if m else int(partition_blocks)
+
+    # --- Manifest ---
+
+    @property
+    def manifest(self) -> dict | None:
+        path = os.path.join(self.root, MANIFEST)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    @property
+    def max_block(self) -> int | None:
+        m = self.manifest
+        return m['max_block'] if m else None
+
+    def _write_manifest(self, max_block: int | None, rows: dict) -> None:
+        m = {'max_block': max_block, 'partition_blocks': self.partition_blocks, 'rows': rows,
+             'updated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+        tmp = os.path.join(self.root, MANIFEST + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(m, f, indent=2)
+        os.replace(tmp, os.path.join(self.root, MANIFEST))
+
+    # --- Partitions ---
+
+    def _partitions(self, table: str, after_block: int | None = None, upto_block: int | None = None) -> list[str]:
+        d = os.path.join(self.root, table)
+        if not os.path.isdir(d):
+            return []
+        parts = []
+        for name in os.listdir(d):
+            m = _PART_RE.match(name)
+            if not m:
+                continue
+            lo, hi = int(m.group(1)), int(m.group(2))
+            if (after_block is not None and hi <= after_block + 1) or (upto_block is not None and lo > upto_block):
+                continue
+            parts.append((lo, os.path.join(d, name)))
+        return [p for _, p in sorted(parts)]
+
+    def _rows(self, table: str) -> int:
+        return sum(pq.ParquetFile(path).metadata.num_rows for path in self._partitions(table))
+
+    @contextmanager
+    def _lock(self):
+        # un seul écrivain à la fois (API en REFRESH_INTERVAL, `snapshot.py refresh` concurrent), inter-processus
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_FILE), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _part_path(self, table: str, key: int) -> str:
+        lo = key * self.partition_blocks
+        return os.path.join(self.root, table, f'blocks_{lo}_{lo + self.partition_blocks}.parquet')
+
+    def _write_table(self, table: str, df: pd.DataFrame) -> None:
+        """Fusionne df dans les partitions concernées (réécriture atomique des seules partitions touchées).
+
+        Les lignes existantes de la plage de blocs [min, max] de df dans la partition sont remplacées: réécrire
+        un delta déjà présent (re-sync, refresh concurrent) ne duplique rien.
+        """
+        if df.empty:
+            return
+        block_col, columns, _ = H.TYPED_TABLES[table]
+        os.makedirs(os.path.join(self.root, table), exist_ok=True)
+        keys = df[block_col].to_numpy() // self.partition_blocks
+        for key, part in df.groupby(keys, sort=True):
+            path = self._part_path(table, int(key))
+            if os.path.exists(path):
+                old = pq.read_table(path).to_pandas()
+                old = old[~old[block_col].between(part[block_col].min(), part[block_col].max())]
+                part = pd.concat([old, part], ignore_index=True).sort_values(block_col, kind='stable')
+            for c, dt in columns.items():
+                if dt is not None and c in part.columns:
+                    part[c] = part[c].astype(dt)
+            tmp = path + '.tmp'
+            pq.write_table(pa.Table.from_pandas(part.reset_index(drop=True), preserve_index=False), tmp,
+                           compression='zstd')
+            os.replace(tmp, path)
+
+    # --- API ---
+
+    def write(self, txs: pd.DataFrame, blocks: pd.DataFrame, events: pd.DataFrame, max_block: int | None) -> None:
+        """Écrit des lignes (plages de blocs remplacées) puis avance le manifest; jamais en arrière."""
+        with self._lock():
+            self._write(txs, blocks, events, max_block)
+
+    def _write(self, txs: pd.DataFrame, blocks: pd.DataFrame, events: pd.DataFrame, max_block: int | None) -> None:
+        for table, df in (('transactions', txs), ('blocks', blocks), ('event_logs', events)):
+            self._write_table(table, df)
+        prev = self.max_block
+        if prev is not None and (max_block is None or max_block < prev):
+            max_block = prev
+        self._write_manifest(max_block, {t: self._rows(t) for t in H.TYPED_TABLES})
+
+    def read_table(self, table: str, columns: Iterable[str] | None = None,
+                   after_block: int | None = None, upto_block: int | None = None) -> pd.DataFrame:
+        block_col, typed_columns, _ = H.TYPED_TABLES[table]
+        cols = list(columns) if columns is not None else list(typed_columns)
+        files = self._partitions(table, after_block, upto_block)
+        if not files:
+            return pd.DataFrame({c: pd.Series(dtype=typed_columns.get(c) or object) for c in cols})
+        dataset = ds.dataset(files, format='parquet', filesystem=pafs.LocalFileSystem(use_mmap=True))
+        flt = None
+        if after_block is not None:
+            flt = ds.field(block_col) > after_block
+        if upto_block is not None:
+            cond = ds.field(block_col) <= upto_block
+            flt = cond if flt is None else flt & cond
+        return dataset.to_table(columns=cols, filter=flt).to_pandas()
+
+    def read(self, *, columns: dict[str, list[str]] | None = None, after_block: int | None = None,
+             upto_block: int | None = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        """(txs, blocks, events) bornés au max_block du manifest."""
+        upto = self.max_block
+        if upto_block is not None:
+            upto = upto_block if upto is None else min(upto, upto_block)
+        columns = columns or {}
+        return tuple(self.read_table(t, columns.get(t), after_block=after_block, upto_block=upto)
+                     for t in ('transactions', 'blocks', 'event_logs'))
+
+    def iter_partitions(self, *, columns: dict[str, list[str]] | None = None, after_block: int | None = None,
+                        upto_block: int | None = None) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+        """(txs, blocks, events) d'une partition à la fois (même plage de blocs), dans l'ordre des blocs."""
+        upto = self.max_block
+        if upto_block is not None:
+            upto = upto_block if upto is None else min(upto, upto_block)
+        los = sorted({int(_PART_RE.search(path).group(1)) for table in H.TYPED_TABLES
+                      for path in self._partitions(table, after_block, upto)})
+        for lo in los:
+            hi = lo + self.partition_blocks - 1
+            after = lo - 1 if after_block is None else max(after_block, lo - 1)
+            yield self.read(columns=columns, after_block=after, upto_block=hi if upto is None else min(upto, hi))
+
+    def clear(self) -> None:
+        if os.path.isdir(self.root):
+            with self._lock():
+                for table in H.TYPED_TABLES:
+                    shutil.rmtree(os.path.join(self.root, table), ignore_errors=True)
+                manifest = os.path.join(self.root, MANIFEST)
+                if os.path.exists(manifest):
+                    os.remove(manifest)
+
+    def sync_from_db(self, engine, *, upto_block: int | None = None, chunksize: int = 100_000) -> int:
+        """Construit (si absent) ou complète le snapshot jusqu'à upto_block; retourne le nombre de lignes ajoutées.
+
+        Sous le verrou: un second sync concurrent relit max_block après le premier et ne charge que la suite.
+        """
+        with self._lock():
+            after = self.max_block
+            if after is not None and upto_block is not None and upto_block <= after:
+                return 0
+            df_tx, data_blocks, data_event = H.load_frames_typed(engine, after_block=after, upto_block=upto_block,
+                                                                 chunksize=chunksize)
+            max_block = upto_block
+            if max_block is None:
+                max_block = int(data_blocks['number'].max()) if len(data_blocks) else after
+            self._write(df_tx, data_blocks, data_event, max_block)
+        return len(df_tx) + len(data_blocks) + len(data_event)
+
+
+def main(argv: list[str] | None = None) -> int:
+    p = argparse.ArgumentParser(description='Snapshot Parquet local des tables de l\'indexer')
+    p.add_argument('command', choices=['build', 'refresh', 'info'])
+    p.add_argument('--dir', default=os.getenv('SNAPSHOT_DIR', 'snapshot'))
+    p.add_argument('--partition-blocks', type=int, default=100_000)
+    p.add_argument('--upto-block', type=int, default=None)
+    p.add_argument('--chunksize', type=int, default=100_000)
+    a = p.parse_args(argv)
+    store = SnapshotStore(a.dir, partition_blocks=a.partition_blocks)
+    if a.command == 'info':
+        print(json.dumps(store.manifest, indent=2))
+        return 0
+    from dotenv import load_dotenv
+    load_dotenv()
+    engine = H.make_pg_engine_from_env()
+    if a.command == 'build':
+        store.clear()
+        store = SnapshotStore(a.dir, partition_blocks=a.partition_blocks)
+    upto = a.upto_block if a.upto_block is not None else H.fetch_last_indexed_block(engine)
+    t0 = time.perf_counter()
+    n = store.sync_from_db(engine, upto_block=upto, chunksize=a.chunksize)
+    print(f"{a.command}: +{n} lignes en {time.perf_counter() - t0:.1f}s, max_block={store.max_block}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,279 @@
+"""
+Module: sql_backend.py
+
+But: backend d'agrégation côté serveur (PostgreSQL) pour l'API, sans charger transactions / blocks / event_logs en RAM
+- Séries temporelles: rollup ROLLUP_FREQ calculé par GROUP BY (jointure blocks sur la PK, idx_*_block_number),
+  puis étendu à chaque avancée du high-water de l'indexer par le seul delta de blocs (buckets additifs)
+- Types d'events, top tokens, top flux: GROUP BY sur event_logs filtré par topic0 (idx_event_logs_topic0)
+- Filtres des top tokens / flux: plage de blocs, fenêtre temporelle (sous-requête sur idx_blocks_timestamp), token, adresse
+- Mêmes frames que le backend mémoire: rollup assemblé par le même code, ex aequo départagés par adresse
+  (ordre binaire, COLLATE "C" sous PostgreSQL); sommes float du gaz (%, base fee) par SUM SQL non compensée,
+  écart possible au dernier ulp sur les moyennes
+- Hypothèse: topic0 stockés en hex minuscule par l'indexer (comparaison directe, index utilisable)
+
+Dépendances: pandas, numpy, sqlalchemy (+ hyper_evm_step1_events.py, metrics.py)
+"""
+
+from __future__ import annotations
+import threading
+from typing import Any, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+import hyper_evm_step1_events as H
+from metrics import METRICS
+
+_BUCKET_SECONDS = int(pd.Timedelta(H.ROLLUP_FREQ).total_seconds())
+_TOPIC_PARAMS = {'t_transfer': H.SIG['TRANSFER'], 't_single': H.SIG['ERC1155_TRANSFER_SINGLE'],
+                 't_batch': H.SIG['ERC1155_TRANSFER_BATCH']}
+
+
+def _topic_address_sql(col: str) -> str:
+    """Équivalent SQL de topic_to_address sur un topic commençant par 0x: '0x' + 40 derniers chiffres (complétés à gauche)."""
+    return f"('0x' || SUBSTR('{'0' * 40}' || SUBSTR({col}, 3), LENGTH({col}) - 1, 40))"
+
+
+# transferts dont from et to sont des adresses (topic1/2 pour Transfer, topic2/3 pour ERC-1155), cf. build_token_flows_basic
+_TRANSFER_WHERE = (
+    "((topic0 = :t_transfer AND SUBSTR(topic1, 1, 2) = '0x' AND SUBSTR(topic2, 1, 2) = '0x')"
+    " OR (topic0 IN (:t_single, :t_batch) AND SUBSTR(topic2, 1, 2) = '0x' AND SUBSTR(topic3, 1, 2) = '0x'))"
+)
+_FLOW_FROM = f"CASE WHEN topic0 = :t_transfer THEN {_topic_address_sql('topic1')} ELSE {_topic_address_sql('topic2')} END"
+_FLOW_TO = f"CASE WHEN topic0 = :t_transfer THEN {_topic_address_sql('topic2')} ELSE {_topic_address_sql('topic3')} END"
+
+# gas_used / gas_limit borné à [0, 1] comme gas_timeseries_partials (x/0 → 1 si x > 0, indéfini si 0/0)
+_GAS_PCT = ("CASE WHEN gas_limit > 0 THEN CASE WHEN gas_used >= gas_limit THEN 1.0 WHEN gas_used <= 0 THEN 0.0"
+            " ELSE CAST(gas_used AS DOUBLE PRECISION) / gas_limit END WHEN gas_used > 0 THEN 1.0 END")
+
+
+def _block_range(col: str, after_block: int | None, upto_block: int | None) -> Tuple[str, dict]:
+    conds, params = [], {}
+    if after_block is not None:
+        conds.append(f"{col} > :after_block")
+        params['after_block'] = int(after_block)
+    if upto_block is not None:
+        conds.append(f"{col} <= :upto_block")
+        params['upto_block'] = int(upto_block)
+    return (' AND '.join(conds) or '1 = 1'), params
+
+
+def _flow_filters(start_block: int | None = None, end_block: int | None = None, start: pd.Timestamp | None = None,
+                  end: pd.Timestamp | None = None, token: str | None = None, address: str | None = None) -> Tuple[str, dict]:
+    """Mêmes filtres que EnrichedFrames.flow_rows (adresses comparées telles quelles ou en minuscules)."""
+    conds, params = [], {}
+    if start_block is not None:
+        conds.append("block_number >= :f_start_block")
+        params['f_start_block'] = int(start_block)
+    if end_block is not None:
+        conds.append("block_number <= :f_end_block")
+        params['f_end_block'] = int(end_block)
+    if start is not None or end is not None:
+        window = []
+        if start is not None:
+            window.append("timestamp >= :f_start")
+            params['f_start'] = int(np.ceil(pd.Timestamp(start).timestamp()))
+        if end is not None:
+            window.append("timestamp < :f_end")
+            params['f_end'] = int(np.ceil(pd.Timestamp(end).timestamp()))
+        conds.append(f"block_number IN (SELECT number FROM blocks WHERE {' AND '.join(window)})")
+    if token is not None:
+        conds.append("address IN (:f_token, :f_token_lc)")
+        params.update(f_token=token, f_token_lc=token.lower())
+    if address is not None:
+        conds.append(f"({_FLOW_FROM} IN (:f_address, :f_address_lc) OR {_FLOW_TO} IN (:f_address, :f_address_lc))")
+        params.update(f_address=address, f_address_lc=address.lower())
+    return (' AND '.join(conds) or '1 = 1'), params
+
+
+class SQLAggregates:
+    """Requêtes d'agrégation (une par endpoint), bornées à une plage de blocs ]after_block, upto_block]."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.collate = ' COLLATE "C"' if engine.dialect.name == 'postgresql' else ''
+
+    @METRICS.timed('sql_query')
+    def _read(self, sql: str, params: dict) -> pd.DataFrame:
+        with self.engine.connect() as conn:
+            return pd.read_sql(text(sql), conn, params=params)
+
+    def _bucket_times(self, buckets: pd.Series) -> pd.Series:
+        return H.to_datetime_utc(buckets.astype(np.int64)).rename('timestamp_dt')
+
+    def rollup(self, after_block: int | None = None, upto_block: int | None = None) -> pd.DataFrame:
+        """Même frame que build_timeseries_rollup sur les lignes de la plage (txs / events datés par leur bloc)."""
+        where_b, params = _block_range('b.number', after_block, upto_block)
+        where_t, _ = _block_range('t.block_number', after_block, upto_block)
+        where_e, _ = _block_range('e.block_number', after_block, upto_block)
+        bucket = f"(b.timestamp / {_BUCKET_SECONDS}) * {_BUCKET_SECONDS}"
+        tx = self._read(f"SELECT {bucket} AS bucket, COUNT(t.hash) AS tx_count FROM transactions t"
+                        f" JOIN blocks b ON b.number = t.block_number WHERE {where_t} GROUP BY 1", params)
+        gas = self._read(f"SELECT {bucket} AS bucket, COUNT(b.number) AS block_count, SUM(b.gas_used) AS gas_used_sum,"
+                         " SUM(b.pct) AS gas_used_pct_sum, COUNT(b.pct) AS gas_used_pct_n,"
+                         " SUM(b.base_fee_gwei) AS base_fee_gwei_sum, COUNT(b.base_fee_gwei) AS base_fee_gwei_n"
+                         f" FROM (SELECT number, timestamp, gas_used, {_GAS_PCT} AS pct,"
+                         " CAST(base_fee_per_gas AS DOUBLE PRECISION) / 1e9 AS base_fee_gwei"
+                         f" FROM blocks b WHERE {where_b}) b GROUP BY 1", params)
+        tr = self._read(f"SELECT {bucket} AS bucket, COUNT(*) AS transfer_event_count FROM event_logs e"
+                        f" JOIN blocks b ON b.number = e.block_number"
+                        f" WHERE e.topic0 IN (:t_transfer, :t_single, :t_batch) AND {where_e} GROUP BY 1",
+                        {**params, **_TOPIC_PARAMS})
+        parts = []
+        for df, dtypes in ((tx, {'tx_count': np.int64}),
+                           (gas, {'block_count': np.int64, 'gas_used_sum': np.int64, 'gas_used_pct_sum': np.float64,
+                                  'gas_used_pct_n': np.int64, 'base_fee_gwei_sum': np.float64, 'base_fee_gwei_n': np.int64}),
+                           (tr, {'transfer_event_count': np.int64})):
+            # SUM(bigint) → numeric (Decimal) sous PostgreSQL, NULL pour un bucket sans valeur
+            cols = {c: pd.to_numeric(df[c]).fillna(0).astype(dt) for c, dt in dtypes.items()}
+            part = pd.DataFrame(cols).set_axis(self._bucket_times(df['bucket']))
+            parts.append(part.sort_index().resample(H.ROLLUP_FREQ).sum())
+        return H.assemble_timeseries_rollup(parts)
+
+    def event_type_counts(self, after_block: int | None = None, upto_block: int | None = None) -> pd.Series:
+        """Comptes par event_type (tag_events_simple sur topic0 / présence de topic3), ordre de première occurrence."""
+        where, params = _block_range('block_number', after_block, upto_block)
+        g = self._read("SELECT topic0, CASE WHEN SUBSTR(topic3, 1, 2) = '0x' THEN 1 ELSE 0 END AS has_topic3,"
+                       f" COUNT(*) AS n, MIN(id) AS first_id FROM event_logs WHERE {where} GROUP BY 1, 2", params)
+        tagged = H.tag_events_simple(pd.DataFrame({
+            'topic0': g['topic0'].to_numpy(dtype=object),
+            'topic3': np.where(g['has_topic3'].to_numpy(dtype=np.int64) == 1, '0x', None),
+        }))
+        g['event_type'] = tagged['event_type'].to_numpy(dtype=object)
+        agg = g.groupby('event_type', sort=False).agg(n=('n', 'sum'), first_id=('first_id', 'min'))
+        agg = agg.sort_values('first_id', kind='stable').sort_values('n', ascending=False, kind='stable')
+        return pd.Series(agg['n'].to_numpy(dtype=np.int64), index=pd.Index(agg.index.to_numpy(dtype=object), name='event_type'),
+                         name='count')
+
+    def table_counts(self, after_block: int | None = None, upto_block: int | None = None) -> dict:
+        counts = {}
+        for key, table, col in (('events_rows', 'event_logs', 'block_number'), ('tx_rows', 'transactions', 'block_number'),
+                                ('blocks_rows', 'blocks', 'number')):
+            where, params = _block_range(col, after_block, upto_block)
+            with self.engine.connect() as conn:
+                counts[key] = int(conn.execute(text(f"SELECT COUNT(*) FROM {table} WHERE {where}"), params).scalar())
+        return counts
+
+    def columns(self) -> dict:
+        cols = {}
+        for key, table in (('events', 'event_logs'), ('txs', 'transactions'), ('blocks', 'blocks')):
+            with self.engine.connect() as conn:
+                cols[key] = list(conn.execute(text(f"SELECT * FROM {table} WHERE 1 = 0")).keys())
+        return cols
+
+    def top_tokens(self, k: int, upto_block: int | None = None, **filters: Any) -> pd.DataFrame:
+        """Même frame que _top_tokens_from_counts (tokens par nombre de transferts, ex aequo par adresse)."""
+        where, params = _block_range('block_number', None, upto_block)
+        fwhere, fparams = _flow_filters(**filters)
+        top = self._read(f"SELECT address AS token_address, COUNT(*) AS events FROM event_logs"
+                         f" WHERE {_TRANSFER_WHERE} AND {where} AND {fwhere} GROUP BY address"
+                         f" ORDER BY events DESC, address{self.collate} LIMIT :k",
+                         {**params, **fparams, **_TOPIC_PARAMS, 'k': max(int(k), 0)})
+        top = pd.DataFrame({'token_address': top['token_address'].to_numpy(dtype=object),
+                            'events': top['events'].to_numpy(dtype=np.int64)})
+        top['token_short'] = top['token_address'].map(H.short_hex)
+        return top
+
+    def top_flow_pairs(self, top: int, upto_block: int | None = None, **filters: Any) -> pd.DataFrame:
+        """Même frame que _top_flow_pairs (paires from → to par nombre de transferts, ex aequo par from puis to)."""
+        where, params = _block_range('block_number', None, upto_block)
+        fwhere, fparams = _flow_filters(**filters)
+        pairs = self._read(f"SELECT f_from, f_to, COUNT(*) AS n FROM (SELECT {_FLOW_FROM} AS f_from, {_FLOW_TO} AS f_to"
+                           f" FROM event_logs WHERE {_TRANSFER_WHERE} AND {where} AND {fwhere}) f GROUP BY f_from, f_to"
+                           f" ORDER BY n DESC, f_from{self.collate}, f_to{self.collate} LIMIT :top",
+                           {**params, **fparams, **_TOPIC_PARAMS, 'top': max(int(top), 0)})
+        return pd.DataFrame({'from': pairs['f_from'].to_numpy(dtype=object), 'to': pairs['f_to'].to_numpy(dtype=object),
+                             'count': pairs['n'].to_numpy(dtype=np.int64)})
+
+
+def _merge_event_type_counts(a: pd.Series, b: pd.Series) -> pd.Series:
+    """Somme de deux comptes par event_type; types déjà vus gardent leur rang de première occurrence."""
+    if b.empty:
+        return a
+    m = a.add(b.reindex(a.index.union(b.index, sort=False)), fill_value=0)
+    m = m.reindex(a.index.append(b.index.difference(a.index, sort=False))).astype(np.int64)
+    return m.sort_values(ascending=False, kind='stable').rename('count')
+
+
+class SQLFrames:
+    """Store de l'API adossé à PostgreSQL (même interface que EnrichedFrames pour les endpoints d'agrégats).
+
+    Petits agrégats additifs (rollup, types d'events, effectifs des tables) gardés en mémoire et étendus par
+    `refresh()`; top tokens / top flux recalculés en base à la demande (mis en cache avec la version).
+    Toutes les requêtes sont bornées au high-water de l'indexer, qui fixe `version`.
+    """
+
+    def __init__(self, engine, *, cache_size: int = 128, high_water_block: int | None = None):
+        self.engine = engine
+        self.sql = SQLAggregates(engine)
+        self.high_water_block = high_water_block if high_water_block is not None else H.fetch_last_indexed_block(engine)
+        self.version = 0
+        self.responses = H.LRUCache(cache_size)
+        self._lock = threading.RLock()
+        self._derived: dict[Any, Any] = {}
+
+    def _get(self, name: Any, fn):
+        v = self._derived.get(name)
+        if v is None:
+            with self._lock:
+                v = self._derived.get(name)
+                if v is None:
+                    v = self._derived[name] = fn()
+        return v
+
+    @property
+    def rollup(self) -> pd.DataFrame:
+        return self._get('rollup', lambda: self.sql.rollup(upto_block=self.high_water_block))
+
+    @property
+    def event_type_counts(self) -> pd.Series:
+        return self._get('event_type_counts', lambda: self.sql.event_type_counts(upto_block=self.high_water_block))
+
+    def timeseries_partials(self, kind: str, freq: str) -> pd.DataFrame:
+        return self._get(('ts', kind, freq), lambda: H.rollup_timeseries(self.rollup, kind, freq))
+
+    def top_tokens(self, k: int, **filters: Any) -> pd.DataFrame:
+        return self.sql.top_tokens(k, upto_block=self.high_water_block, **filters)
+
+    def top_flow_pairs(self, top: int, **filters: Any) -> pd.DataFrame:
+        return self.sql.top_flow_pairs(top, upto_block=self.high_water_block, **filters)
+
+    def info(self) -> dict:
+        counts = self._get('table_counts', lambda: self.sql.table_counts(upto_block=self.high_water_block))
+        return {**counts, 'high_water_block': self.high_water_block, 'cols': self._get('columns', self.sql.columns)}
+
+    def precompute(self) -> None:
+        self.rollup, self.event_type_counts
+
+    def refresh(self) -> int:
+        """Intègre les blocs ]high-water, last_indexed_block]; retourne le nombre de nouveaux blocs."""
+        last_indexed = H.fetch_last_indexed_block(self.engine)
+        seen = self.high_water_block
+        if last_indexed is None or (seen is not None and last_indexed <= seen):
+            return 0
+        with self._lock:
+            derived = {k: v for k, v in self._derived.items() if not (isinstance(k, tuple) and k[0] == 'ts')}
+            if 'rollup' in derived:
+                derived['rollup'] = H.merge_timeseries_partials(
+                    derived['rollup'], self.sql.rollup(after_block=seen, upto_block=last_indexed), H.ROLLUP_FREQ)
+            if 'event_type_counts' in derived:
+                derived['event_type_counts'] = _merge_event_type_counts(
+                    derived['event_type_counts'], self.sql.event_type_counts(after_block=seen, upto_block=last_indexed))
+            if 'table_counts' in derived:
+                delta = self.sql.table_counts(after_block=seen, upto_block=last_indexed)
+                derived['table_counts'] = {k: v + delta[k] for k, v in derived['table_counts'].items()}
+            self._derived = derived
+            self.high_water_block = last_indexed
+            self.version += 1
+        return last_indexed - (seen if seen is not None else -1)
+
+
+class SQLTailFollower(H.DBTailFollower):
+    """DBTailFollower pour SQLFrames: chaque cycle étend les agrégats en base au lieu de charger des lignes."""
+
+    def __init__(self, store: SQLFrames, *, interval: float = 10.0):
+        super().__init__(store.engine, store, interval=interval)
+
+    def poll_once(self) -> int:
+        return self.store.refresh()
@@ -0,0 +1,119 @@
+"""
+Fixtures partagées des tests de data_analysis.
+
+Les modules s'importent à plat (`import hyper_evm_step1_events as H`, comme runner.py): le dossier parent est
+ajouté au sys.path. Jeu `edge_*`: logs écrits à la main couvrant les cas limites de l'implémentation d'origine
+(data '0x', non hex, décimale, > 256 bits, topics manquants, ERC-1155 single/batch); jeu `synthetic`: données
+générées au schéma de l'indexer (bench_suite.make_frames), aussi servies par une base SQLite (`indexer_engine`).
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TRANSFER = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+APPROVAL_FOR_ALL = "0x17307eab39ab6107e8899845ad3d59bd9653f200f220920489ca2b5937696c31"
+TRANSFER_SINGLE = "0xc3d58168c5ae7397731d063d5bbf3d657854427343f4c083240f7aacaa2d0f62"
+TRANSFER_BATCH = "0x4a39dc06d4c0dbc64b70af90fd698a233a518aa5d07e595d983b8c0526c8f7fb"
+
+TOKEN_A = '0x' + 'a1' * 20
+TOKEN_B = '0x' + 'b2' * 20
+USERS = ['0x' + ('%02x' % (16 + i)) * 20 for i in range(4)]
+
+
+def topic(addr: str) -> str:
+    return '0x' + '0' * 24 + addr[2:]
+
+
+def words(*values: int) -> str:
+    return '0x' + ''.join('%064x' % v for v in values)
+
+
+def _log(i, block, token, topic0, topic1=None, topic2=None, topic3=None, data='0x') -> dict:
+    return dict(transaction_hash='0x%064x' % (i // 2), block_number=block, log_index=i, address=token,
+                topic0=topic0, topic1=topic1, topic2=topic2, topic3=topic3, data=data)
+
+
+U0, U1, U2, U3 = USERS
+EDGE_LOGS = [
+    _log(0, 100, TOKEN_A, TRANSFER, topic(U0), topic(U1), data=words(10 ** 18)),
+    _log(1, 100, TOKEN_A, TRANSFER, topic(U1), topic(U2), data='0x'),                    # payload vide
+    _log(2, 100, TOKEN_A, TRANSFER, topic(U1), topic(U2), data='123'),                   # décimal sans 0x
+    _log(3, 101, TOKEN_A, TRANSFER, topic(U2), topic(U0), data='0x5'),                   # hex court
+    _log(4, 101, TOKEN_A, TRANSFER, topic(U0), topic(U3), data='0x' + '1' * 66),         # > 256 bits
+    _log(5, 101, TOKEN_A, TRANSFER, topic(U0), topic(U3), data='0xzz'),                  # non hex
+    _log(6, 101, TOKEN_A, TRANSFER, topic(U3), topic(U1), data=None),
+    _log(7, 102, TOKEN_B, TRANSFER, topic(U0), topic(U1), topic('0x' + '0' * 38 + '2a')),  # ERC-721
+    _log(8, 102, TOKEN_B, TRANSFER.upper().replace('0X', '0x'), topic(U1), topic(U0), data=words(7)),
+    _log(9, 102, TOKEN_A, TRANSFER, None, topic(U2), data=words(1)),                     # topic1 manquant
+    _log(10, 102, TOKEN_A, TRANSFER, topic(U2), None, data=words(1)),                    # topic2 manquant
+    _log(11, 103, TOKEN_B, TRANSFER_SINGLE, topic(U3), topic(U0), topic(U2), data=words(5, 250)),
+    _log(12, 103, TOKEN_B, TRANSFER_SINGLE, topic(U3), topic(U2), topic(U0), data='0x'),
+    _log(13, 103, TOKEN_B, TRANSFER_BATCH, topic(U3), topic(U1), topic(U3), data=words(0x40, 0xa0, 2, 1, 2, 2, 30, 40)),
+    _log(14, 104, TOKEN_A, APPROVAL_FOR_ALL, topic(U0), topic(U1), data=words(1)),
+    _log(15, 104, TOKEN_A, '0xdeadbeef'),
+    _log(16, 104, TOKEN_A, None),
+]
+
+
+@pytest.fixture
+def edge_logs() -> pd.DataFrame:
+    return pd.DataFrame(EDGE_LOGS)
+
+
+@pytest.fixture
+def edge_blocks() -> pd.DataFrame:
+    # 100-101 dans la même heure, 102 et 103 dans les suivantes, 104 le lendemain
+    return pd.DataFrame({
+        'number': [100, 101, 102, 103, 104],
+        'hash': ['0x%064x' % i for i in range(5)],
+        'timestamp': [1700000000, 1700001000, 1700003700, 1700007300, 1700090000],
+        'gas_limit': [30_000_000] * 5,
+        'gas_used': [15_000_000, 0, 30_000_000, 7_500_000, 1_000_000],
+        'base_fee_per_gas': [10 ** 9, 2 * 10 ** 9, 5 * 10 ** 8, 3 * 10 ** 9, 10 ** 9],
+    })
+
+
+@pytest.fixture
+def edge_txs() -> pd.DataFrame:
+    return pd.DataFrame({
+        'hash': ['0x%064x' % i for i in range(9)],
+        'block_number': [100, 100, 101, 101, 102, 103, 103, 104, 104],
+        'input_data': ['0xa9059cbb' + '0' * 128, '0x', '0x23B872DD' + '0' * 192, '0x12345678', None, '', '0x0',
+                       '0xa905', '0x095ea7b3'],
+    })
+
+
+@pytest.fixture(scope='session')
+def synthetic():
+    """(events, txs, blocks) synthétiques, ~20k logs (mélange réaliste de topic0, tokens / comptes Zipf)."""
+    from bench_suite import make_frames
+    return make_frames(20_000, seed=7)
+
+
+@pytest.fixture(scope='session')
+def indexer_frames(synthetic):
+    """Jeu synthétique complété des colonnes lues par le loader typé (transaction_index, status en partie NULL)."""
+    events, txs, blocks = synthetic
+    rng = np.random.default_rng(3)
+    status = pd.Series(rng.integers(0, 2, len(txs)), dtype='Int64')
+    status[rng.random(len(txs)) < 0.05] = pd.NA
+    return events, txs.assign(transaction_index=txs.groupby('block_number').cumcount(), status=status), blocks
+
+
+@pytest.fixture(scope='session')
+def indexer_engine(indexer_frames, tmp_path_factory):
+    """Base SQLite aux tables de l'indexer (blocks / transactions / event_logs) remplie avec indexer_frames."""
+    from sqlalchemy import create_engine
+    engine = create_engine('sqlite:///' + str(tmp_path_factory.mktemp('indexer') / 'hyper.db'))
+    events, txs, blocks = indexer_frames
+    blocks.to_sql('blocks', engine, index=False)
+    txs.to_sql('transactions', engine, index=False)
+    events.to_sql('event_logs', engine, index=False)
+    yield engine
+    engine.dispose()
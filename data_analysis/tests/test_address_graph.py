@@ -0,0 +1,310 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import hyper_evm_step1_events as H
+from address_graph import AddressGraph
+from conftest import TOKEN_A, TOKEN_B, U0, U1, U2, U3
+
+
+def _ref_flows(frames):
+    """Flux en mode objet (adresses en chaînes, montants en entiers Python), extrémités manquantes exclues."""
+    flows = H.build_token_flows_with_amounts(frames.tagged).dropna(subset=['from', 'to'])
+    return flows.assign(block_number=flows['block_number'].astype(np.int64))
+
+
+def _ref_counterparties(flows, addr, direction, *, by_token=True, start_block=None, end_block=None, token=None):
+    """Force brute: [(contrepartie, token, nb, somme)] triés comme AddressGraph.counterparties avec les rangs."""
+    me, other = ('from', 'to') if direction == 'out' else ('to', 'from')
+    groups = defaultdict(lambda: [0, 0])
+    for r in flows.to_dict('records'):
+        b = r['block_number']
+        if r[me] != addr or (start_block is not None and b < start_block) or (end_block is not None and b > end_block):
+            continue
+        if token is not None and r['token_address'] != token:
+            continue
+        g = groups[(r[other] if by_token else None, r['token_address'])]
+        g[0] += 1
+        g[1] += r['amount_raw'] or 0
+    rows = [(cp, tk, n, s) for (cp, tk), (n, s) in groups.items()]
+    return sorted(rows, key=lambda x: (-x[2], -x[3], x[0] or '', x[1]))
+
+
+def _ref_reachable(flows, addr, max_hops, direction, start_block=None, end_block=None):
+    """BFS par niveaux en Python: {adresse: (sauts, prédécesseur)}, prédécesseur = plus petite adresse du niveau."""
+    me, other = ('from', 'to') if direction == 'out' else ('to', 'from')
+    keep = flows['block_number'].between(-1 if start_block is None else start_block,
+                                         np.iinfo(np.int64).max if end_block is None else end_block)
+    nbrs = defaultdict(set)
+    for a, b in zip(flows.loc[keep, me], flows.loc[keep, other]):
+        nbrs[a].add(b)
+    out, frontier = {addr: (0, None)}, [addr]
+    for h in range(1, max_hops + 1):
+        level = {}
+        for a in sorted(frontier):
+            for b in nbrs[a]:
+                if b not in out and b not in level:
+                    level[b] = (h, a)
+        out.update(level)
+        frontier = list(level)
+    return out
+
+
+@pytest.fixture(scope='module')
+def frames(synthetic):
+    return H.EnrichedFrames(*synthetic)
+
+
+@pytest.fixture(scope='module')
+def flows(frames):
+    return _ref_flows(frames)
+
+
+@pytest.fixture(scope='module')
+def hubs(flows):
+    """Adresses les plus actives (émission et réception)."""
+    return pd.concat([flows['from'], flows['to']]).value_counts().index[:3].tolist()
+
+
+def _decode(frames, ids):
+    return [None if i < 0 else a for i, a in zip(ids.tolist(), frames.addresses.decode(ids))]
+
+
+@pytest.mark.parametrize('direction', ['out', 'in'])
+@pytest.mark.parametrize('by_token', [True, False])
+@pytest.mark.parametrize('window', [(None, None), ('q30', 'q70')])
+def test_counterparties_match_groupby(frames, flows, hubs, direction, by_token, window):
+    start, end = (None if w is None else int(flows['block_number'].quantile(int(w[1:]) / 100)) for w in window)
+    g, ranks = frames.graph, frames.addresses.ranks()
+    for addr in hubs:
+        node = frames.addresses.lookup(addr)
+        cp, tk, counts, sums = g.counterparties(node, direction, start_block=start, end_block=end, by_token=by_token,
+                                                ranks=ranks)
+        got = list(zip(_decode(frames, cp), _decode(frames, tk), counts.tolist(), sums.to_ints().tolist()))
+        ref = _ref_counterparties(flows, addr, direction, by_token=by_token, start_block=start, end_block=end)
+        assert got == ref
+        top = g.counterparties(node, direction, start_block=start, end_block=end, by_token=by_token, top=5, ranks=ranks)
+        assert list(zip(_decode(frames, top[0]), _decode(frames, top[1]), top[2].tolist(),
+                        top[3].to_ints().tolist())) == ref[:5]
+
+
+def test_counterparties_token_filter(frames, flows, hubs):
+    addr = hubs[0]
+    token = flows.loc[flows['from'] == addr, 'token_address'].value_counts().index[0]
+    cp, tk, counts, sums = frames.graph.counterparties(frames.addresses.lookup(addr), 'out',
+                                                       token=frames.addresses.lookup(token),
+                                                       ranks=frames.addresses.ranks())
+    assert set(_decode(frames, tk)) == {token}
+    assert list(zip(_decode(frames, cp), counts.tolist(), sums.to_ints().tolist())) == [
+        (c, n, s) for c, _, n, s in _ref_counterparties(flows, addr, 'out', token=token)]
+
+
+@pytest.mark.parametrize('direction', ['out', 'in'])
+@pytest.mark.parametrize('max_hops, window', [(1, None), (2, None), (3, None), (2, ('q20', 'q60'))])
+def test_reachable_matches_bfs(frames, flows, hubs, direction, max_hops, window):
+    start, end = (None, None) if window is None else (
+        int(flows['block_number'].quantile(int(w[1:]) / 100)) for w in window)
+    for addr in hubs:
+        ids, hops, parents, truncated = frames.graph.reachable(frames.addresses.lookup(addr), max_hops, direction,
+                                                               start_block=start, end_block=end,
+                                                               ranks=frames.addresses.ranks())
+        ref = _ref_reachable(flows, addr, max_hops, direction, start, end)
+        got = dict(zip(_decode(frames, ids), zip(hops.tolist(), _decode(frames, parents))))
+        assert got == ref and not truncated
+        # niveaux contigus, chacun dans l'ordre lexicographique des adresses
+        assert hops.tolist() == sorted(hops.tolist())
+        addrs = _decode(frames, ids)
+        for h in set(hops.tolist()):
+            level = [a for a, k in zip(addrs, hops.tolist()) if k == h]
+            assert level == sorted(level)
+
+
+def test_reachable_target_and_path(frames, flows, hubs):
+    g, ranks = frames.graph, frames.addresses.ranks()
+    node = frames.addresses.lookup(hubs[0])
+    ref = _ref_reachable(flows, hubs[0], 3, 'out')
+    far = max(ref, key=lambda a: (ref[a][0], a))
+    target = frames.addresses.lookup(far)
+    ids, hops, parents, _ = g.reachable(node, 3, 'out', target=target, ranks=ranks)
+    assert hops.max() == ref[far][0]  # arrêt au niveau de la cible
+    path = AddressGraph.path_to(target, ids, parents)
+    decoded = _decode(frames, np.array(path))
+    assert decoded[0] == hubs[0] and decoded[-1] == far and len(path) == ref[far][0] + 1
+    assert all(ref[b][1] == a for a, b in zip(decoded, decoded[1:]))
+    assert AddressGraph.path_to(frames.addresses.lookup(hubs[0]) + 10 ** 6, ids, parents) == []
+
+
+def test_reachable_edge_budget(frames, flows, hubs):
+    g, ranks = frames.graph, frames.addresses.ranks()
+    node = frames.addresses.lookup(hubs[0])
+    full = _ref_reachable(flows, hubs[0], 2, 'out')
+    degree = int((flows['from'] == hubs[0]).sum())
+    ids, hops, parents, truncated = g.reachable(node, 2, 'out', max_edges=degree, ranks=ranks)
+    # budget = arêtes du premier niveau: niveau 1 complet, niveau 2 vide et marqué tronqué
+    assert truncated and set(hops.tolist()) == {0, 1}
+    assert dict(zip(_decode(frames, ids), zip(hops.tolist(), _decode(frames, parents)))) == {
+        a: v for a, v in full.items() if v[0] <= 1}
+    ids, hops, _, truncated = g.reachable(node, 2, 'out', max_edges=degree // 2, ranks=ranks)
+    assert truncated and set(_decode(frames, ids[hops == 1])) < {a for a, v in full.items() if v[0] == 1}
+    assert not g.reachable(node, 2, 'out', max_edges=len(g), ranks=ranks)[3]
+
+
+def _split_arrays(frames, at):
+    src, dst, token, block, amount = H._graph_arrays(frames.flows_amounts)
+    head, tail = block < at, block >= at
+    return ([a[head] for a in (src, dst, token, block)] + [amount[head]],
+            [a[tail] for a in (src, dst, token, block)] + [amount[tail]])
+
+
+def _edges(g, decode=None):
+    """Arêtes (src, dst, token, bloc, montant) triées, ids décodés si `decode`; vérifie au passage l'ordre CSR."""
+    assert (np.diff(g.src) >= 0).all() and (np.diff(g.dst[g.in_perm]) >= 0).all()
+    for keys, indptr in ((g.src, g.out_indptr), (g.dst[g.in_perm], g.in_indptr)):
+        np.testing.assert_array_equal(indptr, np.searchsorted(keys, np.arange(g.n_nodes + 1)))
+    for node in range(g.n_nodes):
+        for d in ('out', 'in'):
+            assert (np.diff(g.block[g.rows(node, d)]) >= 0).all()
+    cols = [g.src, g.dst, g.token]
+    cols = [decode(c) for c in cols] if decode is not None else [c.tolist() for c in cols]
+    return sorted(zip(*cols, g.block.tolist(), g.amount.to_ints().tolist()))
+
+
+def _assert_same_graph(a, b):
+    ba, bb = a.buffers(), b.buffers()
+    assert ba.keys() == bb.keys()
+    for k in ba:
+        np.testing.assert_array_equal(ba[k], bb[k], err_msg=k)
+
+
+def test_extend_equals_full_build(frames, flows):
+    at = int(flows['block_number'].quantile(.6))
+    head, tail = _split_arrays(frames, at)
+    n = len(frames.addresses)
+    _assert_same_graph(AddressGraph.from_arrays(*head).extend(*tail, n_nodes=n), frames.graph)
+    # lot antérieur aux blocs chargés: tri complet (ex aequo de bloc dans un autre ordre), mêmes arêtes
+    late = AddressGraph.from_arrays(*tail).extend(*head, n_nodes=n)
+    assert late.n_nodes == n and _edges(late) == _edges(frames.graph)
+    g = frames.graph
+    assert g.extend(*(a[:0] for a in tail[:4]), tail[4][:0]) is g
+
+
+def test_append_extends_graph_like_full_build(synthetic, frames, flows, hubs):
+    events, txs, blocks = synthetic
+    at = int(blocks['number'].quantile(.6))
+    store = H.EnrichedFrames(events[events['block_number'] < at], txs[txs['block_number'] < at],
+                             blocks[blocks['number'] < at])
+    store.graph
+    store.append(events[events['block_number'] >= at], txs[txs['block_number'] >= at], blocks[blocks['number'] >= at])
+    assert 'graph' in store._derived
+    # ids internés dans un autre ordre: comparaison sur les adresses
+    assert _edges(store.graph, store.addresses.decode) == _edges(frames.graph, frames.addresses.decode)
+    ranks = store.addresses.ranks()
+    for addr in hubs:
+        for d in ('out', 'in'):
+            cp, tk, counts, sums = store.graph.counterparties(store.addresses.lookup(addr), d, ranks=ranks)
+            assert list(zip(_decode(store, cp), _decode(store, tk), counts.tolist(), sums.to_ints().tolist())) == \
+                _ref_counterparties(flows, addr, d)
+
+
+def test_buffers_roundtrip(frames, hubs):
+    g, ranks = frames.graph, frames.addresses.ranks()
+    copy = AddressGraph.from_buffers({k: np.array(v) for k, v in g.buffers().items()})
+    _assert_same_graph(copy, g)
+    assert copy.n_nodes == g.n_nodes and len(copy) == len(g) and copy.nbytes == g.nbytes
+    views = AddressGraph.from_buffers(g.buffers())
+    assert views.src is g.src  # vues, sans copie
+    node = frames.addresses.lookup(hubs[1])
+    for d in ('out', 'in'):
+        a, b = g.counterparties(node, d, top=10, ranks=ranks), copy.counterparties(node, d, top=10, ranks=ranks)
+        for x, y in zip(a[:3], b[:3]):
+            np.testing.assert_array_equal(x, y)
+        assert a[3].to_ints().tolist() == b[3].to_ints().tolist()
+        for x, y in zip(g.reachable(node, 3, d, ranks=ranks), copy.reachable(node, 3, d, ranks=ranks)):
+            np.testing.assert_array_equal(x, y)
+
+
+# --- Endpoints /address/* sur le jeu edge_* ---
+
+@pytest.fixture
+def edge_flows(edge_logs, edge_txs, edge_blocks):
+    return _ref_flows(H.EnrichedFrames(edge_logs, edge_txs, edge_blocks))
+
+
+@pytest.fixture
+def client(edge_logs, edge_txs, edge_blocks):
+    with TestClient(H.create_api_app(edge_logs, edge_txs, edge_blocks)) as c:
+        yield c
+
+
+def _ref_endpoint(flows, addr, directions, by_token, top, **kw):
+    rows = [(d, *r) for d in directions for r in _ref_counterparties(flows, addr, d, by_token=by_token, **kw)]
+    return sorted(rows, key=lambda r: -r[3])[:top]  # tri stable par events entre directions
+
+
+@pytest.mark.parametrize('addr', [U0, U1, U2, U3, U1.upper().replace('0X', '0x')])
+@pytest.mark.parametrize('direction', ['out', 'in', 'both'])
+@pytest.mark.parametrize('query', [{}, {'top': 2}, {'start_block': 101, 'end_block': 103}, {'token': TOKEN_B}])
+def test_counterparties_endpoint(client, edge_flows, addr, direction, query):
+    r = client.get(f'/address/{addr}/counterparties', params={'direction': direction, **query})
+    assert r.status_code == 200
+    dirs = ['out', 'in'] if direction == 'both' else [direction]
+    kw = {k: v for k, v in query.items() if k != 'top'}
+    ref = _ref_endpoint(edge_flows, addr.lower(), dirs, True, query.get('top', 20), **kw)
+    assert [(x['direction'], x['counterparty'], x['token_address'], x['events'], int(x['amount_raw_sum']))
+            for x in r.json()] == ref
+    assert all(x['counterparty_short'] == H.short_hex(x['counterparty']) for x in r.json())
+
+
+@pytest.mark.parametrize('addr', [U0, U1, U3])
+@pytest.mark.parametrize('direction', ['out', 'in', 'both'])
+def test_tokens_endpoint(client, edge_flows, addr, direction):
+    rows = client.get(f'/address/{addr}/tokens', params={'direction': direction}).json()
+    dirs = ['out', 'in'] if direction == 'both' else [direction]
+    assert [(x['direction'], x['token_address'], x['events'], int(x['amount_raw_sum'])) for x in rows] == [
+        (d, tk, n, s) for d, _, tk, n, s in _ref_endpoint(edge_flows, addr, dirs, False, 50)]
+    assert 'counterparty' not in (rows[0] if rows else {})
+
+
+def test_batch_and_invalid_amounts_are_summed_exactly(client):
+    # TransferBatch U1→U3 (ids 1 et 2, valeurs 30 et 40): deux lignes; payload vide compté 0, décimal sans 0x lu tel quel
+    rows = client.get(f'/address/{U1}/counterparties', params={'direction': 'out', 'token': TOKEN_B}).json()
+    assert [(x['counterparty'], x['events'], int(x['amount_raw_sum'])) for x in rows] == [(U3, 2, 70), (U0, 1, 7)]
+    rows = client.get(f'/address/{U1}/counterparties', params={'direction': 'out', 'token': TOKEN_A}).json()
+    assert [(x['counterparty'], x['events'], int(x['amount_raw_sum'])) for x in rows] == [(U2, 2, 123)]
+
+
+@pytest.mark.parametrize('addr', [U0, U1, U3])
+@pytest.mark.parametrize('direction', ['out', 'in'])
+@pytest.mark.parametrize('query', [{'max_hops': 1}, {'max_hops': 3}, {'max_hops': 2, 'start_block': 102}])
+def test_paths_endpoint(client, edge_flows, addr, direction, query):
+    rows = client.get(f'/address/{addr}/paths', params={'direction': direction, **query}).json()
+    ref = _ref_reachable(edge_flows, addr, query['max_hops'], direction, query.get('start_block'))
+    assert {x['address']: (x['hops'], x['via']) for x in rows} == ref
+    assert not any(x['truncated'] for x in rows)
+
+
+def test_paths_to_target(client, edge_flows):
+    ref = _ref_reachable(edge_flows, U2, 3, 'out')
+    rows = client.get(f'/address/{U2}/paths', params={'max_hops': 3, 'to': U1}).json()
+    path = [x['address'] for x in rows]
+    assert [x['hop'] for x in rows] == list(range(len(path))) and path[0] == U2 and path[-1] == U1
+    assert len(path) == ref[U1][0] + 1 and all(ref[b][1] == a for a, b in zip(path, path[1:]))
+    assert client.get(f'/address/{U2}/paths', params={'limit': 1}).json() == [
+        {'address': U2, 'hops': 0, 'via': None, 'truncated': False}]
+
+
+@pytest.mark.parametrize('path, status', [
+    (f'/address/0x{"ee" * 20}/counterparties', 404),
+    (f'/address/{TOKEN_A[:-2]}/tokens', 404),
+    (f'/address/{U0}/counterparties?token=0x{"ee" * 20}', 404),
+    (f'/address/{U0}/paths?to=0x{"ee" * 20}', 404),
+    (f'/address/{U0}/counterparties?direction=sideways', 400),
+    (f'/address/{U0}/paths?direction=both', 400),
+    (f'/address/{U0}/paths?max_hops=0', 400),
+    (f'/address/{U0}/paths?max_hops=7', 400),
+])
+def test_address_errors(client, path, status):
+    assert client.get(path).status_code == status
@@ -0,0 +1,45 @@
+import io
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+import hyper_evm_step1_events as H
+from conftest import TOKEN_A, TOKEN_B, U0
+from execution import ComputeExecutor
+
+
+@pytest.fixture
+def client(edge_logs, edge_txs, edge_blocks):
+    with TestClient(H.create_api_app(edge_logs, edge_txs, edge_blocks)) as c:
+        yield c
+
+
+@pytest.mark.parametrize('path', ['/flows/basic?top=-1', '/tokens/top?k=-1', '/flows/amounts?top=-1',
+                                  f'/address/{U0}/counterparties?top=-1', f'/address/{U0}/tokens?top=-1'])
+def test_negative_sizes_are_rejected(client, path):
+    r = client.get(path)
+    assert r.status_code == 400
+
+
+def test_top_zero_and_default(client):
+    assert client.get('/flows/basic?top=0').json() == []
+    assert client.get('/tokens/top?k=0').json() == []
+    rows = client.get('/flows/basic').json()
+    assert len(rows) == 8 and [r['count'] for r in rows] == [2, 2, 2, 2, 1, 1, 1, 1]
+    assert [(r['token_address'], r['events']) for r in client.get('/tokens/top').json()] == [(TOKEN_A, 7), (TOKEN_B, 5)]
+
+
+def test_export_zip_members(client):
+    r = client.get('/export.zip?freq=h')
+    assert r.status_code == 200
+    names = zipfile.ZipFile(io.BytesIO(r.content)).namelist()
+    assert sorted(names) == ['activity_gas_h.csv', 'activity_transfers_h.csv', 'activity_tx_h.csv', 'top_tokens.csv']
+    assert client.get('/export.zip?freq=h').content == r.content
+
+
+def test_export_zip_saturated_is_503(edge_logs, edge_txs, edge_blocks):
+    app = H.create_api_app(edge_logs, edge_txs, edge_blocks, executor=ComputeExecutor(max_inflight=2))
+    with TestClient(app) as c:
+        r = c.get('/export.zip')
+        assert r.status_code == 503 and r.headers['Retry-After']
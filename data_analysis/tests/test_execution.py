@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from execution import ComputeExecutor, ExecutorSaturated, SharedArrays
+
+
+def _total(arrays, scale):
+    return int(arrays['x'].sum()) * scale
+
+
+@pytest.fixture(scope='module')
+def pooled():
+    ex = ComputeExecutor(max_inflight=4, processes=1)
+    yield ex
+    ex.shutdown()
+
+
+def test_cpu_runs_in_pool_on_shared_arrays(pooled):
+    pub = pooled.publish('a', 1, lambda: {'x': np.arange(10)})
+    assert isinstance(pub, SharedArrays)
+    assert pooled.cpu(_total, pub, 2) == 90
+    assert pub.refs == 0
+
+
+def test_replaced_publication_survives_until_released(pooled):
+    # une requête tient la v1 quand une publication concurrente la remplace: segments libérés après son calcul
+    held = pooled.publish('b', 1, lambda: {'x': np.arange(5)})
+    newer = pooled.publish('b', 2, lambda: {'x': np.arange(6)})
+    assert held.retired and held.refs == 1 and held._segments
+    assert pooled.cpu(_total, held, 1) == 10
+    assert held.refs == 0 and not held._segments
+    assert pooled.cpu(_total, newer, 1) == 15
+    assert newer.refs == 0 and newer._segments
+
+
+def test_same_version_is_published_once(pooled):
+    built = []
+    def build():
+        built.append(1)
+        return {'x': np.ones(3)}
+    for _ in range(3):
+        pooled.cpu(_total, pooled.publish('c', 7, build), 1)
+    assert len(built) == 1
+
+
+def test_local_arrays_without_pool():
+    ex = ComputeExecutor(processes=0)
+    try:
+        assert ex.cpu(_total, ex.publish('a', 1, lambda: {'x': np.arange(4)}), 3) == 18
+    finally:
+        ex.shutdown()
+
+
+def test_identical_requests_are_coalesced_and_bounded():
+    ex = ComputeExecutor(max_inflight=1)
+    gate = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        gate.wait(5)
+        return 42
+
+    async def scenario():
+        first = asyncio.ensure_future(ex.run('k', slow))
+        second = asyncio.ensure_future(ex.run('k', slow))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorSaturated):
+            await ex.run('other', slow)
+        gate.set()
+        return await first, await second
+
+    try:
+        assert asyncio.run(scenario()) == (42, 42)
+        assert len(calls) == 1 and ex.coalesced == 1 and ex.rejected == 1
+    finally:
+        ex.shutdown()
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import hyper_evm_step1_events as H
+
+URLS = ['/events/types', '/tx/timeseries?freq=15min', '/tx/timeseries?freq=w', '/flows/basic?top=20',
+        '/tokens/top?k=5', '/flows/amounts?top=20', '/flows/basic?top=20&mode=approx']
+GAS_URLS = ['/gas/timeseries?freq=h', '/gas/timeseries?freq=w']
+
+
+def _slice(frames, lo, hi):
+    events, txs, blocks = frames
+    return (events[events['block_number'].between(lo + 1, hi)], txs[txs['block_number'].between(lo + 1, hi)],
+            blocks[blocks['number'].between(lo + 1, hi)])
+
+
+@pytest.fixture(scope='module')
+def appended(synthetic):
+    blocks = synthetic[2]['number']
+    first, last = int(blocks.min()), int(blocks.max())
+    cuts = [first + (last - first) * q // 4 for q in (1, 2, 3)] + [last]
+    app = H.create_api_app(*_slice(synthetic, first - 1, cuts[0]), high_water_block=cuts[0], precompute=True)
+    with TestClient(app) as client:
+        for url in URLS + GAS_URLS:
+            client.get(url)  # dérivés matérialisés avant les append
+        for lo, hi in zip(cuts, cuts[1:]):
+            app.state.store.append(*_slice(synthetic, lo, hi), high_water_block=hi)
+        yield client
+
+
+@pytest.fixture(scope='module')
+def full(synthetic):
+    with TestClient(H.create_api_app(*synthetic)) as client:
+        yield client
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_append_matches_full_load(appended, full, url):
+    assert appended.get(url).json() == full.get(url).json()
+
+
+@pytest.mark.parametrize('url', GAS_URLS)
+def test_append_gas_averages_within_one_ulp(appended, full, url):
+    got, ref = pd.DataFrame(appended.get(url).json()), pd.DataFrame(full.get(url).json())
+    exact = ['timestamp_dt', 'block_count', 'gas_used_sum']
+    pd.testing.assert_frame_equal(got[exact], ref[exact])
+    pd.testing.assert_frame_equal(got, ref, check_exact=False, rtol=1e-12)
+
+
+def test_append_bumps_version_and_high_water(appended, synthetic):
+    info = appended.get('/info').json()
+    assert info['high_water_block'] == int(synthetic[2]['number'].max())
+    assert info['events_rows'] == len(synthetic[0])
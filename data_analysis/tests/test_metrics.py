@@ -0,0 +1,47 @@
+import numpy as np
+from fastapi.testclient import TestClient
+
+import hyper_evm_step1_events as H
+from metrics import METRICS, MetricsRegistry
+
+
+def test_hold_is_reference_counted():
+    reg = MetricsRegistry()
+    with reg.hold():
+        with reg.hold():
+            assert reg.enabled
+        assert reg.enabled
+    assert not reg.enabled
+    always = MetricsRegistry(enabled=True)
+    with always.hold():
+        pass
+    assert always.enabled
+
+
+def test_timed_records_rss_growth():
+    reg = MetricsRegistry(enabled=True)
+
+    @reg.timed('alloc')
+    def alloc():
+        return np.ones(32 << 20, dtype=np.uint8)  # 32 Mo écrits: pages résidentes
+
+    keep = alloc()
+    growth = reg._counters['stage_rss_growth_bytes_total'][(('stage', 'alloc'),)]
+    assert growth >= 16 << 20 and keep.nbytes == 32 << 20
+    assert 'hyper_evm_stage_rss_growth_bytes_total{stage="alloc"}' in reg.render()
+
+
+def test_app_metrics_enabled_for_its_lifetime_only(edge_logs, edge_txs, edge_blocks):
+    assert not METRICS.enabled
+    app = H.create_api_app(edge_logs, edge_txs, edge_blocks, metrics=True, precompute=True)
+    assert not METRICS.enabled
+    with TestClient(app) as client:
+        assert METRICS.enabled
+        client.get('/flows/basic')
+        body = client.get('/metrics').text
+        assert 'hyper_evm_stage_seconds_bucket{stage="flows_basic"' in body
+        assert 'hyper_evm_stage_rss_growth_bytes_total{stage="tagging"}' in body
+    assert not METRICS.enabled
+    with TestClient(H.create_api_app(edge_logs, edge_txs, edge_blocks)) as client:
+        assert not METRICS.enabled
+        assert client.get('/metrics').status_code == 404
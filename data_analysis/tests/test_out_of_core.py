@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+import hyper_evm_step1_events as H
+import out_of_core as O
+
+
+def _rollup(txs, blocks, events):
+    return H.build_timeseries_rollup(blocks, txs, H.tag_events_simple(events))
+
+
+@pytest.fixture(scope='module')
+def frames(synthetic):
+    events, txs, blocks = synthetic
+    return txs, blocks, events
+
+
+@pytest.mark.parametrize('partition_blocks', [97, 1000])
+def test_partitions_match_in_memory(frames, partition_blocks):
+    txs, blocks, events = frames
+    parts = lambda: O.frame_partitions(txs, blocks, events, partition_blocks)
+    tagged = H.tag_events_simple(events)
+    pd.testing.assert_frame_equal(O.top_tokens_by_events(parts(), 15),
+                                  H.top_tokens_by_events(H.build_token_flows_basic(tagged), 15))
+    pd.testing.assert_frame_equal(O.aggregate_flow_amounts(parts(), 40),
+                                  H.aggregate_flow_amounts(H.build_token_flows_with_amounts(tagged, compact=True), 40))
+    pd.testing.assert_frame_equal(O.build_timeseries_rollup(parts()), _rollup(txs, blocks, events))
+    agg = O.aggregate(parts())
+    pd.testing.assert_frame_equal(agg.rollup, _rollup(txs, blocks, events))
+
+
+def test_hex_block_numbers_are_partitioned(edge_txs, edge_blocks, edge_logs):
+    to_hex = lambda col: col.map(lambda v: hex(int(v)))
+    txs = edge_txs.assign(block_number=to_hex(edge_txs['block_number']))
+    blocks = edge_blocks.assign(number=to_hex(edge_blocks['number']))
+    events = edge_logs.assign(block_number=to_hex(edge_logs['block_number']))
+    parts = list(O.frame_partitions(txs, blocks, events, partition_blocks=2))
+    assert sum(len(p[2]) for p in parts) == len(events)
+    assert sum(len(p[1]) for p in parts) == len(blocks)
+    pd.testing.assert_frame_equal(O.build_timeseries_rollup(parts), _rollup(edge_txs, edge_blocks, edge_logs))
+
+
+def test_empty_input_returns_empty_frames():
+    rollup = O.build_timeseries_rollup(iter([]))
+    assert isinstance(rollup, pd.DataFrame) and rollup.empty
+    assert list(rollup.columns) == list(_rollup(*O._empty_partition()).columns)
+    assert O.aggregate_flow_amounts(iter([]), 5).empty
+    assert O.top_tokens_by_events(iter([]), 5).empty
@@ -0,0 +1,239 @@
+"""
+Parité avec l'implémentation ligne à ligne d'origine (apply(axis=1) / iterrows, commit initial).
+
+Les valeurs BASELINE_* sont les sorties de l'implémentation d'origine sur EDGE_LOGS (conftest.py). Écarts voulus,
+introduits par des changements ultérieurs et vérifiés explicitement ci-dessous:
+- le hash TransferBatch de SIG était faux: ces logs étaient tagués 'other', ils sont maintenant des transferts;
+- TransferBatch est décodé en une ligne par (id, value); TransferSingle avec un payload de moins de deux mots
+  est invalide (l'original le complétait à gauche par des zéros → id 0, montant 0);
+- amount_token manquant vaut None (l'original donnait NaN dès que token_decimals était fourni).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import hyper_evm_step1_events as H
+from conftest import TOKEN_A, TOKEN_B, TRANSFER, TRANSFER_BATCH, TRANSFER_SINGLE, U0, U1, U2, U3
+
+BIG = int('1' * 66, 16)
+
+# event_type / is_token_transfer / tradution_event par log d'EDGE_LOGS
+BASELINE_EVENT_TYPES = ['erc20_transfer'] * 7 + ['erc721_transfer'] + ['erc20_transfer'] * 3 + [
+    'erc1155_transfer_single', 'erc1155_transfer_single', 'other', 'approval_for_all', 'other', 'other']
+BASELINE_LABELS = ['erc20_transfer'] * 7 + ['erc721_transfer'] + ['erc20_transfer'] * 3 + [
+    'single_tx', 'single_tx', 'other', 'approval_for_all', 'other', 'other']
+
+# build_token_flows_basic: (log, from, to); logs 9 / 10 (topic manquant) écartés
+BASELINE_FLOWS_BASIC = [(0, U0, U1), (1, U1, U2), (2, U1, U2), (3, U2, U0), (4, U0, U3), (5, U0, U3), (6, U3, U1),
+                        (7, U0, U1), (8, U1, U0), (11, U0, U2), (12, U2, U0)]
+
+# build_token_flows_with_amounts sans décimales: (log, token_id, amount_raw, amount_token)
+BASELINE_AMOUNTS = [
+    (0, None, 10 ** 18, None), (1, None, None, None), (2, None, 123, None), (3, None, 5, None),
+    (4, None, BIG, None), (5, None, None, None), (6, None, None, None), (7, 42, 1, 1.0), (8, None, 7, None),
+    (9, None, 1, None), (10, None, 1, None), (11, 5, 250, None), (12, 0, 0, None),
+]
+# avec décimales (TOKEN_A: 18, TOKEN_B: 0)
+BASELINE_AMOUNT_TOKENS = [1.0, None, 1.23e-16, 5e-18, BIG / 10 ** 18, None, None, 1.0, 7.0, 1e-18, 1e-18, None, None]
+
+HOURS = pd.DatetimeIndex(['2023-11-14 22:00', '2023-11-14 23:00', '2023-11-15 00:00'], tz='UTC', name='timestamp_dt')
+DAYS = pd.DatetimeIndex(['2023-11-14', '2023-11-15'], tz='UTC', name='timestamp_dt')
+BASELINE_TX_H = [4, 1, 2] + [0] * 22 + [2]
+BASELINE_TX_D = [5, 4]
+BASELINE_GAS_D = pd.DataFrame({'block_count': [3, 2], 'gas_used_sum': [45_000_000, 8_500_000],
+                               'gas_used_pct_avg': [0.5, (0.25 + 1 / 30) / 2],
+                               'base_fee_gwei_avg': [3.5 / 3, 2.0]}, index=DAYS)
+# l'original ne comptait pas le TransferBatch (tagué 'other'), d'où +1 à 00:00
+BASELINE_TRANSFERS_H = [7, 4, 2]
+BASELINE_TRANSFERS_D = [11, 2]
+
+DECIMALS = pd.DataFrame({'token_address': [TOKEN_A.upper().replace('0X', '0x'), TOKEN_B], 'decimals': [18, 0]})
+
+
+def _missing_to_none(values) -> list:
+    return [None if v is None or (isinstance(v, float) and np.isnan(v)) else v for v in values]
+
+
+def test_tagging_matches_baseline(edge_logs):
+    tagged = H.tag_events_simple(edge_logs)
+    expected = BASELINE_EVENT_TYPES.copy()
+    expected[13] = 'erc1155_transfer_batch'
+    assert tagged['event_type'].tolist() == expected
+    assert tagged['is_token_transfer'].tolist() == ['transfer' in e for e in expected]
+    assert_frame_equal(tagged[edge_logs.columns], edge_logs)
+
+    labels = BASELINE_LABELS.copy()
+    labels[13] = 'batch_tx'
+    assert H.label_events_basic(edge_logs)['tradution_event'].tolist() == labels
+
+
+def test_tagging_without_topic3_column(edge_logs):
+    tagged = H.tag_events_simple(edge_logs.drop(columns=['topic3']))
+    assert tagged['event_type'].iloc[7] == 'erc20_transfer'
+
+
+def test_tx_methods_match_baseline(edge_txs):
+    out = H.label_tx_methods_basic(edge_txs)
+    assert _missing_to_none(out['method_selector']) == [
+        '0xa9059cbb', None, '0x23b872dd', '0x12345678', None, None, None, None, '0x095ea7b3']
+    assert out['method_name'].tolist() == [
+        'transfer(address,uint256)', 'no_input', 'transferFrom(address,address,uint256)', 'unknown',
+        'no_input', 'no_input', 'no_input', 'unknown', 'approve(address,uint256)']
+
+
+def test_flows_basic_match_baseline(edge_logs):
+    flows = H.build_token_flows_basic(edge_logs)
+    expected = BASELINE_FLOWS_BASIC + [(13, U1, U3)]
+    assert list(flows.columns) == ['transaction_hash', 'token_address', 'from', 'to', 'from_short', 'to_short', 'token_short']
+    assert flows['transaction_hash'].tolist() == [edge_logs['transaction_hash'][i] for i, _, _ in expected]
+    assert flows['token_address'].tolist() == [edge_logs['address'][i] for i, _, _ in expected]
+    assert list(zip(flows['from'], flows['to'])) == [(f, t) for _, f, t in expected]
+    assert flows['from_short'].tolist() == [f'{f[:8]}…{f[-4:]}' for _, f, _ in expected]
+    assert flows['token_short'].iloc[0] == '0xa1a1a1…a1a1'
+    assert_frame_equal(flows, H.build_token_flows_basic(H.tag_events_simple(edge_logs)))
+
+
+def test_flows_with_amounts_match_baseline(edge_logs):
+    flows = H.build_token_flows_with_amounts(edge_logs)
+    assert list(flows.columns) == ['transaction_hash', 'block_number', 'token_address', 'event_type', 'from', 'to',
+                                   'token_id', 'amount_raw', 'amount_token', 'is_batch']
+    single = flows[flows['event_type'] != 'erc1155_transfer_batch']
+    expected = BASELINE_AMOUNTS[:12] + [(12, None, None, None)]
+    assert single.index.tolist() == [i for i, *_ in expected]
+    assert single['token_id'].tolist() == [t for _, t, _, _ in expected]
+    assert single['amount_raw'].tolist() == [a for _, _, a, _ in expected]
+    assert single['amount_token'].tolist() == [a for *_, a in expected]
+    assert all(type(v) is int for v in single['amount_raw'] if v is not None)
+    assert not single['is_batch'].any()
+
+
+def test_transfer_batch_rows(edge_logs):
+    flows = H.build_token_flows_with_amounts(edge_logs)
+    batch = flows[flows['is_batch']]
+    assert batch.index.tolist() == [13, 13]
+    assert batch['token_id'].tolist() == [1, 2]
+    assert batch['amount_raw'].tolist() == [30, 40]
+    assert (batch['from'] == U1).all() and (batch['to'] == U3).all()
+
+
+def test_amount_token_with_decimals(edge_logs):
+    flows = H.build_token_flows_with_amounts(edge_logs, DECIMALS)
+    assert flows.columns.tolist().count('token_address') == 1
+    single = flows[~flows['is_batch']]
+    expected = BASELINE_AMOUNT_TOKENS[:12] + [None]
+    assert _missing_to_none(single['amount_token']) == pytest.approx(expected, rel=1e-15)
+
+
+def test_compact_mode_roundtrip(edge_logs):
+    from uint256 import UInt256Array
+    obj = H.build_token_flows_with_amounts(edge_logs, DECIMALS)
+    compact = H.build_token_flows_with_amounts(edge_logs, DECIMALS, compact=True)
+    assert UInt256Array.from_columns(compact, 'amount_raw').to_ints().tolist() == obj['amount_raw'].tolist()
+    assert UInt256Array.from_columns(compact, 'token_id').to_ints().tolist() == obj['token_id'].tolist()
+    assert compact['amount_token'].dtype == np.float64
+
+
+def test_empty_events(edge_logs):
+    empty = edge_logs.iloc[:0]
+    assert H.tag_events_simple(empty).empty
+    assert H.build_token_flows_basic(empty).empty
+    assert H.build_token_flows_with_amounts(empty).empty
+
+
+def test_timeseries_match_baseline(edge_logs, edge_txs, edge_blocks):
+    tx_h = H.prepare_tx_timeseries(edge_blocks, edge_txs, 'h')
+    assert tx_h['tx_count'].tolist() == BASELINE_TX_H
+    assert tx_h.index[:3].equals(HOURS)
+    tx_d = H.prepare_tx_timeseries(edge_blocks, edge_txs, 'd')
+    assert tx_d['tx_count'].tolist() == BASELINE_TX_D and tx_d.index.equals(DAYS)
+
+    gas_d = H.prepare_gas_timeseries(edge_blocks, 'd')
+    assert_frame_equal(gas_d, BASELINE_GAS_D, check_dtype=False, check_index_type=False, check_freq=False)
+    gas_h = H.prepare_gas_timeseries(edge_blocks, 'h')
+    assert gas_h['block_count'].tolist() == [2, 1, 1] + [0] * 22 + [1]
+    assert gas_h['gas_used_pct_avg'].iloc[3:25].isna().all()
+
+    tr_h = H.build_transfer_counts_timeseries(edge_logs, edge_blocks, 'h')
+    assert tr_h['transfer_event_count'].tolist() == BASELINE_TRANSFERS_H[:2] + [BASELINE_TRANSFERS_H[2] + 1]
+    assert tr_h.index.equals(HOURS)
+    tr_d = H.build_transfer_counts_timeseries(edge_logs, edge_blocks, 'd')
+    assert tr_d['transfer_event_count'].tolist() == [BASELINE_TRANSFERS_D[0], BASELINE_TRANSFERS_D[1] + 1]
+
+
+def test_timeseries_accept_hex_and_string_block_numbers(edge_logs, edge_txs, edge_blocks):
+    blocks = edge_blocks.assign(number=edge_blocks['number'].map(hex), gas_used=edge_blocks['gas_used'].map(hex))
+    txs = edge_txs.assign(block_number=edge_txs['block_number'].map(str))
+    logs = edge_logs.assign(block_number=edge_logs['block_number'].map(hex))
+    assert H.prepare_tx_timeseries(blocks, txs, 'h')['tx_count'].tolist() == BASELINE_TX_H
+    assert H.prepare_gas_timeseries(blocks, 'd')['gas_used_sum'].tolist() == [45_000_000, 8_500_000]
+    assert H.build_transfer_counts_timeseries(logs, blocks, 'd')['transfer_event_count'].tolist() == [11, 3]
+
+
+@pytest.mark.parametrize('freq', ['15min', 'h', 'd', 'w'])
+def test_rollup_matches_direct_timeseries(synthetic, freq):
+    events, txs, blocks = synthetic
+    rollup = H.build_timeseries_rollup(blocks, txs, events)
+    assert_frame_equal(H.rollup_timeseries(rollup, 'tx', freq), H.prepare_tx_timeseries(blocks, txs, freq), check_freq=False)
+    assert_frame_equal(H.rollup_timeseries(rollup, 'transfers', freq),
+                       H.build_transfer_counts_timeseries(events, blocks, freq), check_freq=False)
+    assert_frame_equal(H.finalize_gas_timeseries(H.rollup_timeseries(rollup, 'gas', freq)),
+                       H.prepare_gas_timeseries(blocks, freq), check_freq=False)
+
+
+# --- Référence ligne à ligne (logique de l'implémentation d'origine, SIG corrigé) sur données synthétiques ---
+
+_REF_TYPES = {TRANSFER_SINGLE: 'erc1155_transfer_single', TRANSFER_BATCH: 'erc1155_transfer_batch',
+              H.SIG['APPROVAL']: 'approval', H.SIG['APPROVAL_FOR_ALL']: 'approval_for_all'}
+
+
+def _ref_event_type(row) -> str:
+    sig = row['topic0'].lower() if isinstance(row['topic0'], str) else None
+    if sig == TRANSFER:
+        return 'erc721_transfer' if H._is_hex(row['topic3']) else 'erc20_transfer'
+    return _REF_TYPES.get(sig, 'other')
+
+
+def _ref_parties(row) -> tuple:
+    if row['event_type'].startswith('erc1155_'):
+        return H.topic_to_address(row['topic2']), H.topic_to_address(row['topic3'])
+    return H.topic_to_address(row['topic1']), H.topic_to_address(row['topic2'])
+
+
+def _ref_amount(row) -> tuple:
+    et = row['event_type']
+    if et == 'erc20_transfer':
+        return None, H.hex_to_int(row['data'])
+    if et == 'erc721_transfer':
+        return H.hex_to_int(row['topic3']), 1
+    h = row['data'][2:]
+    return int(h[:64], 16), int(h[64:128], 16)
+
+
+def test_vectorized_matches_row_wise_reference(synthetic):
+    events = synthetic[0].astype(object).where(synthetic[0].notna(), None)
+    tagged = H.tag_events_simple(events)
+    expected_types = events.apply(_ref_event_type, axis=1)
+    assert tagged['event_type'].tolist() == expected_types.tolist()
+
+    ref = tagged[tagged['event_type'].str.contains('transfer')]
+    parties = ref.apply(_ref_parties, axis=1).tolist()
+    basic = H.build_token_flows_basic(tagged)
+    assert list(zip(basic['from'], basic['to'])) == [p for p in parties if None not in p]
+
+    flows = H.build_token_flows_with_amounts(tagged)
+    flows = flows[~flows['is_batch']]
+    ref = ref[ref['event_type'] != 'erc1155_transfer_batch']
+    assert flows.index.tolist() == ref.index.tolist()
+    assert list(zip(flows['token_id'], flows['amount_raw'])) == ref.apply(_ref_amount, axis=1).tolist()
+
+
+def test_flow_amount_sums_scaled_exactly(edge_logs):
+    flows = H.build_token_flows_with_amounts(edge_logs, compact=True)
+    plain = H.aggregate_flow_amounts(flows, 5)
+    assert 'amount_token_sum' not in plain.columns
+    out = H.aggregate_flow_amounts(flows, 5, token_decimals=DECIMALS)
+    assert out['amount_raw_sum'].tolist() == plain['amount_raw_sum'].tolist()
+    big = str(BIG)
+    assert out['amount_token_sum'].tolist() == [f'{big[:-18]}.{big[-18:]}', '0.000000000000000123', '70', '1', '250']
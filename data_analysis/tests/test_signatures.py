@@ -0,0 +1,50 @@
+import json
+
+import pandas as pd
+import pytest
+
+import hyper_evm_step1_events as H
+from signatures import SignatureRegistry, keccak_hex
+
+ABI = [
+    {'type': 'function', 'name': 'swap', 'inputs': [{'type': 'uint256'}, {'type': 'address'}]},
+    {'type': 'event', 'name': 'Swap', 'inputs': [{'type': 'address'}, {'type': 'uint256'}]},
+]
+# keccak256 précalculés: les tests du registre ne dépendent pas de pycryptodome (optionnel)
+SWAP_SELECTOR = '0xd3986f08'
+SWAP_TOPIC = '0x562c219552544ec4c9d7a8eb850f80ea152973e315372bf4999fe7c953ea004f'
+
+
+def test_load_json_and_csv(tmp_path):
+    js = tmp_path / 'sigs.json'
+    js.write_text(json.dumps([{'selector': SWAP_SELECTOR, 'signature': 'swap(uint256,address)'},
+                              {'topic0': SWAP_TOPIC, 'text_signature': 'Swap(address,uint256)'}]))
+    csv = tmp_path / 'sigs.csv'
+    csv.write_text('hex_signature,text_signature\n0xdeadbeef,foo(uint8)\n0x12,bad()\n')
+    reg = SignatureRegistry()
+    assert reg.load(str(js)) == 2 and reg.load(str(csv)) == 1
+    assert reg.n_selectors == 2 and reg.n_topics == 1
+    assert reg.label_selectors(pd.Series([SWAP_SELECTOR, '0xDEADBEEF', '0x00000000', None])).tolist() == [
+        'swap(uint256,address)', 'foo(uint8)', None, None]
+    assert reg.label_topics([SWAP_TOPIC, SWAP_TOPIC[:-1]]).tolist() == ['Swap(address,uint256)', None]
+
+
+def test_registry_labels_methods_and_events():
+    reg = SignatureRegistry(H.SELECTOR_MAP)
+    reg.add([(SWAP_SELECTOR, 'swap(uint256,address)'), (SWAP_TOPIC, 'Swap(address,uint256)')])
+    txs = pd.DataFrame({'input_data': [SWAP_SELECTOR + '00' * 64, '0x', '0xffffffff']})
+    assert H.label_tx_methods_basic(txs, registry=reg)['method_name'].tolist() == [
+        'swap(uint256,address)', 'no_input', 'unknown']
+    logs = pd.DataFrame({'topic0': [SWAP_TOPIC, '0x' + '0' * 64]})
+    assert H.label_events_basic(logs, registry=reg)['tradution_event'].tolist() == ['Swap(address,uint256)', 'other']
+
+
+def test_abi_entries_are_hashed(tmp_path):
+    pytest.importorskip('Crypto.Hash.keccak')
+    assert keccak_hex('swap(uint256,address)')[:10] == SWAP_SELECTOR
+    abi = tmp_path / 'abi.json'
+    abi.write_text(json.dumps({'abi': ABI}))
+    reg = SignatureRegistry()
+    assert reg.load(str(abi)) == 2
+    assert reg.label_selectors([SWAP_SELECTOR]).tolist() == ['swap(uint256,address)']
+    assert reg.label_topics([SWAP_TOPIC]).tolist() == ['Swap(address,uint256)']
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import hyper_evm_step1_events as H
+from sketches import HeavyHitters
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_heavy_hitters_bounds(seed):
+    rng = np.random.default_rng(seed)
+    cap, n = int(rng.integers(1, 40)), int(rng.integers(0, 3000))
+    keys = (rng.zipf(1.3, n) % int(rng.integers(1, 200))).astype(np.int64)
+    cut = int(rng.integers(0, n + 1))
+    hh = HeavyHitters(cap).extend(keys[:cut], chunk_rows=int(rng.integers(1, 500))).extend(keys[cut:])
+    true = pd.Series(keys).value_counts()
+    assert hh.total == n and len(hh) <= cap and hh.error <= n / (cap + 1)
+    est = pd.Series(hh.counts, index=hh.keys).reindex(true.index, fill_value=0)
+    assert (est <= true).all() and (true <= est + hh.error).all()
+    assert set(true[true > hh.error].index) <= set(hh.keys)
+
+
+@pytest.mark.parametrize('d', [10, 1000, 50_000])
+def test_hll_distinct_estimate(d):
+    hh = HeavyHitters(4, H.HLL_PRECISION).extend(np.zeros(2 * d, np.int64), (np.arange(2 * d) % d,))
+    assert hh.distinct([0, 1])[0] == pytest.approx(d, rel=0.1)
+    assert hh.distinct([0, 1])[1] == 0
+
+
+@pytest.fixture(scope='module')
+def store(synthetic):
+    return H.EnrichedFrames(*synthetic)
+
+
+def test_approx_top_pairs_within_bounds(store):
+    exact, approx = store.top_flow_pairs(30), store.top_flow_pairs(30, approx=True)
+    m = exact.merge(approx, on=['from', 'to'], suffixes=('', '_a'))
+    assert len(m) >= 27
+    assert ((m['count_a'] <= m['count']) & (m['count'] <= m['count_a'] + m['count_max_error'])).all()
+
+
+def test_approx_top_tokens_match_exact(store):
+    exact, approx = store.top_tokens(10), store.top_tokens(10, approx=True)
+    assert set(exact['token_address']) == set(approx['token_address'])
+    m = exact.merge(approx, on='token_address', suffixes=('', '_a'))
+    assert ((m['events_a'] <= m['events']) & (m['events'] <= m['events_a'] + m['events_max_error'])).all()
+    f = store.flows_basic[store.flows_basic['token_address_id'] >= 0]
+    parties = pd.concat([f[['token_address_id', col]].set_axis(['t', 'a'], axis=1) for col in ('from_id', 'to_id')])
+    ids = [store.addresses.lookup(a) for a in approx['token_address']]
+    exact_distinct = parties.groupby('t')['a'].nunique().reindex(ids).to_numpy()
+    rel = approx['distinct_counterparties'].to_numpy() / exact_distinct - 1
+    assert np.abs(rel).max() < 0.1
+
+
+def test_distinct_counterparties_independent_of_load_order(synthetic):
+    events, txs, blocks = synthetic
+    full = H.EnrichedFrames(events, txs, blocks).top_tokens(10, approx=True)
+    # même flux, adresses internées dans un autre ordre
+    shuffled = H.EnrichedFrames(events.iloc[::-1].reset_index(drop=True), txs, blocks).top_tokens(10, approx=True)
+    pd.testing.assert_frame_equal(full, shuffled)
+
+
+def test_precompute_without_exact_counts(synthetic):
+    store = H.EnrichedFrames(*synthetic)
+    store.precompute(exact_counts=False)
+    assert {'pair_sketch', 'token_sketch'} <= store._derived.keys()
+    assert not {'flow_pair_counts', 'token_counts'} & store._derived.keys()
@@ -0,0 +1,104 @@
+import threading
+
+import pandas as pd
+import pytest
+
+import hyper_evm_step1_events as H
+from snapshot import SnapshotStore
+
+PARTITION_BLOCKS = 50
+TABLES = ('transactions', 'blocks', 'event_logs')
+
+
+@pytest.fixture(scope='module')
+def bounds(indexer_frames):
+    blocks = indexer_frames[2]['number']
+    return int(blocks.min()), int(blocks.quantile(.4)), int(blocks.max())
+
+
+@pytest.fixture(scope='module')
+def full(indexer_engine, bounds):
+    return H.load_frames_typed(indexer_engine, upto_block=bounds[2])
+
+
+def _assert_frames_equal(got, ref):
+    for g, r in zip(got, ref):
+        # catégories: l'ordre dépend des partitions lues, seules les valeurs comptent
+        pd.testing.assert_frame_equal(g.reset_index(drop=True), r.reset_index(drop=True), check_categorical=False)
+
+
+def _rows(store):
+    return {t: len(store.read_table(t)) for t in TABLES}
+
+
+@pytest.fixture
+def synced(indexer_engine, bounds, tmp_path):
+    store = SnapshotStore(str(tmp_path / 'snap'), partition_blocks=PARTITION_BLOCKS)
+    store.sync_from_db(indexer_engine, upto_block=bounds[1])
+    store.sync_from_db(indexer_engine, upto_block=bounds[2])
+    return store
+
+
+def test_build_then_delta_equals_full_load(synced, indexer_engine, full, bounds, tmp_path):
+    _assert_frames_equal(synced.read(), full)
+    assert synced.max_block == bounds[2]
+    assert synced.manifest['rows'] == {t: len(df) for t, df in zip(TABLES, full)}
+
+    once = SnapshotStore(str(tmp_path / 'once'), partition_blocks=PARTITION_BLOCKS)
+    once.sync_from_db(indexer_engine, upto_block=bounds[2])
+    _assert_frames_equal(once.read(), synced.read())
+    assert synced.sync_from_db(indexer_engine, upto_block=bounds[1]) == 0
+
+
+@pytest.mark.parametrize('window', [(None, None), (1000049, 1000100), (1000010, 1000012), (None, 1000049),
+                                    (1000300, None), (1000332, None)])
+def test_read_table_prunes_partitions(synced, full, window):
+    after, upto = window
+    all_files = synced._partitions('event_logs')
+    lo = {f: int(f.rsplit('blocks_', 1)[1].split('_')[0]) for f in all_files}
+    overlapping = [f for f in all_files if (after is None or lo[f] + PARTITION_BLOCKS > after + 1)
+                   and (upto is None or lo[f] <= upto)]
+    assert synced._partitions('event_logs', after, upto) == overlapping
+    assert window == (None, None) or len(overlapping) < len(all_files)
+
+    events = full[2]
+    keep = events['block_number'].between(-1 if after is None else after + 1, upto or events['block_number'].max())
+    got = synced.read_table('event_logs', ['block_number', 'log_index', 'topic0'], after_block=after, upto_block=upto)
+    assert list(got.columns) == ['block_number', 'log_index', 'topic0']
+    assert got['block_number'].tolist() == events.loc[keep, 'block_number'].tolist()
+    assert got['log_index'].tolist() == events.loc[keep, 'log_index'].tolist()
+
+
+@pytest.mark.parametrize('window', [(None, None), (1000049, 1000120), (1000073, 1000074)])
+def test_iter_partitions_boundaries(synced, window):
+    after, upto = window
+    parts = list(synced.iter_partitions(after_block=after, upto_block=upto))
+    for txs, blocks, events in parts:
+        lo = int(blocks['number'].min()) // PARTITION_BLOCKS * PARTITION_BLOCKS
+        for df, col in ((txs, 'block_number'), (blocks, 'number'), (events, 'block_number')):
+            assert df[col].between(lo, lo + PARTITION_BLOCKS - 1).all()
+    whole = synced.read(after_block=after, upto_block=upto)
+    _assert_frames_equal([pd.concat(dfs, ignore_index=True) for dfs in zip(*parts)], whole)
+
+
+def test_rewriting_a_delta_does_not_duplicate(synced, indexer_engine, full, bounds):
+    delta = H.load_frames_typed(indexer_engine, after_block=bounds[1] - 30, upto_block=bounds[2])
+    synced.write(*delta, max_block=bounds[1])  # re-sync d'un delta déjà écrit, max_block en retard
+    _assert_frames_equal(synced.read(), full)
+    assert synced.max_block == bounds[2]
+    assert synced.manifest['rows'] == _rows(synced)
+
+
+def test_concurrent_writers_are_serialized(indexer_engine, full, bounds, tmp_path):
+    root = str(tmp_path / 'snap')
+    SnapshotStore(root, partition_blocks=PARTITION_BLOCKS).sync_from_db(indexer_engine, upto_block=bounds[1])
+    delta = H.load_frames_typed(indexer_engine, after_block=bounds[1], upto_block=bounds[2])
+    writers = [threading.Thread(target=SnapshotStore(root).write, args=delta, kwargs={'max_block': bounds[2]})
+               for _ in range(4)]
+    for t in writers:
+        t.start()
+    for t in writers:
+        t.join()
+    store = SnapshotStore(root)
+    _assert_frames_equal(store.read(), full)
+    assert store.manifest['rows'] == _rows(store) == {t: len(df) for t, df in zip(TABLES, full)}
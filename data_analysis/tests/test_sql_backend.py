@@ -0,0 +1,126 @@
+import os
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import hyper_evm_step1_events as H
+from sql_backend import SQLAggregates, SQLFrames
+
+# TEST_PG_URL: base PostgreSQL jetable (tables blocks / transactions / event_logs / indexer_state remplacées)
+BACKENDS = ['sqlite', pytest.param('postgres', marks=pytest.mark.skipif(not os.getenv('TEST_PG_URL'),
+                                                                          reason="TEST_PG_URL non défini"))]
+URLS = ([f'/tx/timeseries?freq={f}' for f in ('15min', 'h', 'd', 'w')]
+        + ['/tx/timeseries?freq=h&start=2023-11-14T23:00:00Z&end=1700020000', '/events/types', '/events/types?fmt=csv']
+        + [f'/tokens/top?k={k}' for k in (0, 1, 5, 50)] + [f'/flows/basic?top={t}' for t in (0, 1, 10, 100000)])
+GAS_URLS = [f'/gas/timeseries?freq={f}' for f in ('15min', 'h', 'd', 'w')]
+
+
+def _set_high_water(engine, block):
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS indexer_state"))
+        conn.execute(text("CREATE TABLE indexer_state (id INTEGER, last_indexed_block BIGINT)"))
+        conn.execute(text("INSERT INTO indexer_state VALUES (1, :b)"), {'b': block})
+
+
+@pytest.fixture(scope='module')
+def frames(synthetic):
+    events, txs, blocks = (df.copy() for df in synthetic)
+    # cas limites: topics non-adresse, gaz nul, base fee absente
+    events.loc[events.index[:50], 'topic1'] = '0x1234'
+    events.loc[events.index[50:60], 'topic2'] = '0x'
+    blocks.loc[blocks.index[:20], 'gas_limit'] = 0
+    blocks.loc[blocks.index[:10], 'gas_used'] = 0
+    blocks['base_fee_per_gas'] = blocks['base_fee_per_gas'].astype('Int64')
+    blocks.loc[blocks.index[30:40], 'base_fee_per_gas'] = pd.NA
+    return events, txs, blocks
+
+
+@pytest.fixture(scope='module', params=BACKENDS)
+def engine(request, frames, tmp_path_factory):
+    if request.param == 'sqlite':
+        eng = create_engine('sqlite:///' + str(tmp_path_factory.mktemp('sql') / 'hyper.db'))
+    else:
+        eng = create_engine(os.environ['TEST_PG_URL'])
+    events, txs, blocks = frames
+    blocks.to_sql('blocks', eng, index=False, if_exists='replace')
+    txs.to_sql('transactions', eng, index=False, if_exists='replace')
+    events.to_sql('event_logs', eng, index=False, if_exists='replace')
+    _set_high_water(eng, int(blocks['number'].max()))
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture(scope='module')
+def memory(frames):
+    with TestClient(H.create_api_app(*frames)) as client:
+        yield client
+
+
+def test_aggregates_match_memory(engine, memory):
+    store = memory.app.state.store
+    agg = SQLAggregates(engine)
+    pd.testing.assert_frame_equal(agg.rollup(), store.rollup, check_exact=False, rtol=1e-12)
+    mid = int(store.blocks['number'].median())
+    first = agg.rollup(upto_block=mid)
+    both = H.merge_timeseries_partials(first, agg.rollup(after_block=mid), H.ROLLUP_FREQ)
+    pd.testing.assert_frame_equal(both, store.rollup, check_exact=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_endpoints_match_memory(engine, memory, url):
+    with TestClient(H.create_api_app_for_store(SQLFrames(engine))) as sql:
+        assert sql.get(url).content == memory.get(url).content
+
+
+def _assert_gas_close(got, ref):
+    # sommes float: SUM SQL non compensée vs groupby pandas, écart possible au dernier ulp
+    got, ref = pd.DataFrame(got.json()), pd.DataFrame(ref.json())
+    exact = ['timestamp_dt', 'block_count', 'gas_used_sum']
+    pd.testing.assert_frame_equal(got[exact], ref[exact])
+    pd.testing.assert_frame_equal(got, ref, check_exact=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize('url', GAS_URLS)
+def test_gas_endpoints_match_memory(engine, memory, url):
+    with TestClient(H.create_api_app_for_store(SQLFrames(engine))) as sql:
+        _assert_gas_close(sql.get(url), memory.get(url))
+
+
+def test_filtered_tops_match_memory(engine, memory):
+    store, sql = memory.app.state.store, SQLFrames(engine)
+    blocks = store.blocks['number']
+    token = store.top_tokens(3)['token_address'].iloc[1]
+    address = store.top_flow_pairs(3)['from'].iloc[0]
+    for filters in ({'start_block': int(blocks.quantile(.2)), 'end_block': int(blocks.quantile(.7))},
+                    {'start': pd.Timestamp(1700003000, unit='s', tz='UTC'), 'end': pd.Timestamp(1700020000, unit='s', tz='UTC')},
+                    {'token': token}, {'address': address}, {'token': '0x' + '9' * 40}):
+        pd.testing.assert_frame_equal(sql.top_tokens(10, **filters), store.top_tokens(10, **filters))
+        pd.testing.assert_frame_equal(sql.top_flow_pairs(20, **filters), store.top_flow_pairs(20, **filters))
+
+
+def test_memory_only_endpoints_are_501(engine):
+    with TestClient(H.create_api_app_for_store(SQLFrames(engine))) as sql:
+        assert sql.get('/flows/amounts').status_code == 501
+        assert sql.get('/flows/basic?mode=approx').status_code == 501
+
+
+def test_refresh_extends_aggregates(engine, memory, frames):
+    hi = int(frames[2]['number'].max())
+    _set_high_water(engine, hi - 1000)
+    try:
+        store = SQLFrames(engine)
+        store.precompute()
+        with TestClient(H.create_api_app_for_store(store)) as sql:
+            sql.get('/info')
+            _set_high_water(engine, hi)
+            assert store.refresh() == 1000 and store.version == 1
+            pd.testing.assert_frame_equal(store.rollup, memory.app.state.store.rollup, check_exact=False, rtol=1e-12)
+            for url in ('/events/types', '/tx/timeseries?freq=h', '/tokens/top?k=5'):
+                assert sql.get(url).content == memory.get(url).content
+            _assert_gas_close(sql.get('/gas/timeseries?freq=d'), memory.get('/gas/timeseries?freq=d'))
+            info = sql.get('/info').json()
+            assert info['high_water_block'] == hi and info['events_rows'] == len(frames[0])
+    finally:
+        _set_high_water(engine, hi)
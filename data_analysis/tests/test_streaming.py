@@ -0,0 +1,82 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hyper_evm_step1_events as H
+
+N = H.STREAM_BATCH_ROWS * 2 + 123  # trois lots, le dernier incomplet
+BIG = 2 ** 256 - 1
+
+
+@pytest.fixture(scope='module')
+def df():
+    rng = np.random.default_rng(5)
+    i = np.arange(N)
+    amount = pd.Series(i, dtype=object)
+    amount[i % 9_000 == 1] = BIG  # > 64 bits dans certains lots seulement
+    amount[i % 7_001 == 3] = None
+    return pd.DataFrame({
+        'timestamp_dt': pd.Timestamp('2023-11-14', tz='UTC') + pd.to_timedelta(i, unit='s'),
+        'token_address': pd.Series(['0x%040x' % (v % 1000) for v in i]).astype('category'),
+        'label': np.where(i % 5 == 0, 'a,"b"\né', 'plain'),
+        'count': i.astype(np.int64),
+        'ratio': np.where(i % 11 == 0, np.nan, rng.random(N)),
+        'flag': i % 2 == 0,
+        'amount_raw': amount,
+    })
+
+
+def _join(df, fmt, **kw):
+    return b''.join(H._iter_df(df, fmt, **kw))
+
+
+def test_more_rows_than_one_batch(df):
+    assert len(df) > H.STREAM_BATCH_ROWS
+    assert len(list(H._iter_df(df, 'csv'))) == 3
+
+
+def test_csv_equals_single_shot(df):
+    assert _join(df, 'csv') == df.to_csv(index=False).encode('utf-8')
+
+
+def test_json_equals_records(df):
+    body = _join(df, 'json')
+    assert json.loads(body) == json.loads(json.dumps(H._json_records(df)))
+    assert body == _join(df, 'json', batch_rows=len(df))
+
+
+def test_ndjson_lines_equal_json_records(df):
+    lines = _join(df, 'ndjson').splitlines()
+    assert len(lines) == len(df)
+    assert [json.loads(line) for line in lines] == json.loads(_join(df, 'json'))
+
+
+def test_parquet_roundtrip_keeps_exact_uint256(df):
+    pq = pytest.importorskip('pyarrow.parquet')
+    chunks = list(H._iter_df(df, 'parquet'))
+    assert len(chunks) > 1
+    f = pq.ParquetFile(io.BytesIO(b''.join(chunks)))
+    assert f.metadata.num_row_groups == 3
+    out = f.read().to_pandas()
+    assert [None if pd.isna(v) else v for v in out['amount_raw']] == [
+        None if v is None else str(v) for v in df['amount_raw']]
+    assert str(BIG) in set(out['amount_raw'])
+    pd.testing.assert_frame_equal(out.drop(columns='amount_raw'), df.drop(columns='amount_raw'), check_dtype=False,
+                                  check_categorical=False)
+
+
+@pytest.mark.parametrize('fmt, expected', [('json', b'[]'), ('ndjson', b''), ('csv', None)])
+def test_empty_frame(df, fmt, expected):
+    empty = df.iloc[:0]
+    body = _join(empty, fmt)
+    assert body == (expected if expected is not None else (','.join(df.columns) + '\n').encode('utf-8'))
+    assert H._render_df(empty, fmt)[0] == body
+
+
+def test_empty_frame_parquet(df):
+    pq = pytest.importorskip('pyarrow.parquet')
+    out = pq.read_table(io.BytesIO(_join(df.iloc[:0], 'parquet')))
+    assert out.num_rows == 0 and out.column_names == list(df.columns)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from hyper_evm_step1_events import hex_to_int
+from uint256 import UInt256Array
+
+
+@pytest.mark.parametrize('values', [
+    ['0x', '123', '0x5'],
+    ['0x' + '1' * 66, '0x'],
+    ['0xzz', '0x' + 'f' * 64, None, '42', '0x0'],
+    ['0x' + '0' * 70 + 'ff', 'garbage', '0x' + '1' * 80],
+])
+def test_from_hex_matches_scalar_helper(values):
+    col = pd.Series(values, dtype=object)
+    got = UInt256Array.from_hex(col, fallback=hex_to_int).to_ints().tolist()
+    assert got == [hex_to_int(v) for v in values]
+    assert all(v is None or type(v) is int for v in got)
+
+
+def test_from_hex_without_fallback_marks_rest_invalid():
+    arr = UInt256Array.from_hex(pd.Series(['0x10', '123', None]))
+    assert arr.to_ints().tolist() == [16, None, None]
+
+
+def test_group_sum_is_exact():
+    values = [2 ** 255, 2 ** 255, 1, 2 ** 64 - 1, None]
+    arr = UInt256Array.from_ints(values)
+    sums = arr.group_sum(np.array([0, 0, 1, 1, 1]), 2).to_ints().tolist()
+    assert sums == [2 ** 256, 2 ** 64]
+
+
+def test_setitem_widens():
+    arr = UInt256Array.empty(3)
+    arr[np.array([False, True, False])] = UInt256Array.from_ints([2 ** 200])
+    assert arr.to_ints().tolist() == [None, 2 ** 200, None]
+
+
+@pytest.mark.parametrize('value, decimals, expected', [
+    (0, 18, '0'), (123, 18, '0.000000000000000123'), (10 ** 18, 18, '1'), (1_500_000, 6, '1.5'),
+    (2 ** 256 - 1, 18, '115792089237316195423570985008687907853269984665640564039457.584007913129639935'),
+    (42, 0, '42'),
+])
+def test_to_decimal_str_is_exact(value, decimals, expected):
+    assert UInt256Array.from_ints([value]).to_decimal_str(decimals).tolist() == [expected]
+
+
+def test_to_decimal_str_per_row_decimals():
+    arr = UInt256Array.from_ints([10 ** 18, 5, None])
+    assert arr.to_decimal_str(np.array([18, 1, 0])).tolist() == ['1', '0.5', None]
@@ -0,0 +1,266 @@
+"""
+Module: uint256.py
+
+But: représentation colonnaire exacte des entiers uint256 EVM (montants, token ids)
+- Parsing hex vectorisé → limbs uint64 (l0 = poids faible), masque de validité
+- Largeur adaptative: seuls les limbs utiles sont conservés (un montant ERC-20 typique tient sur 1-2 limbs)
+- Sommes groupées exactes (demi-limbs 32 bits + propagation de retenue, la largeur peut croître)
+- Mise à l'échelle décimale exacte (montant / 10**decimals) → chaînes décimales
+
+Stockage dans un DataFrame: colonnes `<prefix>_l0..l{k-1}` (uint64) + `<prefix>_valid` (bool).
+
+Dépendances: numpy, pandas
+"""
+
+from __future__ import annotations
+import math
+import re
+from typing import Any, Callable, Iterable
+
+import numpy as np
+import pandas as pd
+
+HEX_LUT = np.full(256, 255, dtype=np.uint8)
+for _i, _c in enumerate('0123456789abcdef'):
+    HEX_LUT[ord(_c)] = _i
+    HEX_LUT[ord(_c.upper())] = _i
+_NIBBLE_SHIFTS = np.arange(60, -4, -4, dtype=np.uint64)
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+_DEC_CHUNK = np.uint64(10 ** 9)
+
+
+def hex_digits_to_limbs(digits: pd.Series, width: int = 64) -> np.ndarray:
+    """Chiffres hex validés (sans 0x, ≤ width) → limbs uint64 petit-boutistes, shape (n, width // 16)."""
+    raw = digits.str.rjust(width, '0').to_numpy(dtype=f'S{width}')
+    nib = HEX_LUT[np.frombuffer(raw.tobytes(), dtype=np.uint8)].astype(np.uint64)
+    limbs_be = np.bitwise_or.reduce(nib.reshape(len(raw), width // 16, 16) << _NIBBLE_SHIFTS, axis=2)
+    return np.ascontiguousarray(limbs_be[:, ::-1])
+
+
+def limbs_to_int(limbs: np.ndarray) -> np.ndarray:
+    """Limbs uint64 petit-boutistes → entiers Python exacts (ndarray object)."""
+    out = limbs[:, 0].astype(object)
+    for k in range(1, limbs.shape[1]):
+        hi = limbs[:, k]
+        nz = hi != 0
+        if nz.any():
+            out[nz] = out[nz] + (hi[nz].astype(object) << (64 * k))
+    return out
+
+
+class UInt256Array:
+    """Tableau d'entiers non signés exacts: `limbs` (n, k) uint64 petit-boutistes + `valid` (n,) bool.
+
+    k vaut 4 au plus pour des valeurs uint256 parsées; une somme groupée peut ajouter un limb de retenue.
+    """
+
+    __slots__ = ('limbs', 'valid')
+
+    def __init__(self, limbs: np.ndarray, valid: np.ndarray | None = None):
+        limbs = np.asarray(limbs, dtype=np.uint64)
+        if limbs.ndim == 1:
+            limbs = limbs[:, None]
+        self.limbs = np.ascontiguousarray(limbs)
+        self.valid = np.ones(len(limbs), dtype=bool) if valid is None else np.asarray(valid, dtype=bool)
+
+    # --- Construction ---
+
+    @classmethod
+    def empty(cls, n: int, width: int = 1) -> 'UInt256Array':
+        """n valeurs manquantes."""
+        return cls(np.zeros((n, width), dtype=np.uint64), np.zeros(n, dtype=bool))
+
+    @classmethod
+    def from_hex(cls, col: pd.Series, fallback: Callable[[Any], int | None] | None = None) -> 'UInt256Array':
+        """Parse une colonne de chaînes '0x…'. Les zéros de tête au-delà de 64 chiffres sont tolérés.
+
+        Les autres valeurs non nulles passent par `fallback` (scalaire → int | None) si fourni, sinon invalides.
+        """
+        n = len(col)
+        out = cls.empty(n, width=4)
+        try:
+            sx = col.str
+        except AttributeError:
+            sx = None
+        fast = np.zeros(n, dtype=bool)
+        if sx is not None:
+            m = sx.fullmatch(r'0x[0-9a-fA-F]+', na=False).to_numpy(dtype=bool)
+            if m.any():
+                digits = col[m].str[2:].str.lstrip('0')
+                fits = (digits.str.len() <= 64).to_numpy(dtype=bool)
+                idx = np.flatnonzero(m)[fits]
+                out.limbs[idx] = hex_digits_to_limbs(digits[fits])
+                out.valid[idx] = True
+                fast[idx] = True
+        if fallback is not None:
+            rest = ~fast & col.notna().to_numpy(dtype=bool)
+            if rest.any():
+                # liste Python: un None parmi les entiers ne doit pas convertir la colonne en float64
+                out[rest] = cls.from_ints([fallback(v) for v in col[rest]])
+        return out.compact()
+
+    @classmethod
+    def from_ints(cls, values: Iterable) -> 'UInt256Array':
+        """Entiers Python (None/NaN/négatifs → invalides)."""
+        vals = list(values)
+        ok = np.array([isinstance(v, (int, np.integer)) and not isinstance(v, bool) and v >= 0 for v in vals], dtype=bool)
+        ints = [int(v) for v, o in zip(vals, ok) if o]
+        width = max(1, math.ceil(max((v.bit_length() for v in ints), default=1) / 64))
+        limbs = np.zeros((len(vals), width), dtype=np.uint64)
+        if ints:
+            arr = np.array(ints, dtype=object)
+            sub = np.empty((len(ints), width), dtype=np.uint64)
+            for k in range(width):
+                sub[:, k] = ((arr >> (64 * k)) & 0xFFFFFFFFFFFFFFFF).astype(np.uint64)
+            limbs[ok] = sub
+        return cls(limbs, ok)
+
+    @classmethod
+    def from_columns(cls, df: pd.DataFrame, prefix: str) -> 'UInt256Array':
+        cols = sorted((c for c in df.columns if re.fullmatch(rf'{re.escape(prefix)}_l\d+', str(c))),
+                      key=lambda c: int(str(c).rsplit('_l', 1)[1]))
+        if not cols:
+            raise KeyError(f"Aucune colonne uint256 '{prefix}_l*'")
+        limbs = np.stack([df[c].to_numpy(dtype=np.uint64) for c in cols], axis=1)
+        return cls(limbs, df[f'{prefix}_valid'].to_numpy(dtype=bool))
+
+    @classmethod
+    def concat(cls, arrays: Iterable['UInt256Array']) -> 'UInt256Array':
+        """Concaténation (largeur = la plus grande des largeurs)."""
+        arrays = list(arrays)
+        width = max((a.width for a in arrays), default=1)
+        limbs = [np.pad(a.limbs, ((0, 0), (0, width - a.width))) for a in arrays]
+        if not limbs:
+            return cls.empty(0, width)
+        return cls(np.concatenate(limbs), np.concatenate([a.valid for a in arrays]))
+
+    @staticmethod
+    def has_columns(df: pd.DataFrame, prefix: str) -> bool:
+        return f'{prefix}_valid' in df.columns and f'{prefix}_l0' in df.columns
+
+    def to_columns(self, prefix: str) -> dict[str, np.ndarray]:
+        cols = {f'{prefix}_l{k}': self.limbs[:, k] for k in range(self.width)}
+        cols[f'{prefix}_valid'] = self.valid
+        return cols
+
+    # --- Accès ---
+
+    @property
+    def width(self) -> int:
+        return self.limbs.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.limbs.nbytes + self.valid.nbytes
+
+    def __len__(self) -> int:
+        return len(self.limbs)
+
+    def __getitem__(self, idx) -> 'UInt256Array':
+        return UInt256Array(self.limbs[idx], self.valid[idx])
+
+    def take(self, idx) -> 'UInt256Array':
+        return self[np.asarray(idx)]
+
+    def __setitem__(self, idx, other: 'UInt256Array | int') -> None:
+        if not isinstance(other, UInt256Array):
+            other = UInt256Array.from_ints([other])
+        if other.width > self.width:
+            self.limbs = np.pad(self.limbs, ((0, 0), (0, other.width - self.width)))
+        self.limbs[idx] = 0
+        self.limbs[idx, :other.width] = other.limbs if len(other) != 1 else other.limbs[0]
+        self.valid[idx] = other.valid if len(other) != 1 else other.valid[0]
+
+    def compact(self) -> 'UInt256Array':
+        """Retire les limbs de poids fort nuls sur toutes les lignes (au moins un limb conservé)."""
+        used = np.flatnonzero(self.limbs.any(axis=0))
+        width = int(used[-1]) + 1 if len(used) else 1
+        if width == self.width:
+            return self
+        return UInt256Array(self.limbs[:, :width], self.valid)
+
+    # --- Conversions ---
+
+    def to_ints(self) -> np.ndarray:
+        """ndarray object d'entiers Python exacts (None si invalide)."""
+        out = limbs_to_int(self.limbs) if len(self) else np.empty(0, dtype=object)
+        out[~self.valid] = None
+        return out
+
+    def _halves(self) -> np.ndarray:
+        """Demi-limbs 32 bits petit-boutistes, shape (n, 2k), stockés en uint64."""
+        h = np.empty((len(self), 2 * self.width), dtype=np.uint64)
+        h[:, 0::2] = self.limbs & _MASK32
+        h[:, 1::2] = self.limbs >> _SHIFT32
+        return h
+
+    @staticmethod
+    def _from_halves(h: np.ndarray, valid: np.ndarray) -> 'UInt256Array':
+        if h.shape[1] % 2:
+            h = np.pad(h, ((0, 0), (0, 1)))
+        return UInt256Array(h[:, 0::2] | (h[:, 1::2] << _SHIFT32), valid)
+
+    # --- Agrégations ---
+
+    def group_sum(self, codes: np.ndarray, ngroups: int) -> 'UInt256Array':
+        """Somme exacte par groupe (codes 0..ngroups-1); les valeurs invalides comptent pour 0.
+
+        Chaque demi-limb 32 bits est sommé en uint64 (exact jusqu'à 2**32 lignes), puis les retenues sont propagées.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        h = self._halves()
+        h[~self.valid] = 0
+        order = np.argsort(codes, kind='stable')
+        sc = codes[order]
+        starts = np.flatnonzero(np.r_[True, sc[1:] != sc[:-1]]) if len(sc) else np.empty(0, dtype=np.int64)
+        sums = np.zeros((ngroups, h.shape[1]), dtype=np.uint64)
+        if len(starts):
+            sums[sc[starts]] = np.add.reduceat(h[order], starts, axis=0)
+        carry = np.zeros(ngroups, dtype=np.uint64)
+        for j in range(sums.shape[1]):
+            tot = sums[:, j] + carry
+            sums[:, j] = tot & _MASK32
+            carry = tot >> _SHIFT32
+        while carry.any():
+            sums = np.column_stack([sums, carry & _MASK32])
+            carry = carry >> _SHIFT32
+        return UInt256Array._from_halves(sums, np.ones(ngroups, dtype=bool)).compact()
+
+    def sort_keys_desc(self) -> list[np.ndarray]:
+        """Clés np.lexsort (poids faible d'abord) pour un tri décroissant stable; les invalides en dernier."""
+        return [~self.limbs[:, k] for k in range(self.width)] + [~self.valid]
+
+    def to_decimal_str(self, decimals: int | np.ndarray = 0) -> np.ndarray:
+        """Représentation décimale exacte de valeur / 10**decimals (ndarray object de str, None si invalide)."""
+        n = len(self)
+        out = np.full(n, None, dtype=object)
+        if n == 0:
+            return out
+        # conversion base 1e9 par divisions longues successives sur les demi-limbs
+        work = self._halves()
+        chunks = []
+        for _ in range(math.ceil(self.width * 64 * math.log10(2) / 9) + 1):
+            rem = np.zeros(n, dtype=np.uint64)
+            for j in range(work.shape[1] - 1, -1, -1):
+                cur = (rem << _SHIFT32) | work[:, j]
+                work[:, j] = cur // _DEC_CHUNK
+                rem = cur % _DEC_CHUNK
+            chunks.append(rem)
+            if not work.any():
+                break
+        digits = pd.Series(np.char.zfill(chunks[-1].astype(str), 9), dtype=object)
+        for c in reversed(chunks[:-1]):
+            digits = digits + pd.Series(np.char.zfill(c.astype(str), 9), dtype=object)
+        digits = digits.str.lstrip('0').replace('', '0')
+        dec = np.broadcast_to(np.asarray(decimals, dtype=np.int64), (n,))
+        for d in np.unique(dec):
+            sel = dec == d
+            s = digits[sel]
+            if d > 0:
+                s = s.str.rjust(int(d) + 1, '0')
+                frac = s.str[-int(d):].str.rstrip('0')
+                s = s.str[:-int(d)] + ('.' + frac).where(frac != '', '')
+            out[sel] = s.to_numpy(dtype=object)
+        out[~self.valid] = None
+        return out